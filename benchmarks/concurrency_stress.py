@@ -0,0 +1,88 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repository.data_manager import ConflictError
+from repository.journaled_data_manager import JournaledDataManager
+from repository.storage import STORAGE_MODES, open_data_manager
+from service.finance_service import DataService
+
+# Several processes share one data directory. Each one repeatedly increments a shared
+# counter income with optimistic updates (retrying on ConflictError), creates expenses and
+# bulk-imports a few more. Afterwards no increment may be lost, no expense may be missing
+# or duplicated and every file must still parse.
+
+def open_service(storage, data_dir):
+    if storage == "journal":
+        # Small threshold so the run also compacts while other processes are writing
+        return DataService(JournaledDataManager(data_dir, compact_threshold=4096))
+    return DataService(open_data_manager(storage, data_dir))
+
+def worker(storage, data_dir, worker_id, operations):
+    service = open_service(storage, data_dir)
+    conflicts = 0
+    for i in range(operations):
+        while True:
+            counter = service.filter_incomes("id", 1)[0]
+            try:
+                service.update_income(1, counter.source, counter.amount + 1, str(counter.date), counter.description,
+                                      expected=counter)
+                break
+            except ConflictError:
+                conflicts += 1
+        service.create_expense(f"Worker {worker_id}", 1.0, "2024-01-01", f"{worker_id}-{i}")
+        if i % 5 == 0:
+            service.import_expenses([(f"Worker {worker_id}", "2.5", "2024-01-02", f"{worker_id}-{i}-import-{n}") for n in range(3)])
+    return conflicts
+
+def run(storage, processes, operations):
+    with tempfile.TemporaryDirectory() as data_dir:
+        service = open_service(storage, data_dir)
+        service.data_manager.save_budgets([])
+        service.data_manager.save_expenses([])
+        service.data_manager.save_incomes([])
+        service.create_income("Counter", 1.0, "2024-01-01", "shared counter")
+        start = time.perf_counter()
+        with multiprocessing.Pool(processes) as pool:
+            conflicts = pool.starmap(worker, [(storage, data_dir, worker_id, operations) for worker_id in range(processes)])
+        elapsed = time.perf_counter() - start
+
+        service = open_service(storage, data_dir)
+        counter = service.filter_incomes("id", 1)[0]
+        expenses = service.get_expenses()
+        imports_per_worker = len(range(0, operations, 5)) * 3
+        expected_descriptions = {f"{worker_id}-{i}" for worker_id in range(processes) for i in range(operations)}
+        expected_descriptions |= {f"{worker_id}-{i}-import-{n}" for worker_id in range(processes)
+                                  for i in range(0, operations, 5) for n in range(3)}
+        problems = []
+        if counter.amount != 1 + processes * operations:
+            problems.append(f"counter is {counter.amount}, expected {1 + processes * operations}")
+        if len({expense.id for expense in expenses}) != len(expenses):
+            problems.append("duplicate expense ids")
+        if len(expenses) != processes * (operations + imports_per_worker):
+            problems.append(f"{len(expenses)} expenses, expected {processes * (operations + imports_per_worker)}")
+        if {expense.description for expense in expenses} != expected_descriptions:
+            problems.append("expenses lost or duplicated")
+
+    status = "ok" if not problems else "FAILED: " + "; ".join(problems)
+    print(f"{storage:<11} {processes} processes x {operations} ops in {elapsed:6.2f} s, "
+          f"{sum(conflicts)} conflicts retried - {status}")
+    return not problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Several processes writing to one data directory at once")
+    parser.add_argument("--storage", choices=STORAGE_MODES, action="append", help="storage mode(s) to test, default all")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--operations", type=int, default=50)
+    args = parser.parse_args()
+
+    results = [run(storage, args.processes, args.operations) for storage in args.storage or STORAGE_MODES]
+    sys.exit(0 if all(results) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.ledger_generator import write_expenses
+from domain.expense import Expense
+from repository import csv_loader
+from repository.data_manager import DataManager, expense_from_row
+
+# The loader as it was before: csv.reader plus strptime and conversions on every row
+def load_row_by_row(path):
+    expenses = []
+    with open(path, mode='r', newline='') as file:
+        reader = csv.reader(file)
+        next(reader)  # Skip header
+        for row in reader:
+            if row:
+                date_obj = datetime.strptime(row[3], '%Y-%m-%d').date() if row[3] else None
+                expenses.append(Expense(int(row[0]), row[1], float(row[2]), date_obj, row[4]))
+    return expenses
+
+def as_tuples(expenses):
+    return [(e.id, e.category, e.amount, e.date, e.description) for e in expenses]
+
+def timed(name, rows, load):
+    start = time.perf_counter()
+    records = load()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<22} {elapsed:7.2f} s {rows / elapsed:12,.0f} rows/s")
+    return records
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV load throughput of the expense loader")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = DataManager(data_dir)
+        write_expenses(manager.expense_file, args.rows)
+        expected = as_tuples(timed("row by row (before)", args.rows, lambda: load_row_by_row(manager.expense_file)))
+        serial = timed("batched", args.rows, lambda: csv_loader.load_records(
+            manager.expense_file, Expense, csv_loader.EXPENSE_COLUMNS, expense_from_row, workers=1))
+        csv_loader.PARALLEL_THRESHOLD = 0
+        parallel = timed(f"parallel ({args.workers} workers)", args.rows, lambda: csv_loader.load_records(
+            manager.expense_file, Expense, csv_loader.EXPENSE_COLUMNS, expense_from_row, workers=args.workers))
+    if as_tuples(serial) != expected or as_tuples(parallel) != expected:
+        sys.exit("Loaded records differ from the row-by-row loader")
+
+if __name__ == "__main__":
+    main()
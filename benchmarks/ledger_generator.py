@@ -0,0 +1,105 @@
+import argparse
+import csv
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repository.data_manager import INCOME_HEADER, EXPENSE_HEADER, BUDGET_HEADER
+
+# Deterministic synthetic ledgers for the benchmarks: the same seed and size always give
+# byte-identical files. Expenses follow a weighted category mix with log-normal amounts per
+# category, incomes are a monthly salary plus irregular side income, and there is one
+# budget per expense category set a little above its typical monthly spend.
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+# category -> (share of expenses, median amount)
+EXPENSE_CATEGORIES = {
+    "Food": (0.30, 25), "Transport": (0.15, 12), "Entertainment": (0.10, 40), "Rent": (0.02, 900),
+    "Utilities": (0.06, 80), "Health": (0.05, 60), "Clothes": (0.07, 55), "Travel": (0.03, 350),
+    "Groceries": (0.18, 45), "Gifts": (0.04, 70),
+}
+EXPENSE_DESCRIPTIONS = {
+    "Food": ["Lunch", "Dinner out", "Coffee", "Takeaway pizza", "Bakery"],
+    "Transport": ["Bus ticket", "Taxi", "Fuel", "Parking", "Train ticket"],
+    "Entertainment": ["Cinema", "Concert", "Streaming subscription", "Books", "Board games"],
+    "Rent": ["Monthly rent"],
+    "Utilities": ["Electricity bill", "Water bill", "Internet", "Phone plan", "Gas bill"],
+    "Health": ["Pharmacy", "Dentist", "Gym membership", "Doctor visit"],
+    "Clothes": ["Shoes", "Jacket", "Shirts", "Winter coat"],
+    "Travel": ["Flight", "Hotel", "Car rental", "Museum tickets"],
+    "Groceries": ["Supermarket", "Farmers market", "Weekly groceries", "Butcher"],
+    "Gifts": ["Birthday gift", "Wedding gift", "Flowers"],
+}
+INCOME_SOURCES = {"Job": 0.55, "Freelance": 0.25, "Investments": 0.12, "Gifts": 0.08}
+
+def _dates(start, years):
+    return [str(start + timedelta(days=offset)) for offset in range(365 * years)]
+
+def write_expenses(path, rows, seed=0, start=date(2015, 1, 1), years=10):
+    rng = random.Random(seed)
+    days = _dates(start, years)
+    categories = list(EXPENSE_CATEGORIES)
+    weights = [share for share, _ in EXPENSE_CATEGORIES.values()]
+    with open(path, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(EXPENSE_HEADER)
+        for first in range(1, rows + 1, 10_000):
+            count = min(10_000, rows + 1 - first)
+            chosen = rng.choices(categories, weights, k=count)
+            writer.writerows(
+                [first + i, category, round(EXPENSE_CATEGORIES[category][1] * rng.lognormvariate(0, 0.5), 2),
+                 rng.choice(days), rng.choice(EXPENSE_DESCRIPTIONS[category])]
+                for i, category in enumerate(chosen))
+
+def write_incomes(path, rows, seed=0, start=date(2015, 1, 1), years=10):
+    rng = random.Random(seed + 1)
+    days = _dates(start, years)
+    sources = list(INCOME_SOURCES)
+    weights = list(INCOME_SOURCES.values())
+    with open(path, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(INCOME_HEADER)
+        for i in range(1, rows + 1):
+            source = rng.choices(sources, weights)[0]
+            amount = round(rng.uniform(2500, 3500), 2) if source == "Job" else round(rng.lognormvariate(5.5, 0.8), 2)
+            writer.writerow([i, source, amount, rng.choice(days), f"{source} payment"])
+
+def write_budgets(path, expense_rows, years=10):
+    # Roughly the expected monthly spend per category, plus 10%
+    months = 12 * years
+    with open(path, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(BUDGET_HEADER)
+        for i, (category, (share, median)) in enumerate(EXPENSE_CATEGORIES.items(), 1):
+            writer.writerow([i, category, round(expense_rows * share * median * 1.13 * 1.1 / months, 2)])
+
+# Writes incomes.csv, expenses.csv and budgets.csv into data_dir. rows is the number of
+# expenses; there is one income for every 20 expenses (at least one a month).
+def generate_ledger(data_dir, rows, seed=0, start=date(2015, 1, 1), years=10):
+    os.makedirs(data_dir, exist_ok=True)
+    incomes = max(rows // 20, 12 * years)
+    write_expenses(os.path.join(data_dir, "expenses.csv"), rows, seed, start, years)
+    write_incomes(os.path.join(data_dir, "incomes.csv"), incomes, seed, start, years)
+    write_budgets(os.path.join(data_dir, "budgets.csv"), rows, years)
+    return {"expenses": rows, "incomes": incomes, "budgets": len(EXPENSE_CATEGORIES)}
+
+def parse_size(text):
+    if text.lower() in SIZES:
+        return SIZES[text.lower()]
+    return int(text.replace("_", ""))
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic ledger")
+    parser.add_argument("data_dir")
+    parser.add_argument("--size", default="100k", help=f"expense rows: {', '.join(SIZES)} or a number")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    counts = generate_ledger(args.data_dir, parse_size(args.size), args.seed)
+    print(f"Wrote {counts['expenses']} expenses, {counts['incomes']} incomes and {counts['budgets']} budgets to {args.data_dir}")
+
+if __name__ == "__main__":
+    main()
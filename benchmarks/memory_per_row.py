@@ -0,0 +1,54 @@
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.ledger_generator import write_expenses
+from repository.data_manager import DataManager
+
+# The expense record as it was before __slots__ and string interning, for the "before" figure
+class DictExpense:
+    def __init__(self, id, category, amount, date, description):
+        self.id = id
+        self.category = category
+        self.amount = amount
+        self.date = date
+        self.description = description
+
+def load_before(path):
+    expenses = []
+    with open(path, mode='r', newline='') as file:
+        reader = csv.reader(file)
+        next(reader)
+        for row in reader:
+            date_obj = datetime.strptime(row[3], '%Y-%m-%d').date() if row[3] else None
+            expenses.append(DictExpense(int(row[0]), row[1], float(row[2]), date_obj, row[4]))
+    return expenses
+
+def measure(load):
+    tracemalloc.start()
+    records = load()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size / len(records)
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes per loaded expense row, before and after compact records")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = DataManager(data_dir)
+        write_expenses(manager.expense_file, args.rows)
+        before = measure(lambda: load_before(manager.expense_file))
+        after = measure(manager.load_expenses)
+    print(f"{args.rows} rows: {before:.0f} bytes/row before, {after:.0f} bytes/row after "
+          f"({100 * (before - after) / before:.0f}% less)")
+
+if __name__ == "__main__":
+    main()
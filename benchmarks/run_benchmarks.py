@@ -0,0 +1,232 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.ledger_generator import SIZES, generate_ledger, parse_size
+from repository.data_manager import DataManager
+from repository.storage import STORAGE_MODES, open_data_manager
+from service.finance_service import DataService
+
+# Times the repository, service and report hot paths on generated ledgers, headless (the
+# service never touches Tk unless it has an error to show). Each case is called several
+# times for the latency percentiles, then once more under tracemalloc for its peak memory;
+# results go to a JSON file that `compare` checks against an earlier run.
+#
+#   python benchmarks/run_benchmarks.py run --size 1k --size 100k --output after.json
+#   python benchmarks/run_benchmarks.py compare before.json after.json
+
+# A case is slower than before when its median latency grew by more than this fraction
+DEFAULT_THRESHOLD = 0.10
+
+def percentile(values, fraction):
+    values = sorted(values)
+    position = (len(values) - 1) * fraction
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+# Calls call(setup()) `repeat` times, timing only the call
+def measure(call, rows, repeat, setup=lambda: None, memory=True):
+    latencies = []
+    for _ in range(repeat):
+        argument = setup()
+        start = time.perf_counter()
+        call(argument)
+        latencies.append(time.perf_counter() - start)
+    result = {
+        "calls": repeat,
+        "rows": rows,
+        "mean_s": sum(latencies) / repeat,
+        "min_s": min(latencies),
+        "max_s": max(latencies),
+        "p50_s": percentile(latencies, 0.50),
+        "p95_s": percentile(latencies, 0.95),
+        "p99_s": percentile(latencies, 0.99),
+    }
+    result["ops_per_s"] = 1 / result["mean_s"] if result["mean_s"] else None
+    result["rows_per_s"] = rows / result["mean_s"] if rows and result["mean_s"] else None
+    if memory:
+        argument = setup()
+        tracemalloc.start()
+        call(argument)
+        result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+def prepare(storage, source_dir, data_dir):
+    for name in ("incomes.csv", "expenses.csv", "budgets.csv"):
+        shutil.copy(os.path.join(source_dir, name), data_dir)
+    if storage in ("sqlite", "partitioned"):
+        manager = open_data_manager(storage, data_dir)
+        manager.import_from(DataManager(data_dir))
+        if hasattr(manager, "close"):
+            manager.close()
+
+def run_suite(storage, data_dir, counts, repeat, memory, progress):
+    results = {}
+
+    def case(name, call, rows=0, calls=repeat, setup=lambda: None):
+        progress(f"  {storage:<11} {name}")
+        results[name] = measure(call, rows, calls, setup, memory)
+
+    # Repository: every load starts from a fresh manager, so the cached modes cannot
+    # answer from memory
+    fresh = lambda: open_data_manager(storage, data_dir)
+    case("repository.load_incomes", lambda manager: manager.load_incomes(), counts["incomes"], setup=fresh)
+    case("repository.load_expenses", lambda manager: manager.load_expenses(), counts["expenses"], setup=fresh)
+    case("repository.load_budgets", lambda manager: manager.load_budgets(), counts["budgets"], calls=repeat * 20, setup=fresh)
+    # Loads may hand back records that are only decoded on access (binary snapshots)
+    case("repository.load_expenses_decoded", lambda manager: list(manager.load_expenses()), counts["expenses"], setup=fresh)
+    manager = open_data_manager(storage, data_dir)
+    expenses = manager.load_expenses()
+    case("repository.save_expenses", lambda _: manager.save_expenses(expenses), counts["expenses"])
+    del expenses
+
+    # Service: the first query pays for building the views; the rest use them
+    case("service.first_query", lambda service: service.filter_expenses("category", "Food"), counts["expenses"],
+         setup=lambda: DataService(open_data_manager(storage, data_dir)))
+    service = DataService(manager)
+    service.check_budget_exceed()
+    case("service.filter_expenses", lambda _: service.filter_expenses("category", "Food"), calls=repeat * 20)
+    case("service.search_expenses", lambda _: service.search_expenses("description", "bill"), counts["expenses"])
+    case("service.sort_expenses", lambda _: service.sort_expenses("amount"), counts["expenses"])
+    case("service.range_expenses", lambda _: service.range_expenses("amount", 100, 200), calls=repeat * 20)
+
+    # Reports: every month of the ledger once, then the same months again from the cache
+    years = range(2015, 2025)
+    months = [(year, month) for year in years for month in range(1, 13)]
+    for name in ("report.generate_monthly_report", "report.generate_monthly_report_cached"):
+        pending = iter(months)
+        case(name, lambda _: service.generate_monthly_report(*next(pending)), calls=len(months) - 1)
+    case("report.check_budget_exceed", lambda _: service.check_budget_exceed(), calls=repeat * 20)
+    case("report.period_totals", lambda _: service.get_period_totals("expense", "week"), calls=repeat * 4)
+
+    # Writes go last, they grow the ledger
+    ids = itertools.count()
+    case("service.create_expense", lambda _: service.create_expense("Food", 12.5, "2024-06-01", f"bench {next(ids)}"),
+         calls=repeat * 4)
+
+    # Ten corrections in one transaction, stored with one write
+    corrected = list(itertools.islice(service.get_expenses(), 10))
+
+    def correct(_):
+        with service.transaction():
+            for expense in corrected:
+                service.update_expense(expense.id, expense.category, expense.amount + 1, str(expense.date), expense.description)
+    case("service.transaction_10_updates", correct, len(corrected), calls=repeat)
+    case("service.undo", lambda _: service.undo(), calls=repeat)
+    if hasattr(manager, "close"):
+        manager.close()
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    progress = (lambda message: None) if args.quiet else (lambda message: print(message, file=sys.stderr))
+    report = {
+        "meta": {
+            "started": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+    for size in args.size or ["1k", "100k"]:
+        rows = parse_size(size)
+        with tempfile.TemporaryDirectory() as source_dir:
+            progress(f"Generating {rows} rows")
+            counts = generate_ledger(source_dir, rows, args.seed)
+            for storage in args.storage or ["csv"]:
+                with tempfile.TemporaryDirectory() as data_dir:
+                    prepare(storage, source_dir, data_dir)
+                    results = run_suite(storage, data_dir, counts, args.repeat, not args.no_memory, progress)
+                for name, result in results.items():
+                    report["results"][f"{size}/{storage}/{name}"] = result
+    with open(args.output, mode='w') as file:
+        json.dump(report, file, indent=2)
+    print_results(report["results"])
+    print(f"Results written to {args.output}")
+
+def print_results(results):
+    print(f"{'case':<56} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'rows/s':>14} {'peak MB':>9}")
+    for name, result in results.items():
+        rows_per_s = f"{result['rows_per_s']:,.0f}" if result["rows_per_s"] else "-"
+        peak = f"{result['peak_bytes'] / 2**20:.1f}" if "peak_bytes" in result else "-"
+        print(f"{name:<56} {result['p50_s'] * 1000:10.3f} {result['p95_s'] * 1000:10.3f} "
+              f"{result['p99_s'] * 1000:10.3f} {rows_per_s:>14} {peak:>9}")
+
+# Median latency and peak memory of every case present in both runs; exits with status 1
+# when any of them got worse by more than the threshold
+def compare(args):
+    with open(args.before) as file:
+        before = json.load(file)["results"]
+    with open(args.after) as file:
+        after = json.load(file)["results"]
+    regressions = 0
+    print(f"{'case':<56} {'before ms':>10} {'after ms':>10} {'change':>8}")
+    for name in [name for name in after if name in before]:
+        old, new = before[name], after[name]
+        change = new["p50_s"] / old["p50_s"] - 1 if old["p50_s"] else 0.0
+        flags = []
+        if change > args.threshold:
+            flags.append("SLOWER")
+        elif change < -args.threshold:
+            flags.append("faster")
+        if "peak_bytes" in old and "peak_bytes" in new and old["peak_bytes"]:
+            if new["peak_bytes"] / old["peak_bytes"] - 1 > args.threshold:
+                flags.append("MORE MEMORY")
+        regressions += "SLOWER" in flags or "MORE MEMORY" in flags
+        print(f"{name:<56} {old['p50_s'] * 1000:10.3f} {new['p50_s'] * 1000:10.3f} {change:+8.1%} {' '.join(flags)}")
+    for name in sorted(before.keys() - after.keys()):
+        print(f"{name:<56} only in {args.before}")
+    for name in sorted(after.keys() - before.keys()):
+        print(f"{name:<56} only in {args.after}")
+    print(f"{regressions} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the repository, service and report hot paths")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subcommands.add_parser("run", help="run the benchmarks and write the results as JSON")
+    run_parser.add_argument("--size", action="append", help=f"expense rows: {', '.join(SIZES)} or a number, default 1k and 100k")
+    run_parser.add_argument("--storage", choices=STORAGE_MODES, action="append", help="storage mode(s), default csv")
+    run_parser.add_argument("--repeat", type=int, default=5, help="calls per heavy case; light cases make more")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak memory pass")
+    run_parser.add_argument("--output", default="benchmark_results.json")
+    run_parser.add_argument("--quiet", action="store_true", help="no progress on stderr")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = subcommands.add_parser("compare", help="flag regressions between two result files")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help=f"relative change that counts, default {DEFAULT_THRESHOLD}")
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args()
+    sys.exit(args.handler(args))
+
+if __name__ == "__main__":
+    main()
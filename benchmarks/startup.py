@@ -0,0 +1,97 @@
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Commands timed by default, run against a copy of data/
+COMMANDS = [
+    ["report", "2024", "12"],
+    ["alerts"],
+    ["list", "expenses"],
+]
+
+# Builds the GUI against data_dir and prints the time until the window shell has been drawn
+# and the time until the first tab has its rows
+GUI_PROBE = """
+import sys, time
+start = time.perf_counter()
+from tkinter import Tk
+from ui.finance_gui import FinanceApp
+from service.finance_service import DataService
+from repository.storage import open_data_manager
+root = Tk()
+app = FinanceApp(root, DataService(open_data_manager("cached", sys.argv[1])))
+root.update()
+shell = time.perf_counter()
+while app.table_entity is None and time.perf_counter() - shell < 60:
+    root.update()
+    time.sleep(0.001)
+print((shell - start) * 1000, (time.perf_counter() - start) * 1000)
+root.destroy()
+"""
+
+def has_display():
+    return not sys.platform.startswith("linux") or bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+def time_gui(data_dir, runs):
+    shell, loaded = [], []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", GUI_PROBE, data_dir], cwd=ROOT, capture_output=True, text=True, check=True)
+        values = result.stdout.split()
+        shell.append(float(values[0]))
+        loaded.append(float(values[1]))
+    return shell, loaded
+
+def time_command(argv, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def report_line(label, timings):
+    print(f"{label:<40} min {min(timings):7.1f} ms   median {statistics.median(timings):7.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start time of the command line and GUI entry points")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--importtime", action="store_true", help="also print the slowest imports of cli.py")
+    parser.add_argument("--gui", action="store_true", help="also time the GUI (the window part needs a display)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        for name in ("incomes.csv", "expenses.csv", "budgets.csv"):
+            shutil.copy(os.path.join(ROOT, "data", name), data_dir)
+        # The interpreter on its own, for reference
+        report_line("python -c pass", time_command([sys.executable, "-c", "pass"], args.runs))
+        for command in COMMANDS:
+            argv = [sys.executable, "cli.py", "--data-dir", data_dir] + command
+            report_line("cli.py " + " ".join(command), time_command(argv, args.runs))
+
+        if args.gui:
+            # Tk and the service, without matplotlib, which is only imported to plot a report
+            report_line("import ui.finance_gui", time_command([sys.executable, "-c", "import ui.finance_gui"], args.runs))
+            if has_display():
+                shell, loaded = time_gui(data_dir, args.runs)
+                report_line("GUI window shell drawn", shell)
+                report_line("GUI first tab loaded", loaded)
+            else:
+                print("No display, skipping the GUI window timings")
+
+    if args.importtime:
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import cli"],
+                                cwd=ROOT, capture_output=True, text=True)
+        lines = [line.split("|") for line in result.stderr.splitlines()[1:]]
+        slowest = sorted(lines, key=lambda fields: int(fields[1]), reverse=True)[:15]
+        for _, cumulative, name in slowest:
+            print(f"{int(cumulative) / 1000:7.1f} ms  {name.rstrip()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from repository import csv_loader, instrumentation
+from repository.data_manager import (
+    DataManager, INCOME_HEADER, EXPENSE_HEADER, BUDGET_HEADER, income_to_row, expense_to_row, budget_to_row,
+)
+from repository.partitioned_data_manager import PartitionedDataManager
+from repository.sqlite_data_manager import SqliteDataManager
+from repository.storage import STORAGE_MODES, open_data_manager
+from service.finance_service import DataService
+
+# Headless entry point for scripts and cron jobs. It only imports the repository and
+# service layers, never Tk or matplotlib, and output goes to stdout as CSV or plain text.
+
+ENTITIES = {
+    "incomes": ("income", INCOME_HEADER, income_to_row),
+    "expenses": ("expense", EXPENSE_HEADER, expense_to_row),
+    "budgets": ("budget", BUDGET_HEADER, budget_to_row),
+}
+
+def open_service(args):
+    return DataService(open_data_manager(args.storage, args.data_dir))
+
+def write_records(header, to_row, records):
+    writer = csv.writer(sys.stdout, lineterminator="\n")
+    writer.writerow(header)
+    for record in records:
+        writer.writerow(to_row(record))
+
+def list_records(args):
+    service = open_service(args)
+    entity, header, to_row = ENTITIES[args.entity]
+    if entity == "budget":
+        records = service.iter_budgets()
+    else:
+        start = csv_loader.parse_date(args.start) if args.start else None
+        end = csv_loader.parse_date(args.end) if args.end else None
+        records = service.iter_incomes(start=start, end=end) if entity == "income" else service.iter_expenses(start=start, end=end)
+    write_records(header, to_row, records)
+
+def filter_records(args):
+    service = open_service(args)
+    entity, header, to_row = ENTITIES[args.entity]
+    if entity == "income":
+        records = service.filter_incomes(args.key, args.value)
+    elif entity == "expense":
+        records = service.filter_expenses(args.key, args.value)
+    else:
+        records = service.filter_budgets(args.key, args.value)
+    write_records(header, to_row, records)
+
+def report(args):
+    service = open_service(args)
+    if args.month is None:
+        result = service.generate_yearly_report(args.year)
+        print(f"Report for {args.year}:")
+    else:
+        result = service.generate_monthly_report(args.year, args.month)
+        print(f"Report for {args.month}/{args.year}:")
+    print(f"Total Income: {result['total_income']}")
+    print(f"Total Expenses: {result['total_expense']}")
+    print(f"Savings: {result['savings']}")
+    if args.month is None:
+        for month in result["months"]:
+            print(f"  {month['month']:>2}: income {month['total_income']}, expenses {month['total_expense']}, savings {month['savings']}")
+    else:
+        for category, total in service.get_category_breakdown(args.year, args.month)["expenses"].items():
+            print(f"  {category}: {total}")
+
+def alerts(args):
+    service = open_service(args)
+    notifications = service.check_budget_exceed() + service.detect_unusual_expenses() + service.detect_anomalous_expenses()
+    for notification in notifications:
+        print(notification)
+    # Lets a cron job act on the exit status alone
+    return 1 if notifications and args.exit_status else 0
+
+def migrate_sqlite(args):
+    sqlite_manager = SqliteDataManager(args.data_dir)
+    sqlite_manager.import_from(DataManager(args.data_dir))
+    counts = [len(sqlite_manager.load_incomes()), len(sqlite_manager.load_expenses()), len(sqlite_manager.load_budgets())]
+    sqlite_manager.close()
+    print(f"Imported {counts[0]} incomes, {counts[1]} expenses and {counts[2]} budgets into {sqlite_manager.db_file}.")
+
+def migrate_partitioned(args):
+    partitioned_manager = PartitionedDataManager(args.data_dir)
+    partitioned_manager.import_from(DataManager(args.data_dir))
+    for entity, directory in (("income", partitioned_manager.income_dir), ("expense", partitioned_manager.expense_dir)):
+        counts = partitioned_manager.partition_counts(entity)
+        print(f"Split {sum(counts.values())} {entity} records into {len(counts)} partitions in {directory}.")
+    print("The single-file CSVs were left in place.")
+
+def import_statement(args):
+    category_column = args.category_column or ("source" if args.entity == "incomes" else "category")
+    columns = [category_column, args.amount_column, args.date_column, args.description_column]
+    with open(args.file, mode='r', newline='', encoding=args.encoding) as file:
+        reader = csv.reader(file, delimiter=args.delimiter)
+        header = [name.strip().lower() for name in next(reader, [])]
+        missing = [name for name in columns[:3] if name.lower() not in header]
+        if missing:
+            print(f"{args.file}: missing column(s) {', '.join(missing)}", file=sys.stderr)
+            return 2
+        positions = [header.index(name.lower()) if name.lower() in header else None for name in columns]
+        # Blank lines stay in as empty rows, so the service counts them in its line numbers
+        rows = (tuple(row[i] if i is not None and i < len(row) else "" for i in positions) if row else ()
+                for row in reader)
+        service = DataService(open_data_manager(args.storage, args.data_dir))
+        if args.entity == "incomes":
+            result = service.import_incomes(rows, first_line=2)
+        else:
+            result = service.import_expenses(rows, first_line=2)
+
+    print(f"Imported {result['imported']} {args.entity} from {args.file}.")
+    for line, message in result["errors"]:
+        print(f"{args.file}:{line}: {message}", file=sys.stderr)
+    return 1 if result["errors"] else 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Personal Finance Tracker command line tools")
+    parser.add_argument("--data-dir", default="data", help="directory holding the data files")
+    parser.add_argument("--storage", choices=STORAGE_MODES, default="csv", help="storage backend to read and write")
+    # Diagnostics, all written to stderr or their own file so stdout stays clean
+    parser.add_argument("--log-level", default="WARNING", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="DEBUG logs every timed operation")
+    parser.add_argument("--log-json", action="store_true", help="log one JSON object per line")
+    parser.add_argument("--stats", action="store_true", help="print operation timings and counters when done")
+    parser.add_argument("--stats-file", help="write operation timings and counters to this file as JSON")
+    parser.add_argument("--profile", metavar="FILE", help="save cProfile statistics of the run to FILE")
+    parser.add_argument("--trace-memory", action="store_true", help="print the top allocation sites (tracemalloc)")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    listing = subcommands.add_parser("list", help="print records as CSV")
+    listing.add_argument("entity", choices=ENTITIES)
+    listing.add_argument("--from", dest="start", help="first date to include (YYYY-MM-DD), incomes and expenses only")
+    listing.add_argument("--to", dest="end", help="last date to include (YYYY-MM-DD), incomes and expenses only")
+    listing.set_defaults(handler=list_records)
+
+    filtering = subcommands.add_parser("filter", help="print the records whose attribute equals a value, as CSV")
+    filtering.add_argument("entity", choices=ENTITIES)
+    filtering.add_argument("key", help="attribute, e.g. category, source, amount or date")
+    filtering.add_argument("value")
+    filtering.set_defaults(handler=filter_records)
+
+    reporting = subcommands.add_parser("report", help="monthly report, or yearly report when no month is given")
+    reporting.add_argument("year", type=int)
+    reporting.add_argument("month", type=int, nargs="?", choices=range(1, 13), metavar="month")
+    reporting.set_defaults(handler=report)
+
+    alerting = subcommands.add_parser("alerts", help="print budget alerts and unusual expenses")
+    alerting.add_argument("--exit-status", action="store_true", help="exit with status 1 when there are alerts")
+    alerting.set_defaults(handler=alerts)
+
+    migrate = subcommands.add_parser("migrate-sqlite", help="bulk import the CSV files into data/finance.db")
+    migrate.set_defaults(handler=migrate_sqlite)
+    migrate = subcommands.add_parser("migrate-partitioned", help="split the incomes and expenses into one CSV per month")
+    migrate.set_defaults(handler=migrate_partitioned)
+
+    # Rows with errors are reported and skipped; the rest of the file is still imported
+    statement = subcommands.add_parser("import", help="import incomes or expenses from a bank statement CSV")
+    statement.add_argument("entity", choices=["incomes", "expenses"])
+    statement.add_argument("file", help="CSV file with a header row")
+    statement.add_argument("--category-column", help="column with the source (incomes) or category (expenses)")
+    statement.add_argument("--amount-column", default="amount")
+    statement.add_argument("--date-column", default="date", help="column with YYYY-MM-DD dates")
+    statement.add_argument("--description-column", default="description", help="optional column")
+    statement.add_argument("--delimiter", default=",")
+    statement.add_argument("--encoding", default="utf-8-sig")
+    statement.set_defaults(handler=import_statement)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    instrumentation.configure_logging(args.log_level, args.log_json)
+    try:
+        with instrumentation.capture(args.profile, args.trace_memory):
+            return args.handler(args)
+    except BrokenPipeError:
+        # Output piped into e.g. head, which stopped reading; silence the final flush
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        write_stats(args)
+
+def write_stats(args):
+    if args.stats:
+        print(instrumentation.format_stats(), file=sys.stderr)
+    if args.stats_file:
+        with open(args.stats_file, mode='w') as file:
+            json.dump(instrumentation.STATS.snapshot(), file, indent=2)
+
+if __name__ == "__main__":
+    sys.exit(main())
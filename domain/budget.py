@@ -1,4 +1,6 @@
 class Budget:
+    __slots__ = ("id", "category", "amount")
+
     def __init__(self, id, category, amount):
         self.id = id
         self.category = category
@@ -1,4 +1,6 @@
 class Expense:
+    __slots__ = ("id", "category", "amount", "date", "description")
+
     def __init__(self, id, category, amount, date, description):
         self.id = id
         self.category = category
@@ -1,4 +1,6 @@
 class Income:
+    __slots__ = ("id", "source", "amount", "date", "description")
+
     def __init__(self, id, source, amount, date, description):
         self.id = id
         self.source = source
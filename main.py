@@ -1,11 +1,28 @@
-from tkinter import Tk
-from ui.finance_gui import FinanceApp
+import argparse
+from repository import instrumentation
+from repository.storage import STORAGE_MODES, open_data_manager
 
 def main():
-    # Create the root window for Tkinter
-    root = Tk()
-    app = FinanceApp(root)
-    root.mainloop()
+    parser = argparse.ArgumentParser(description="Personal Finance Tracker")
+    # By default the GUI keeps the ledger in memory and writes every change through to data/*.csv
+    parser.add_argument("--storage", choices=STORAGE_MODES, default="cached")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--log-level", default="WARNING", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    parser.add_argument("--profile", metavar="FILE", help="save cProfile statistics of the session to FILE")
+    parser.add_argument("--trace-memory", action="store_true", help="print the top allocation sites on exit")
+    args = parser.parse_args()
+
+    # Imported after parsing so --help and argument errors do not load Tk
+    from tkinter import Tk
+    from ui.finance_gui import FinanceApp
+    from service.finance_service import DataService
+
+    instrumentation.configure_logging(args.log_level)
+    with instrumentation.capture(args.profile, args.trace_memory):
+        # Create the root window for Tkinter
+        root = Tk()
+        app = FinanceApp(root, DataService(open_data_manager(args.storage, args.data_dir)))
+        root.mainloop()
 
 if __name__ == "__main__":
     main()
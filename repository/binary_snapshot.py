@@ -0,0 +1,216 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import MutableSequence
+from datetime import date
+
+# Binary copy of incomes.csv / expenses.csv (data/incomes.snap, data/expenses.snap) that is
+# opened with mmap instead of parsed. The CSV stays the file of record and the export
+# format; the snapshot remembers the mtime, size and inode of the CSV it was made from and
+# is ignored as soon as the CSV no longer matches them.
+#
+# Layout, native byte order, every section starting on an 8-byte boundary:
+#   header      HEADER struct below
+#   ids         int64 per record
+#   amounts     float64 per record
+#   dates       int32 date ordinal per record, 0 for no date
+#   categories  uint32 index into the dictionary per record (source for incomes)
+#   offsets     uint64 per record + 1, start of each description in the heap
+#   heap        the descriptions, UTF-8, back to back
+#   dictionary  uint64 offsets (count + 1) followed by the distinct categories, UTF-8
+MAGIC = b"FTSNAP01"
+VERSION = 1
+# magic, version, byte order, rows, dictionary entries, CSV mtime_ns, size, inode, then
+# the offset of each section and of the end of the file
+HEADER = struct.Struct("<8sII QQ qqq 8Q")
+BYTE_ORDER = 1 if sys.byteorder == "little" else 2
+# Records decoded per batch when iterating over a whole snapshot
+ITER_CHUNK = 65536
+
+def _pad(size):
+    return -size % 8
+
+# Writes the records to a binary file. Raises ValueError for values the fixed-width
+# columns cannot hold, such as ids beyond 64 bits.
+def write_snapshot(file, records, category_attr, source_signature):
+    ids, amounts, dates, categories, offsets = array("q"), array("d"), array("i"), array("I"), array("Q", [0])
+    codes = {}
+    heap = bytearray()
+    try:
+        for record in records:
+            ids.append(record.id)
+            amounts.append(record.amount)
+            dates.append(record.date.toordinal() if record.date is not None else 0)
+            category = getattr(record, category_attr)
+            code = codes.get(category)
+            if code is None:
+                code = codes[category] = len(codes)
+            categories.append(code)
+            heap += record.description.encode()
+            offsets.append(len(heap))
+    except (OverflowError, TypeError, AttributeError) as error:
+        raise ValueError(f"Cannot store record in a snapshot: {error}") from error
+
+    names = [name.encode() for name in codes]
+    dictionary = array("Q", [0])
+    for name in names:
+        dictionary.append(dictionary[-1] + len(name))
+    sections = [ids.tobytes(), amounts.tobytes(), dates.tobytes(), categories.tobytes(), offsets.tobytes(),
+                bytes(heap), dictionary.tobytes() + b"".join(names)]
+    positions = [HEADER.size]
+    for section in sections:
+        positions.append(positions[-1] + len(section) + _pad(len(section)))
+
+    file.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDER, len(ids), len(names), *source_signature, *positions))
+    for section in sections:
+        file.write(section)
+        file.write(b"\0" * _pad(len(section)))
+
+# The records of a snapshot as a list-like sequence. Nothing is decoded up front: each
+# access builds the record from the mapped columns, so opening a file of any size only
+# costs the mmap call and len() is free. The first change (append, pop, sort, item
+# assignment...) decodes everything into a plain list, which is used from then on, so
+# load-modify-save callers keep working.
+class SnapshotRecords(MutableSequence):
+    def __init__(self, data, factory, rows, dictionary_size, positions):
+        self._list = None
+        self._data = data  # kept referenced for as long as the views below are used
+        view = memoryview(data)
+        self.factory = factory
+        self.ids = view[positions[0]:positions[0] + 8 * rows].cast("q")
+        self.amounts = view[positions[1]:positions[1] + 8 * rows].cast("d")
+        self.dates = view[positions[2]:positions[2] + 4 * rows].cast("i")
+        self.categories = view[positions[3]:positions[3] + 4 * rows].cast("I")
+        self._offsets = view[positions[4]:positions[4] + 8 * (rows + 1)].cast("Q")
+        self._heap = view[positions[5]:positions[6]]
+        dictionary = view[positions[6]:positions[6] + 8 * (dictionary_size + 1)].cast("Q")
+        names = view[positions[6] + 8 * (dictionary_size + 1):positions[7]]
+        self.names = [sys.intern(bytes(names[dictionary[i]:dictionary[i + 1]]).decode()) for i in range(dictionary_size)]
+        self._dates = {0: None}  # ordinal -> date, a ledger has a few thousand distinct ones
+
+    def __len__(self):
+        return len(self._list) if self._list is not None else len(self.ids)
+
+    def __getitem__(self, index):
+        if self._list is not None:
+            return self._list[index]
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return list(self._decode(start, max(start, stop)))
+            return [self._record(i) for i in range(start, stop, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("snapshot index out of range")
+        return self._record(index)
+
+    # Decodes ITER_CHUNK records at a time, a column at a time
+    def __iter__(self):
+        if self._list is not None:
+            yield from self._list
+            return
+        for first in range(0, len(self), ITER_CHUNK):
+            yield from self._decode(first, min(first + ITER_CHUNK, len(self)))
+
+    def _decode(self, first, last):
+        offsets = self._offsets[first:last + 1].tolist()
+        heap = bytes(self._heap[offsets[0]:offsets[-1]])
+        base = offsets[0]
+        if heap.isascii():
+            # Byte offsets are character offsets, so the heap is decoded in one go
+            heap = heap.decode()
+            descriptions = [heap[start - base:end - base] for start, end in zip(offsets, offsets[1:])]
+        else:
+            descriptions = [heap[start - base:end - base].decode() for start, end in zip(offsets, offsets[1:])]
+        names = self.names
+        return map(self.factory, self.ids[first:last].tolist(), [names[code] for code in self.categories[first:last].tolist()],
+                   self.amounts[first:last].tolist(), list(map(self._date, self.dates[first:last].tolist())), descriptions)
+
+    def _date(self, ordinal):
+        value = self._dates.get(ordinal)
+        if value is None and ordinal:
+            value = self._dates[ordinal] = date.fromordinal(ordinal)
+        return value
+
+    def _record(self, i):
+        description = bytes(self._heap[self._offsets[i]:self._offsets[i + 1]]).decode()
+        return self.factory(self.ids[i], self.names[self.categories[i]], self.amounts[i],
+                            self._date(self.dates[i]), description)
+
+    def _materialize(self):
+        if self._list is None:
+            self._list = list(self)
+        return self._list
+
+    def __setitem__(self, index, value):
+        self._materialize()[index] = value
+
+    def __delitem__(self, index):
+        del self._materialize()[index]
+
+    def insert(self, index, value):
+        self._materialize().insert(index, value)
+
+    # The list methods directly, rather than the item-by-item MutableSequence versions
+    def append(self, value):
+        self._materialize().append(value)
+
+    def extend(self, values):
+        self._materialize().extend(values)
+
+    def pop(self, index=-1):
+        return self._materialize().pop(index)
+
+    def reverse(self):
+        self._materialize().reverse()
+
+    def sort(self, *, key=None, reverse=False):
+        self._materialize().sort(key=key, reverse=reverse)
+
+    def copy(self):
+        return list(self)
+
+    # Records dated between start and end (inclusive, like in_date_range); only the date
+    # column is read for the records left out
+    def between(self, start=None, end=None):
+        if start is None and end is None or self._list is not None:
+            for record in self:
+                if start is None and end is None or (
+                        record.date is not None and (start is None or record.date >= start) and (end is None or record.date <= end)):
+                    yield record
+            return
+        low = start.toordinal() if start is not None else 1
+        high = end.toordinal() if end is not None else date.max.toordinal()
+        dates = self.dates
+        for i in range(len(dates)):
+            if low <= dates[i] <= high:
+                yield self._record(i)
+
+# The snapshot at path, or None when it is missing, damaged, from another platform or no
+# longer matches the CSV (source_signature)
+def open_snapshot(path, factory, source_signature):
+    try:
+        with open(path, mode='rb') as file:
+            header = file.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return None
+            magic, version, byte_order, rows, dictionary_size, *rest = HEADER.unpack(header)
+            signature, positions = tuple(rest[:3]), rest[3:]
+            if (magic, version, byte_order) != (MAGIC, VERSION, BYTE_ORDER) or signature != tuple(source_signature):
+                return None
+            if os.fstat(file.fileno()).st_size != positions[7]:
+                return None  # Cut short
+            if os.name == "nt":
+                # A mapped file cannot be replaced on Windows, and a later load may replace it
+                data = header + file.read()
+            else:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except OSError:
+        return None
+    try:
+        return SnapshotRecords(data, factory, rows, dictionary_size, positions)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
@@ -0,0 +1,162 @@
+from repository import instrumentation
+from repository.data_manager import (
+    DataManager, STORAGE_METHODS, in_date_range, check_expected, income_to_row, expense_to_row, budget_to_row,
+)
+
+# Keeps every CSV parsed in memory, keyed by id, and writes changes through to disk.
+# A file is parsed again only when its mtime/size no longer match the ones recorded
+# after the last load or save, so external edits to data/*.csv are still picked up.
+class CachedDataManager(DataManager):
+    def __init__(self, data_dir="data"):
+        super().__init__(data_dir)
+        self._cache = {}  # file path -> (signature, {id: record})
+
+    def _records(self, path, loader):
+        signature = self._file_signature(path)
+        cached = self._cache.get(path)
+        if cached is None or cached[0] != signature:
+            cached = (signature, {record.id: record for record in loader()})
+            self._cache[path] = cached
+        return cached[1]
+
+    def _store(self, path, saver, records):
+        try:
+            saver(list(records.values()))
+        except Exception:
+            # The file may be half written, so the cache can no longer be trusted
+            self._cache.pop(path, None)
+            raise
+        self._cache[path] = (self._file_signature(path), records)
+
+    # Load data
+    def load_incomes(self):
+        return list(self._records(self.income_file, super().load_incomes).values())
+
+    def load_expenses(self):
+        return list(self._records(self.expense_file, super().load_expenses).values())
+
+    def load_budgets(self):
+        return list(self._records(self.budget_file, super().load_budgets).values())
+
+    # Straight from the cache
+    def _scan_max_id(self, entity):
+        records = {"income": self.load_incomes, "expense": self.load_expenses, "budget": self.load_budgets}[entity]()
+        return max((record.id for record in records), default=0)
+
+    # The records are in memory already, so streaming just walks the cache
+    def iter_incomes(self, predicate=None, start=None, end=None):
+        return self._iter_cached(self.load_incomes(), predicate, start, end)
+
+    def iter_expenses(self, predicate=None, start=None, end=None):
+        return self._iter_cached(self.load_expenses(), predicate, start, end)
+
+    def iter_budgets(self, predicate=None):
+        return self._iter_cached(self.load_budgets(), predicate, None, None)
+
+    def _iter_cached(self, records, predicate, start, end):
+        for record in records:
+            if in_date_range(getattr(record, "date", None), start, end) and (predicate is None or predicate(record)):
+                yield record
+
+    # Save data
+    def save_incomes(self, incomes):
+        self._store(self.income_file, super().save_incomes, {income.id: income for income in incomes})
+
+    def save_expenses(self, expenses):
+        self._store(self.expense_file, super().save_expenses, {expense.id: expense for expense in expenses})
+
+    def save_budgets(self, budgets):
+        self._store(self.budget_file, super().save_budgets, {budget.id: budget for budget in budgets})
+
+    # Bulk append: the file is only appended to, and the cache is extended in place if it
+    # was up to date before the write
+    def append_incomes(self, incomes):
+        self._append_records(self.income_file, super().append_incomes, incomes)
+
+    def append_expenses(self, expenses):
+        self._append_records(self.expense_file, super().append_expenses, expenses)
+
+    def _append_records(self, path, appender, new_records):
+        with self.lock:
+            cached = self._cache.pop(path, None)
+            if cached is not None and cached[0] != self._file_signature(path):
+                cached = None
+            appender(new_records)
+            if cached is not None:
+                records = cached[1]
+                records.update((record.id, record) for record in new_records)
+                self._cache[path] = (self._file_signature(path), records)
+
+    # CRUD Operations for Income
+    def create_income(self, income):
+        with self.lock:
+            incomes = self._records(self.income_file, super().load_incomes)
+            incomes[income.id] = income
+            self._store(self.income_file, super().save_incomes, incomes)
+
+    def update_income(self, income_id, updated_income, expected=None):
+        with self.lock:
+            incomes = self._records(self.income_file, super().load_incomes)
+            check_expected(incomes, income_id, expected, income_to_row)
+            if income_id not in incomes:
+                return False
+            incomes[income_id] = updated_income
+            self._store(self.income_file, super().save_incomes, incomes)
+        return True
+
+    def delete_income(self, income_id, expected=None):
+        with self.lock:
+            incomes = self._records(self.income_file, super().load_incomes)
+            check_expected(incomes, income_id, expected, income_to_row)
+            incomes.pop(income_id, None)
+            self._store(self.income_file, super().save_incomes, incomes)
+
+    # CRUD Operations for Expense
+    def create_expense(self, expense):
+        with self.lock:
+            expenses = self._records(self.expense_file, super().load_expenses)
+            expenses[expense.id] = expense
+            self._store(self.expense_file, super().save_expenses, expenses)
+
+    def update_expense(self, expense_id, updated_expense, expected=None):
+        with self.lock:
+            expenses = self._records(self.expense_file, super().load_expenses)
+            check_expected(expenses, expense_id, expected, expense_to_row)
+            if expense_id not in expenses:
+                return False
+            expenses[expense_id] = updated_expense
+            self._store(self.expense_file, super().save_expenses, expenses)
+        return True
+
+    def delete_expense(self, expense_id, expected=None):
+        with self.lock:
+            expenses = self._records(self.expense_file, super().load_expenses)
+            check_expected(expenses, expense_id, expected, expense_to_row)
+            expenses.pop(expense_id, None)
+            self._store(self.expense_file, super().save_expenses, expenses)
+
+    # CRUD Operations for Budget
+    def create_budget(self, budget):
+        with self.lock:
+            budgets = self._records(self.budget_file, super().load_budgets)
+            budgets[budget.id] = budget
+            self._store(self.budget_file, super().save_budgets, budgets)
+
+    def update_budget(self, budget_id, updated_budget, expected=None):
+        with self.lock:
+            budgets = self._records(self.budget_file, super().load_budgets)
+            check_expected(budgets, budget_id, expected, budget_to_row)
+            if budget_id not in budgets:
+                return False
+            budgets[budget_id] = updated_budget
+            self._store(self.budget_file, super().save_budgets, budgets)
+        return True
+
+    def delete_budget(self, budget_id, expected=None):
+        with self.lock:
+            budgets = self._records(self.budget_file, super().load_budgets)
+            check_expected(budgets, budget_id, expected, budget_to_row)
+            budgets.pop(budget_id, None)
+            self._store(self.budget_file, super().save_budgets, budgets)
+
+instrumentation.instrument(CachedDataManager, STORAGE_METHODS)
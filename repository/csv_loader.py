@@ -0,0 +1,100 @@
+import csv
+import io
+import locale
+import mmap
+import os
+import sys
+from datetime import date, datetime
+from repository import instrumentation
+
+# Files at least this big are split into byte ranges and decoded in a process pool
+PARALLEL_THRESHOLD = 32 * 1024 * 1024
+
+_dates = {}
+
+# Memoized replacement for datetime.strptime(text, '%Y-%m-%d').date(): a ledger only has a
+# few thousand distinct dates, and zero-padded ISO dates take the much cheaper
+# date.fromisoformat path. Anything else still goes through strptime, so the accepted
+# inputs and the errors raised are unchanged. An empty field is a missing date.
+def parse_date(text):
+    try:
+        return _dates[text]
+    except KeyError:
+        pass
+    if not text:
+        value = None
+    elif len(text) == 10 and text[4] == '-' and text[7] == '-' and text[:4].isdigit():
+        value = date.fromisoformat(text)
+    else:
+        value = datetime.strptime(text, '%Y-%m-%d').date()
+    if len(_dates) < 100_000:
+        _dates[text] = value
+    return value
+
+# Column converters for each file layout; None keeps the text as it is
+INCOME_COLUMNS = (int, sys.intern, float, parse_date, None)
+EXPENSE_COLUMNS = (int, sys.intern, float, parse_date, None)
+BUDGET_COLUMNS = (int, sys.intern, float)
+
+def _convert(rows, converters, from_row):
+    rows = [row for row in rows if row]
+    width = len(converters)
+    if any(len(row) != width for row in rows):
+        # Ragged rows: convert one by one so short rows fail exactly like the row loader
+        return None, [from_row(row) for row in rows]
+    columns = list(zip(*rows)) if rows else [()] * width
+    return [list(column) if convert is None else list(map(convert, column))
+            for convert, column in zip(converters, columns)], None
+
+def _decode_chunk(path, start, end, converters, from_row):
+    with open(path, mode='rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode(locale.getpreferredencoding(False))
+    return _convert(csv.reader(io.StringIO(text, newline='')), converters, from_row)
+
+def _chunk_bounds(path, size, chunks):
+    with open(path, mode='rb') as file:
+        file.readline()  # Skip header
+        bounds = [file.tell()]
+        for i in range(1, chunks):
+            file.seek(max(size * i // chunks, bounds[-1]))
+            file.readline()
+            bounds.append(file.tell())
+        bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+def _splittable(path):
+    # Quoted fields may contain newlines, so only quote-free files are cut at line breaks
+    with open(path, mode='rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return data.find(b'"') == -1
+
+# Loads every record of a CSV file written by DataManager. Values are converted a whole
+# column at a time; large files are decoded in parallel. The result is the same list the
+# row-by-row loader (from_row over each non-empty row) produces.
+def load_records(path, factory, converters, from_row, workers=None):
+    size = os.path.getsize(path)
+    workers = workers or os.cpu_count() or 1
+    if size >= PARALLEL_THRESHOLD and workers > 1 and _splittable(path):
+        from concurrent.futures import ProcessPoolExecutor  # Only large files pay for the import
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_decode_chunk, path, start, end, converters, from_row)
+                       for start, end in _chunk_bounds(path, size, workers * 4)]
+            parts = [future.result() for future in futures]
+    else:
+        with open(path, mode='r', newline='') as file:
+            reader = csv.reader(file)
+            next(reader, None)  # Skip header
+            parts = [_convert(reader, converters, from_row)]
+
+    records = []
+    for columns, rows in parts:
+        if rows is not None:
+            records.extend(rows)
+            continue
+        if len(parts) > 1:
+            # Strings come back from the worker processes as new objects
+            columns = [list(map(sys.intern, column)) if convert is sys.intern else column
+                       for convert, column in zip(converters, columns)]
+        records.extend(map(factory, *columns))
+    instrumentation.count("rows_read", len(records))
+    return records
@@ -1,132 +1,427 @@
 import csv
+import io
+import logging
+import os
+import sys
 from domain.income import Income
 from domain.expense import Expense
 from domain.budget import Budget
-from datetime import datetime 
+from repository import binary_snapshot, csv_loader, instrumentation
+from repository.file_lock import FileLock
 
+logger = logging.getLogger(__name__)
+
+INCOME_HEADER = ["id", "source", "amount", "date", "description"]
+EXPENSE_HEADER = ["id", "category", "amount", "date", "description"]
+BUDGET_HEADER = ["id", "category", "amount"]
+
+# Conversions between CSV rows and domain objects, shared by every storage mode.
+# Sources and categories repeat across rows, so they are interned to share one string.
+def income_from_row(row):
+    date_obj = csv_loader.parse_date(row[3])
+    return Income(int(row[0]), sys.intern(row[1]), float(row[2]), date_obj, row[4])
+
+def expense_from_row(row):
+    date_obj = csv_loader.parse_date(row[3])
+    return Expense(int(row[0]), sys.intern(row[1]), float(row[2]), date_obj, row[4])
+
+def budget_from_row(row):
+    return Budget(int(row[0]), sys.intern(row[1]), float(row[2]))
+
+def income_to_row(income):
+    return [income.id, income.source, income.amount, income.date, income.description]
+
+def expense_to_row(expense):
+    return [expense.id, expense.category, expense.amount, expense.date, expense.description]
+
+def budget_to_row(budget):
+    return [budget.id, budget.category, budget.amount]
+
+def in_date_range(date_obj, start, end):
+    # With no bounds every record matches; with bounds, records without a date never do
+    if start is None and end is None:
+        return True
+    return date_obj is not None and (start is None or date_obj >= start) and (end is None or date_obj <= end)
+
+# Raised by update_*/delete_* when the stored record no longer matches the `expected` one
+# the caller based its change on, i.e. someone else changed or deleted it in the meantime
+class ConflictError(Exception):
+    pass
+
+def check_expected(records, record_id, expected, to_row):
+    # records is a list or an {id: record} dict
+    if expected is None:
+        return
+    if isinstance(records, dict):
+        current = records.get(record_id)
+    else:
+        current = next((record for record in records if record.id == record_id), None)
+    if current is None or to_row(current) != to_row(expected):
+        raise ConflictError(f"Record {record_id} was changed or deleted by someone else. Reload and try again.")
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+# Replaces path with a complete new file: write(file) fills a temporary file in the same
+# directory, which is flushed to disk and then renamed over the old one, so a crash or a
+# concurrent reader never sees a half-written file
+def replace_atomic(path, write, binary=False):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, mode='wb') if binary else open(temp_path, mode='w', newline='') as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+            instrumentation.count("bytes_written", file.tell())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def write_csv_atomic(path, header, rows):
+    def write(file):
+        writer = csv.writer(file)
+        writer.writerow(header)  # Header row
+        writer.writerows(rows)
+    replace_atomic(path, write)
+
+# Reads are lock-free (files are only ever replaced whole or appended to); every write,
+# and every read-modify-write cycle, holds `lock`, one lock file per data directory
+# shared with the other storage modes and processes
 class DataManager:
-    def __init__(self):
-        self.income_file = "data/incomes.csv"
-        self.expense_file = "data/expenses.csv"
-        self.budget_file = "data/budgets.csv"
+    def __init__(self, data_dir="data"):
+        self.data_dir = data_dir
+        self.income_file = os.path.join(data_dir, "incomes.csv")
+        self.expense_file = os.path.join(data_dir, "expenses.csv")
+        self.budget_file = os.path.join(data_dir, "budgets.csv")
+        self.lock = FileLock(os.path.join(data_dir, ".lock"))
+        self.sequence_files = {entity: os.path.join(data_dir, f"{entity}s.seq") for entity in ("income", "expense", "budget")}
+        self._max_ids = {}  # entity -> (data_version, highest stored id)
+        # Binary copies of the income and expense CSVs that load without parsing, see
+        # repository/binary_snapshot.py: CSV path -> (snapshot path, record class, category attribute)
+        self.snapshot_files = {
+            self.income_file: (os.path.join(data_dir, "incomes.snap"), Income, "source"),
+            self.expense_file: (os.path.join(data_dir, "expenses.snap"), Expense, "category"),
+        }
+
+    def _file_signature(self, path):
+        return file_signature(path)
+
+    # Token that changes whenever the stored data of an entity ("income", "expense" or
+    # "budget") changes, letting callers tell whether what they derived from it is stale
+    def data_version(self, entity):
+        files = {"income": self.income_file, "expense": self.expense_file, "budget": self.budget_file}
+        return self._file_signature(files[entity])
+
+    # Reserves count consecutive new ids for entity and returns the first. The next free id
+    # is kept in data/<entity>s.seq, so an id is never handed out twice, not even after the
+    # record that had it is deleted. Records added behind the counter's back (an edited or
+    # restored CSV, data migrated back from another storage mode) would collide with it, so
+    # it never goes below the highest stored id + 1 either.
+    def next_ids(self, entity, count=1):
+        path = self.sequence_files[entity]
+        with self.lock:
+            try:
+                with open(path) as file:
+                    counter = int(file.read())
+            except (FileNotFoundError, ValueError):
+                counter = 1
+            first = max(counter, self._max_id(entity) + 1)
+            replace_atomic(path, lambda file: file.write(f"{first + count}\n"))
+        return first
+
+    # Highest stored id of entity. Scanned on first use and whenever the data_version moved
+    # without this manager writing (another process, a hand edit); this manager's own writes
+    # keep it up to date through _note_ids, so the counter is checked against it for free.
+    def _max_id(self, entity):
+        version = self.data_version(entity)
+        cached = self._max_ids.get(entity)
+        if cached is None or cached[0] != version:
+            cached = self._max_ids[entity] = (version, self._scan_max_id(entity))
+        return cached[1]
 
-    # Load data
+    # Called after a write of records with the given ids, made while the data was at
+    # version. The highest id stays an upper bound after deletes, which is all next_ids needs.
+    def _note_ids(self, entity, version, ids):
+        cached = self._max_ids.get(entity)
+        if cached is not None and cached[0] == version:
+            self._max_ids[entity] = (self.data_version(entity), max(cached[1], max(ids, default=0)))
+
+    def _scan_max_id(self, entity):
+        if entity != "budget":
+            # The id column of a current binary snapshot, without decoding any record
+            path = self.income_file if entity == "income" else self.expense_file
+            signature = file_signature(path)
+            records = self._open_snapshot(path, signature) if signature is not None else None
+            if records is not None:
+                return max(records.ids, default=0)
+        records = {"income": self.iter_incomes, "expense": self.iter_expenses, "budget": self.iter_budgets}[entity]()
+        return max((record.id for record in records), default=0)
+
+    # Load data. Incomes and expenses come from the binary snapshot when it matches the CSV,
+    # as a list-like sequence decoding records on access; otherwise the CSV is parsed into a
+    # list and the snapshot written for the next load. Saves only write the CSV, so a run
+    # of single-record writes does not pay for a snapshot each; the load after them does.
     def load_incomes(self):
-        incomes = []
         try:
-            with open(self.income_file, mode='r', newline='') as file:
-                reader = csv.reader(file)
-                next(reader)  # Skip header
-                for row in reader:
-                    if row:
-                        date_obj = datetime.strptime(row[3], '%Y-%m-%d').date() if row[3] else None
-                        incomes.append(Income(int(row[0]), row[1], float(row[2]), date_obj, row[4]))
+            return self._load_snapshot_or_csv(self.income_file, csv_loader.INCOME_COLUMNS, income_from_row)
         except FileNotFoundError:
-            print(f"{self.income_file} not found.")
-        return incomes
+            logger.warning("%s not found", self.income_file, extra={"fields": {"path": self.income_file}})
+        return []
 
     def load_expenses(self):
-        expenses = []
         try:
-            with open(self.expense_file, mode='r', newline='') as file:
-                reader = csv.reader(file)
-                next(reader)  # Skip header
-                for row in reader:
-                    if row:
-                        date_obj = datetime.strptime(row[3], '%Y-%m-%d').date() if row[3] else None
-                        expenses.append(Expense(int(row[0]), row[1], float(row[2]), date_obj, row[4]))
+            return self._load_snapshot_or_csv(self.expense_file, csv_loader.EXPENSE_COLUMNS, expense_from_row)
         except FileNotFoundError:
-            print(f"{self.expense_file} not found.")
-        return expenses
+            logger.warning("%s not found", self.expense_file, extra={"fields": {"path": self.expense_file}})
+        return []
 
     def load_budgets(self):
-        budgets = []
         try:
-            with open(self.budget_file, mode='r', newline='') as file:
-                reader = csv.reader(file)
-                next(reader)  # Skip header
-                for row in reader:
-                    if row:
-                        budgets.append(Budget(int(row[0]), row[1], float(row[2])))
+            return csv_loader.load_records(self.budget_file, Budget, csv_loader.BUDGET_COLUMNS, budget_from_row)
         except FileNotFoundError:
-            print(f"{self.budget_file} not found.")
-        return budgets
+            logger.warning("%s not found", self.budget_file, extra={"fields": {"path": self.budget_file}})
+        return []
+
+    def _load_snapshot_or_csv(self, path, columns, from_row):
+        signature = file_signature(path)
+        if signature is None:
+            raise FileNotFoundError(path)
+        records = self._open_snapshot(path, signature)
+        if records is not None:
+            return records
+        records = csv_loader.load_records(path, self.snapshot_files[path][1], columns, from_row)
+        self._write_snapshot(path, records, signature)
+        return records
+
+    def _open_snapshot(self, path, signature):
+        snapshot_path, factory, _ = self.snapshot_files[path]
+        return binary_snapshot.open_snapshot(snapshot_path, factory, signature)
+
+    # Best effort: without a snapshot the next load just parses the CSV again
+    def _write_snapshot(self, path, records, signature=None):
+        snapshot_path, _, category_attr = self.snapshot_files[path]
+        signature = signature or file_signature(path)
+        try:
+            replace_atomic(snapshot_path, lambda file: binary_snapshot.write_snapshot(
+                file, records, category_attr, signature), binary=True)
+        except (OSError, ValueError) as error:
+            logger.info("%s not written: %s", snapshot_path, error, extra={"fields": {"path": snapshot_path}})
+
+    # Stream records from disk one row at a time, keeping memory flat however big the
+    # file is. start/end (inclusive dates) are checked before the rest of the row is
+    # converted; predicate is applied to the finished record.
+    def iter_incomes(self, predicate=None, start=None, end=None):
+        return self._iter_file(self.income_file, income_from_row, predicate, start, end, 3)
+
+    def iter_expenses(self, predicate=None, start=None, end=None):
+        return self._iter_file(self.expense_file, expense_from_row, predicate, start, end, 3)
+
+    def iter_budgets(self, predicate=None):
+        return self._iter_file(self.budget_file, budget_from_row, predicate, None, None, None)
+
+    def _iter_file(self, path, from_row, predicate, start, end, date_column):
+        if path in self.snapshot_files:
+            signature = file_signature(path)
+            records = self._open_snapshot(path, signature) if signature is not None else None
+            if records is not None:
+                for record in records.between(start, end):
+                    if predicate is None or predicate(record):
+                        yield record
+                return
+        try:
+            file = open(path, mode='r', newline='')
+        except FileNotFoundError:
+            logger.warning("%s not found", path, extra={"fields": {"path": path}})
+            return
+        rows = 0
+        with file:
+            reader = csv.reader(file)
+            next(reader, None)  # Skip header
+            try:
+                for row in reader:
+                    if not row:
+                        continue
+                    rows += 1
+                    if date_column is not None and not in_date_range(csv_loader.parse_date(row[date_column]), start, end):
+                        continue
+                    record = from_row(row)
+                    if predicate is None or predicate(record):
+                        yield record
+            finally:
+                instrumentation.count("rows_read", rows)
 
     # Save data
     def save_incomes(self, incomes):
-        with open(self.income_file, mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(["id", "source", "amount", "date", "description"])  # Header row
-            for income in incomes:
-                writer.writerow([income.id, income.source, income.amount, income.date, income.description])
+        with self.lock:
+            version = self.data_version("income")
+            write_csv_atomic(self.income_file, INCOME_HEADER, map(income_to_row, incomes))
+            self._note_ids("income", version, [income.id for income in incomes])
 
     def save_expenses(self, expenses):
-        with open(self.expense_file, mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(["id", "category", "amount", "date", "description"])  # Header row
-            for expense in expenses:
-                writer.writerow([expense.id, expense.category, expense.amount, expense.date, expense.description])
+        with self.lock:
+            version = self.data_version("expense")
+            write_csv_atomic(self.expense_file, EXPENSE_HEADER, map(expense_to_row, expenses))
+            self._note_ids("expense", version, [expense.id for expense in expenses])
 
     def save_budgets(self, budgets):
-        with open(self.budget_file, mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(["id", "category", "amount"])  # Header row
-            for budget in budgets:
-                writer.writerow([budget.id, budget.category, budget.amount])
+        with self.lock:
+            version = self.data_version("budget")
+            write_csv_atomic(self.budget_file, BUDGET_HEADER, map(budget_to_row, budgets))
+            self._note_ids("budget", version, [budget.id for budget in budgets])
 
-    # CRUD Operations for Income
+    # Bulk append: the new records are added to the end of the file in a single write,
+    # without reading or rewriting what is already there
+    def append_incomes(self, incomes):
+        with self.lock:
+            version = self.data_version("income")
+            self._append_rows(self.income_file, INCOME_HEADER, map(income_to_row, incomes))
+            self._note_ids("income", version, [income.id for income in incomes])
+
+    def append_expenses(self, expenses):
+        with self.lock:
+            version = self.data_version("expense")
+            self._append_rows(self.expense_file, EXPENSE_HEADER, map(expense_to_row, expenses))
+            self._note_ids("expense", version, [expense.id for expense in expenses])
+
+    def _append_rows(self, path, header, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        with self.lock:
+            try:
+                with open(path, mode='rb') as file:
+                    file.seek(-1, os.SEEK_END)
+                    if file.read(1) != b'\n':
+                        buffer.write('\r\n')  # Hand-edited file without a final line break
+            except OSError:
+                writer.writerow(header)  # Missing or empty file: start with the header row
+            writer.writerows(rows)
+            with open(path, mode='a', newline='') as file:
+                instrumentation.count("bytes_written", file.write(buffer.getvalue()))
+                file.flush()
+                os.fsync(file.fileno())
+
+    # CRUD Operations for Income. update/delete with `expected` raise ConflictError unless
+    # the stored record still equals it; update returns False, without writing anything,
+    # when no record has the id.
     def create_income(self, income):
-        incomes = self.load_incomes()
-        incomes.append(income)
-        self.save_incomes(incomes)
-
-    def update_income(self, income_id, updated_income):
-        incomes = self.load_incomes()
-        for i, income in enumerate(incomes):
-            if income.id == income_id:
-                incomes[i] = updated_income
-                break
-        self.save_incomes(incomes)
-
-    def delete_income(self, income_id):
-        incomes = self.load_incomes()
-        incomes = [income for income in incomes if income.id != income_id]
-        self.save_incomes(incomes)
+        with self.lock:
+            incomes = self.load_incomes()
+            incomes.append(income)
+            self.save_incomes(incomes)
+
+    def update_income(self, income_id, updated_income, expected=None):
+        with self.lock:
+            incomes = self.load_incomes()
+            check_expected(incomes, income_id, expected, income_to_row)
+            for i, income in enumerate(incomes):
+                if income.id == income_id:
+                    incomes[i] = updated_income
+                    break
+            else:
+                return False
+            self.save_incomes(incomes)
+        return True
+
+    def delete_income(self, income_id, expected=None):
+        with self.lock:
+            incomes = self.load_incomes()
+            check_expected(incomes, income_id, expected, income_to_row)
+            incomes = [income for income in incomes if income.id != income_id]
+            self.save_incomes(incomes)
 
     # CRUD Operations for Expense
     def create_expense(self, expense):
-        expenses = self.load_expenses()
-        expenses.append(expense)
-        self.save_expenses(expenses)
-
-    def update_expense(self, expense_id, updated_expense):
-        expenses = self.load_expenses()
-        for i, expense in enumerate(expenses):
-            if expense.id == expense_id:
-                expenses[i] = updated_expense
-                break
-        self.save_expenses(expenses)
-
-    def delete_expense(self, expense_id):
-        expenses = self.load_expenses()
-        expenses = [expense for expense in expenses if expense.id != expense_id]
-        self.save_expenses(expenses)
+        with self.lock:
+            expenses = self.load_expenses()
+            expenses.append(expense)
+            self.save_expenses(expenses)
+
+    def update_expense(self, expense_id, updated_expense, expected=None):
+        with self.lock:
+            expenses = self.load_expenses()
+            check_expected(expenses, expense_id, expected, expense_to_row)
+            for i, expense in enumerate(expenses):
+                if expense.id == expense_id:
+                    expenses[i] = updated_expense
+                    break
+            else:
+                return False
+            self.save_expenses(expenses)
+        return True
+
+    def delete_expense(self, expense_id, expected=None):
+        with self.lock:
+            expenses = self.load_expenses()
+            check_expected(expenses, expense_id, expected, expense_to_row)
+            expenses = [expense for expense in expenses if expense.id != expense_id]
+            self.save_expenses(expenses)
 
     # CRUD Operations for Budget
     def create_budget(self, budget):
-        budgets = self.load_budgets()
-        budgets.append(budget)
-        self.save_budgets(budgets)
-
-    def update_budget(self, budget_id, updated_budget):
-        budgets = self.load_budgets()
-        for i, budget in enumerate(budgets):
-            if budget.id == budget_id:
-                budgets[i] = updated_budget
-                break
-        self.save_budgets(budgets)
-
-    def delete_budget(self, budget_id):
-        budgets = self.load_budgets()
-        budgets = [budget for budget in budgets if budget.id != budget_id]
-        self.save_budgets(budgets)
+        with self.lock:
+            budgets = self.load_budgets()
+            budgets.append(budget)
+            self.save_budgets(budgets)
+
+    def update_budget(self, budget_id, updated_budget, expected=None):
+        with self.lock:
+            budgets = self.load_budgets()
+            check_expected(budgets, budget_id, expected, budget_to_row)
+            for i, budget in enumerate(budgets):
+                if budget.id == budget_id:
+                    budgets[i] = updated_budget
+                    break
+            else:
+                return False
+            self.save_budgets(budgets)
+        return True
+
+    def delete_budget(self, budget_id, expected=None):
+        with self.lock:
+            budgets = self.load_budgets()
+            check_expected(budgets, budget_id, expected, budget_to_row)
+            budgets = [budget for budget in budgets if budget.id != budget_id]
+            self.save_budgets(budgets)
+
+    # Applies a batch of changes to one entity with a single save. changes holds
+    # (record_id, record, expected, insert) tuples, applied in order: a record of None
+    # deletes, any other replaces the stored one with its id, or is added when there is
+    # none and insert is true (an update of a missing record is skipped otherwise);
+    # expected is checked as in update_*/delete_*, against the batch so far, and a
+    # ConflictError leaves the file untouched. Returns the record each change replaced
+    # (None when there was none), which is what it takes to undo the batch.
+    def apply_changes(self, entity, changes):
+        loader, saver, to_row = {
+            "income": (self.load_incomes, self.save_incomes, income_to_row),
+            "expense": (self.load_expenses, self.save_expenses, expense_to_row),
+            "budget": (self.load_budgets, self.save_budgets, budget_to_row),
+        }[entity]
+        with self.lock:
+            records = {record.id: record for record in loader()}
+            previous, changed = [], False
+            for record_id, record, expected, insert in changes:
+                check_expected(records, record_id, expected, to_row)
+                previous.append(records.get(record_id))
+                if record is None:
+                    changed |= records.pop(record_id, None) is not None
+                elif insert or record_id in records:
+                    records[record_id] = record
+                    changed = True
+            if changed:
+                saver(list(records.values()))
+        return previous
+
+# Storage operations timed by instrumentation.STATS, in every storage mode
+STORAGE_METHODS = (
+    "next_ids", "load_incomes", "load_expenses", "load_budgets", "save_incomes", "save_expenses", "save_budgets",
+    "append_incomes", "append_expenses", "create_income", "update_income", "delete_income", "create_expense",
+    "update_expense", "delete_expense", "create_budget", "update_budget", "delete_budget", "query", "monthly_totals",
+    "compact", "import_from", "apply_changes",
+)
+instrumentation.instrument(DataManager, STORAGE_METHODS)
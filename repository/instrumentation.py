@@ -0,0 +1,168 @@
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Process-wide timings of the storage, service and GUI operations plus the rows read and
+# bytes written under each of them. An operation's counters include everything done by the
+# operations it calls, so DataService.create_expense shows the rows its CSV rewrite had to
+# read back and the bytes it wrote, and DataManager.load_expenses shows only its own read.
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations = {}  # name -> {"calls", "seconds", "max_seconds", counter: total}
+        self._counters = {}  # counter -> total over the whole process
+
+    def record(self, name, elapsed, counters):
+        with self._lock:
+            operation = self._operations.get(name)
+            if operation is None:
+                operation = self._operations[name] = {"calls": 0, "seconds": 0.0, "max_seconds": 0.0}
+            operation["calls"] += 1
+            operation["seconds"] += elapsed
+            operation["max_seconds"] = max(operation["max_seconds"], elapsed)
+            for counter, amount in counters.items():
+                operation[counter] = operation.get(counter, 0) + amount
+
+    def add(self, counter, amount):
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "operations": {name: dict(operation) for name, operation in sorted(self._operations.items())},
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+            self._counters.clear()
+
+STATS = Stats()
+
+# Counters of the operations running on this thread, innermost last
+_active = threading.local()
+
+# Adds to a counter such as rows_read or bytes_written, for the process and for every
+# operation currently running on this thread
+def count(counter, amount):
+    STATS.add(counter, amount)
+    for counters in getattr(_active, "stack", ()):
+        counters[counter] = counters.get(counter, 0) + amount
+
+def _stack():
+    stack = getattr(_active, "stack", None)
+    if stack is None:
+        stack = _active.stack = []
+    return stack
+
+def _finish(name, start, stack, counters):
+    elapsed = time.perf_counter() - start
+    stack.pop()
+    STATS.record(name, elapsed, counters)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("operation finished", extra={"fields": {"operation": name, "ms": round(elapsed * 1000, 3), **counters}})
+
+@contextmanager
+def timed(name):
+    stack = _stack()
+    counters = {}
+    stack.append(counters)
+    start = time.perf_counter()
+    try:
+        yield counters
+    finally:
+        _finish(name, start, stack, counters)
+
+# Same as timed(), without the context manager's cost on calls that may take microseconds
+def _timed_method(name, method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        stack = _stack()
+        counters = {}
+        stack.append(counters)
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _finish(name, start, stack, counters)
+    return wrapper
+
+# Times the listed methods of cls, recorded as "<class>.<method>". Only methods defined on
+# cls itself are wrapped, so a subclass instruments just its own overrides and a call that
+# goes through super() shows up under both classes.
+def instrument(cls, method_names):
+    for name in method_names:
+        if name in cls.__dict__:
+            setattr(cls, name, _timed_method(f"{cls.__name__}.{name}", cls.__dict__[name]))
+    return cls
+
+def format_stats(snapshot=None):
+    snapshot = snapshot if snapshot is not None else STATS.snapshot()
+    lines = [f"{'operation':<44} {'calls':>7} {'total ms':>11} {'mean ms':>9} {'max ms':>9} {'rows read':>11} {'bytes written':>14}"]
+    for name, operation in snapshot["operations"].items():
+        lines.append(f"{name:<44} {operation['calls']:>7} {operation['seconds'] * 1000:>11.2f} "
+                     f"{operation['seconds'] * 1000 / operation['calls']:>9.3f} {operation['max_seconds'] * 1000:>9.3f} "
+                     f"{operation.get('rows_read', 0):>11} {operation.get('bytes_written', 0):>14}")
+    if snapshot["counters"]:
+        lines.append("totals: " + ", ".join(f"{counter}={amount}" for counter, amount in snapshot["counters"].items()))
+    return "\n".join(lines)
+
+# One line per event: the message followed by its fields as key=value, or a JSON object
+class StructuredFormatter(logging.Formatter):
+    def __init__(self, as_json=False):
+        super().__init__()
+        self.as_json = as_json
+
+    def format(self, record):
+        fields = getattr(record, "fields", {})
+        if self.as_json:
+            event = {"time": round(record.created, 3), "level": record.levelname, "logger": record.name,
+                     "message": record.getMessage(), **fields}
+            return json.dumps(event, default=str)
+        text = f"{record.levelname.lower()} {record.name}: {record.getMessage()}"
+        return " ".join([text] + [f"{key}={value}" for key, value in fields.items()])
+
+def configure_logging(level="WARNING", as_json=False, stream=None):
+    handler = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    handler.setFormatter(StructuredFormatter(as_json))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+
+# Opt-in capture around a whole run: cProfile statistics saved to profile_path (open with
+# pstats or snakeviz) and the top allocation sites by tracemalloc, written to stream
+@contextmanager
+def capture(profile_path=None, trace_memory=False, stream=None, top=15):
+    stream = stream if stream is not None else sys.stderr
+    profiler = None
+    if profile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+    if trace_memory:
+        import tracemalloc
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            print(f"Profile written to {profile_path}", file=stream)
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "*/cProfile.py")])
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"Memory: {current / 2**20:.1f} MB allocated, {peak / 2**20:.1f} MB peak. Top allocation sites:", file=stream)
+            for statistic in snapshot.statistics("lineno")[:top]:
+                print(f"  {statistic}", file=stream)
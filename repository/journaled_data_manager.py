@@ -0,0 +1,206 @@
+import csv
+import io
+import os
+from repository import instrumentation
+from repository.cached_data_manager import CachedDataManager
+from repository.data_manager import (
+    INCOME_HEADER, EXPENSE_HEADER, STORAGE_METHODS, income_from_row, expense_from_row, income_to_row, expense_to_row,
+    check_expected, write_csv_atomic,
+)
+
+CREATE = "C"
+UPDATE = "U"
+DELETE = "D"
+
+# Incomes and expenses are stored as a CSV snapshot plus an append-only journal next to it
+# (data/incomes.csv + data/incomes.journal). Every create/update/delete appends one record
+# to the journal, and once the journal grows past compact_threshold bytes it is folded back
+# into the snapshot. Budgets are small and keep using plain write-through CSV.
+class JournaledDataManager(CachedDataManager):
+    def __init__(self, data_dir="data", compact_threshold=1024 * 1024):
+        super().__init__(data_dir)
+        self.compact_threshold = compact_threshold
+        self.income_journal = os.path.join(data_dir, "incomes.journal")
+        self.expense_journal = os.path.join(data_dir, "expenses.journal")
+        self._journals = {
+            self.income_file: (self.income_journal, INCOME_HEADER, income_from_row, income_to_row),
+            self.expense_file: (self.expense_journal, EXPENSE_HEADER, expense_from_row, expense_to_row),
+        }
+        self._entities = {self.income_file: "income", self.expense_file: "expense"}
+
+    def _file_signature(self, path):
+        signature = super()._file_signature(path)
+        if path in self._journals:
+            return (signature, super()._file_signature(self._journals[path][0]))
+        return signature
+
+    def _replay(self, path, snapshot_loader):
+        journal, _, from_row, _ = self._journals[path]
+        # Locked so a compaction in another process cannot swap the snapshot and empty the
+        # journal between the two reads
+        with self.lock:
+            records = {record.id: record for record in snapshot_loader()}
+            try:
+                with open(journal, mode='rb') as file:
+                    content = file.read()
+            except FileNotFoundError:
+                return list(records.values())
+
+            # A crash can leave a partially written last entry; everything before it is
+            # intact. Cut it off so the next append starts on a fresh line.
+            end = content.rfind(b'\n') + 1
+            if end < len(content):
+                with open(journal, mode='r+b') as file:
+                    file.truncate(end)
+        entries = 0
+        for row in csv.reader(io.StringIO(content[:end].decode('utf-8'), newline='')):
+            entries += 1
+            try:
+                if row[0] == CREATE:
+                    record = from_row(row[1:])
+                    records[record.id] = record
+                elif row[0] == UPDATE:
+                    record = from_row(row[1:])
+                    if record.id in records:
+                        records[record.id] = record
+                elif row[0] == DELETE:
+                    records.pop(int(row[1]), None)
+            except (IndexError, ValueError):
+                continue
+        instrumentation.count("rows_read", entries)
+        return list(records.values())
+
+    def _append(self, path, entries):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(entries)
+        with open(self._journals[path][0], mode='a', newline='', encoding='utf-8') as file:
+            instrumentation.count("bytes_written", file.write(buffer.getvalue()))
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _record_change(self, path, loader, op, record_id, record, expected=None):
+        to_row = self._journals[path][3]
+        with self.lock:
+            records = self._records(path, loader)
+            check_expected(records, record_id, expected, to_row)
+            if op != CREATE and record_id not in records:
+                return False  # Nothing to update or delete, and nothing journaled
+            if op == DELETE:
+                del records[record_id]
+                self._append(path, [[DELETE, record_id]])
+            else:
+                records[record_id] = record
+                self._append(path, [[op] + to_row(record)])
+            self._changed(path, records, [] if op == DELETE else [record_id])
+        return True
+
+    # Journals every new record in one append
+    def _record_creates(self, path, loader, new_records):
+        to_row = self._journals[path][3]
+        with self.lock:
+            records = self._records(path, loader)
+            self._append(path, [[CREATE] + to_row(record) for record in new_records])
+            records.update((record.id, record) for record in new_records)
+            self._changed(path, records, [record.id for record in new_records])
+
+    # All the changes of a batch in one journal append (see DataManager.apply_changes)
+    def apply_changes(self, entity, changes):
+        if entity == "budget":
+            return super().apply_changes(entity, changes)
+        path, loader = {"income": (self.income_file, self._replay_incomes),
+                        "expense": (self.expense_file, self._replay_expenses)}[entity]
+        to_row = self._journals[path][3]
+        with self.lock:
+            # A copy, so a conflict halfway through leaves the cache as it was
+            records = dict(self._records(path, loader))
+            entries, previous, written = [], [], []
+            for record_id, record, expected, insert in changes:
+                check_expected(records, record_id, expected, to_row)
+                previous.append(records.get(record_id))
+                if record is None:
+                    if records.pop(record_id, None) is not None:
+                        entries.append([DELETE, record_id])
+                elif insert or record_id in records:
+                    entries.append([UPDATE if record_id in records else CREATE] + to_row(record))
+                    records[record_id] = record
+                    written.append(record_id)
+            if entries:
+                self._append(path, entries)
+                self._changed(path, records, written)
+        return previous
+
+    # After a journal append; the cache still holds the signature from before it
+    def _changed(self, path, records, ids):
+        version = self._cache[path][0]
+        self._cache[path] = (self._file_signature(path), records)
+        self._note_ids(self._entities[path], version, ids)
+        if os.path.getsize(self._journals[path][0]) >= self.compact_threshold:
+            self._compact(path, records)
+
+    def _compact(self, path, records):
+        journal, header, _, to_row = self._journals[path]
+        # Swap in the new snapshot atomically, then drop the journal. Replaying a journal
+        # over a snapshot that already contains its entries gives the same result, so a
+        # crash in between loses nothing.
+        with self.lock:
+            version = self.data_version(self._entities[path])
+            write_csv_atomic(path, header, map(to_row, records.values()))
+            self._write_snapshot(path, records.values())
+            with open(journal, mode='w', newline=''):
+                pass
+            self._cache[path] = (self._file_signature(path), records)
+            self._note_ids(self._entities[path], version, records.keys())
+
+    def compact(self):
+        with self.lock:
+            self._compact(self.income_file, self._records(self.income_file, self._replay_incomes))
+            self._compact(self.expense_file, self._records(self.expense_file, self._replay_expenses))
+
+    def _replay_incomes(self):
+        return self._replay(self.income_file, super(CachedDataManager, self).load_incomes)
+
+    def _replay_expenses(self):
+        return self._replay(self.expense_file, super(CachedDataManager, self).load_expenses)
+
+    # Load data
+    def load_incomes(self):
+        return list(self._records(self.income_file, self._replay_incomes).values())
+
+    def load_expenses(self):
+        return list(self._records(self.expense_file, self._replay_expenses).values())
+
+    # Save data
+    def save_incomes(self, incomes):
+        self._compact(self.income_file, {income.id: income for income in incomes})
+
+    def save_expenses(self, expenses):
+        self._compact(self.expense_file, {expense.id: expense for expense in expenses})
+
+    # Bulk append
+    def append_incomes(self, incomes):
+        self._record_creates(self.income_file, self._replay_incomes, incomes)
+
+    def append_expenses(self, expenses):
+        self._record_creates(self.expense_file, self._replay_expenses, expenses)
+
+    # CRUD Operations for Income
+    def create_income(self, income):
+        self._record_change(self.income_file, self._replay_incomes, CREATE, income.id, income)
+
+    def update_income(self, income_id, updated_income, expected=None):
+        return self._record_change(self.income_file, self._replay_incomes, UPDATE, income_id, updated_income, expected)
+
+    def delete_income(self, income_id, expected=None):
+        self._record_change(self.income_file, self._replay_incomes, DELETE, income_id, None, expected)
+
+    # CRUD Operations for Expense
+    def create_expense(self, expense):
+        self._record_change(self.expense_file, self._replay_expenses, CREATE, expense.id, expense)
+
+    def update_expense(self, expense_id, updated_expense, expected=None):
+        return self._record_change(self.expense_file, self._replay_expenses, UPDATE, expense_id, updated_expense, expected)
+
+    def delete_expense(self, expense_id, expected=None):
+        self._record_change(self.expense_file, self._replay_expenses, DELETE, expense_id, None, expected)
+
+instrumentation.instrument(JournaledDataManager, STORAGE_METHODS)
@@ -0,0 +1,330 @@
+import json
+import logging
+import os
+from calendar import monthrange
+from datetime import date
+from domain.income import Income
+from domain.expense import Expense
+from repository import csv_loader, instrumentation
+from repository.data_manager import (
+    DataManager, INCOME_HEADER, EXPENSE_HEADER, STORAGE_METHODS, income_from_row, expense_from_row, income_to_row,
+    expense_to_row, check_expected, file_signature, replace_atomic, write_csv_atomic,
+)
+
+logger = logging.getLogger(__name__)
+
+# Partition of the records without a date
+UNDATED = "undated"
+
+def partition_key(record_date):
+    return f"{record_date.year:04d}-{record_date.month:02d}" if record_date is not None else UNDATED
+
+# Manifest totals are kept in integer cents, so appending to a partition adds up exactly to
+# what rewriting it would (see service/monthly_rollup.py)
+def _cents(amount):
+    return round(amount * 100)
+
+def _partition_overlaps(key, start, end):
+    # With bounds, records without a date never match (see in_date_range)
+    if start is None and end is None:
+        return True
+    if key == UNDATED:
+        return False
+    year, month = int(key[:4]), int(key[5:7])
+    first, last = date(year, month, 1), date(year, month, monthrange(year, month)[1])
+    return (start is None or last >= start) and (end is None or first <= end)
+
+# Incomes and expenses split into one CSV per month (data/expenses/2024-05.csv, and
+# data/expenses/undated.csv for records without a date) plus data/expenses/manifest.json
+# with the row count, total amount in cents and id range of every partition. A create,
+# update or delete reads and writes only the partitions of the record involved (the id
+# ranges narrow down where an id can be), monthly totals come straight from the manifest,
+# and date-range reads skip the months outside the range. Budgets stay in data/budgets.csv.
+#
+# The manifest is rewritten with every change, so its signature is the data_version of
+# the entity; partition files are meant to be changed only through this class. Whole
+# loads hold the lock so they never see a record halfway through moving between months.
+class PartitionedDataManager(DataManager):
+    def __init__(self, data_dir="data"):
+        super().__init__(data_dir)
+        self.income_dir = os.path.join(data_dir, "incomes")
+        self.expense_dir = os.path.join(data_dir, "expenses")
+        # entity -> (directory, header, record class, column converters, from_row, to_row)
+        self._layouts = {
+            "income": (self.income_dir, INCOME_HEADER, Income, csv_loader.INCOME_COLUMNS, income_from_row, income_to_row),
+            "expense": (self.expense_dir, EXPENSE_HEADER, Expense, csv_loader.EXPENSE_COLUMNS, expense_from_row, expense_to_row),
+        }
+        self._manifests = {}  # entity -> (manifest signature, {partition key: entry})
+
+    def _manifest_path(self, entity):
+        return os.path.join(self._layouts[entity][0], "manifest.json")
+
+    def _partition_path(self, entity, key):
+        return os.path.join(self._layouts[entity][0], f"{key}.csv")
+
+    def data_version(self, entity):
+        if entity in self._layouts:
+            return file_signature(self._manifest_path(entity))
+        return super().data_version(entity)
+
+    # {partition key: {"rows", "cents", "min_id", "max_id"}}, or None before the first write
+    def _manifest(self, entity):
+        path = self._manifest_path(entity)
+        signature = file_signature(path)
+        cached = self._manifests.get(entity)
+        if cached is None or cached[0] != signature:
+            try:
+                with open(path) as file:
+                    cached = (signature, json.load(file))
+            except FileNotFoundError:
+                cached = (None, None)
+            self._manifests[entity] = cached
+        return cached[1]
+
+    def _save_manifest(self, entity, manifest):
+        path = self._manifest_path(entity)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        replace_atomic(path, lambda file: json.dump(manifest, file, indent=1, sort_keys=True))
+        self._manifests[entity] = (file_signature(path), manifest)
+
+    # From the id ranges in the manifest
+    def _scan_max_id(self, entity):
+        if entity not in self._layouts:
+            return super()._scan_max_id(entity)
+        return max((entry["max_id"] for entry in (self._manifest(entity) or {}).values()), default=0)
+
+    def _read_partition(self, entity, key):
+        _, _, factory, columns, from_row, _ = self._layouts[entity]
+        try:
+            return csv_loader.load_records(self._partition_path(entity, key), factory, columns, from_row)
+        except FileNotFoundError:
+            return []
+
+    # Rewrites one partition and its manifest entry; an empty partition is removed
+    def _write_partition(self, entity, manifest, key, records):
+        _, header, _, _, _, to_row = self._layouts[entity]
+        path = self._partition_path(entity, key)
+        if not records:
+            manifest.pop(key, None)
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        write_csv_atomic(path, header, map(to_row, records))
+        ids = [record.id for record in records]
+        manifest[key] = {"rows": len(records), "cents": sum(_cents(record.amount) for record in records),
+                         "min_id": min(ids), "max_id": max(ids)}
+
+    # Appends to partitions without reading them, updating their entries incrementally
+    def _append_partitions(self, entity, manifest, records):
+        _, header, _, _, _, to_row = self._layouts[entity]
+        groups = {}
+        for record in records:
+            groups.setdefault(partition_key(record.date), []).append(record)
+        for key, group in groups.items():
+            self._append_rows(self._partition_path(entity, key), header, map(to_row, group))
+            entry = dict(manifest.get(key, {"rows": 0, "cents": 0, "min_id": group[0].id, "max_id": group[0].id}))
+            entry["rows"] += len(group)
+            for record in group:
+                entry["cents"] += _cents(record.amount)
+                entry["min_id"] = min(entry["min_id"], record.id)
+                entry["max_id"] = max(entry["max_id"], record.id)
+            manifest[key] = entry
+
+    # The partition holding record_id, its records and the record's position. The
+    # partitions already read into `partitions` (key -> records, possibly changed since) are
+    # searched first; then the month of the expected record, then only the partitions whose
+    # id range covers the id. Partitions read on the way are added to `partitions`.
+    def _find(self, entity, manifest, record_id, expected=None, partitions=None):
+        partitions = partitions if partitions is not None else {}
+        for key, records in partitions.items():
+            for i, record in enumerate(records):
+                if record.id == record_id:
+                    return key, records, i
+        keys = sorted(manifest)
+        if expected is not None and partition_key(expected.date) in manifest:
+            keys.insert(0, partition_key(expected.date))
+        for key in dict.fromkeys(keys):
+            entry = manifest[key]
+            if key not in partitions and entry["min_id"] <= record_id <= entry["max_id"]:
+                records = partitions[key] = self._read_partition(entity, key)
+                for i, record in enumerate(records):
+                    if record.id == record_id:
+                        return key, records, i
+        return None, None, None
+
+    def _load(self, entity):
+        with self.lock:
+            manifest = self._manifest(entity)
+            if manifest is None:
+                logger.warning("%s not found", self._manifest_path(entity),
+                               extra={"fields": {"path": self._manifest_path(entity)}})
+                return []
+            records = []
+            for key in sorted(manifest):
+                records.extend(self._read_partition(entity, key))
+            return records
+
+    def _iter(self, entity, predicate, start, end):
+        _, _, _, _, from_row, _ = self._layouts[entity]
+        for key in sorted(self._manifest(entity) or {}):
+            if _partition_overlaps(key, start, end):
+                yield from self._iter_file(self._partition_path(entity, key), from_row, predicate, start, end, 3)
+
+    def _save(self, entity, records):
+        groups = {}
+        for record in records:
+            groups.setdefault(partition_key(record.date), []).append(record)
+        with self.lock:
+            os.makedirs(self._layouts[entity][0], exist_ok=True)
+            manifest = dict(self._manifest(entity) or {})
+            for key in set(manifest) - set(groups):
+                self._write_partition(entity, manifest, key, [])
+            for key, group in groups.items():
+                self._write_partition(entity, manifest, key, group)
+            self._save_manifest(entity, manifest)
+
+    def _append(self, entity, records):
+        with self.lock:
+            os.makedirs(self._layouts[entity][0], exist_ok=True)
+            manifest = dict(self._manifest(entity) or {})
+            self._append_partitions(entity, manifest, records)
+            self._save_manifest(entity, manifest)
+
+    def _update(self, entity, record_id, record, expected):
+        to_row = self._layouts[entity][5]
+        with self.lock:
+            manifest = dict(self._manifest(entity) or {})
+            key, records, i = self._find(entity, manifest, record_id, expected)
+            check_expected(records or [], record_id, expected, to_row)
+            if key is None:
+                return False
+            if partition_key(record.date) == key:
+                records[i] = record
+                self._write_partition(entity, manifest, key, records)
+            else:
+                # Moved to another month: onto the end of the new partition first and only then
+                # out of the old one, so a crash in between cannot lose the record
+                self._append_partitions(entity, manifest, [record])
+                del records[i]
+                self._write_partition(entity, manifest, key, records)
+            self._save_manifest(entity, manifest)
+        return True
+
+    def _delete(self, entity, record_id, expected):
+        to_row = self._layouts[entity][5]
+        with self.lock:
+            manifest = dict(self._manifest(entity) or {})
+            key, records, i = self._find(entity, manifest, record_id, expected)
+            check_expected(records or [], record_id, expected, to_row)
+            if key is None:
+                return
+            del records[i]
+            self._write_partition(entity, manifest, key, records)
+            self._save_manifest(entity, manifest)
+
+    # See DataManager.apply_changes: reads and rewrites each partition the batch touches
+    # once, however many of its records change
+    def apply_changes(self, entity, changes):
+        if entity not in self._layouts:
+            return super().apply_changes(entity, changes)
+        to_row = self._layouts[entity][5]
+        with self.lock:
+            manifest = dict(self._manifest(entity) or {})
+            partitions, changed, added, previous = {}, set(), set(), []
+            for record_id, record, expected, insert in changes:
+                key, records, i = self._find(entity, manifest, record_id, expected, partitions)
+                current = records[i] if key is not None else None
+                check_expected({record_id: current} if current is not None else {}, record_id, expected, to_row)
+                previous.append(current)
+                if key is not None and record is not None and partition_key(record.date) == key:
+                    records[i] = record
+                    changed.add(key)
+                    continue
+                if key is None and not insert:
+                    continue
+                if key is not None:
+                    del records[i]
+                    changed.add(key)
+                if record is not None:
+                    # Added, or moved to another month: onto the end of its partition
+                    target = partition_key(record.date)
+                    if target not in partitions:
+                        partitions[target] = self._read_partition(entity, target) if target in manifest else []
+                    partitions[target].append(record)
+                    changed.add(target)
+                    added.add(target)
+            if changed:
+                os.makedirs(self._layouts[entity][0], exist_ok=True)
+                # Partitions records were added or moved to first, as in _update
+                for key in sorted(changed, key=lambda key: key not in added):
+                    self._write_partition(entity, manifest, key, partitions[key])
+                self._save_manifest(entity, manifest)
+        return previous
+
+    # Load data, partitions in month order with the undated records last
+    def load_incomes(self):
+        return self._load("income")
+
+    def load_expenses(self):
+        return self._load("expense")
+
+    # Stream records, reading only the months that overlap start/end
+    def iter_incomes(self, predicate=None, start=None, end=None):
+        return self._iter("income", predicate, start, end)
+
+    def iter_expenses(self, predicate=None, start=None, end=None):
+        return self._iter("expense", predicate, start, end)
+
+    # Save data: every partition is rewritten
+    def save_incomes(self, incomes):
+        self._save("income", incomes)
+
+    def save_expenses(self, expenses):
+        self._save("expense", expenses)
+
+    # Bulk append, one append per month touched
+    def append_incomes(self, incomes):
+        self._append("income", incomes)
+
+    def append_expenses(self, expenses):
+        self._append("expense", expenses)
+
+    # CRUD Operations for Income
+    def create_income(self, income):
+        self._append("income", [income])
+
+    def update_income(self, income_id, updated_income, expected=None):
+        return self._update("income", income_id, updated_income, expected)
+
+    def delete_income(self, income_id, expected=None):
+        self._delete("income", income_id, expected)
+
+    # CRUD Operations for Expense
+    def create_expense(self, expense):
+        self._append("expense", [expense])
+
+    def update_expense(self, expense_id, updated_expense, expected=None):
+        return self._update("expense", expense_id, updated_expense, expected)
+
+    def delete_expense(self, expense_id, expected=None):
+        self._delete("expense", expense_id, expected)
+
+    # (income total, expense total) of a month, from the manifests alone
+    def monthly_totals(self, year, month):
+        key = f"{year:04d}-{month:02d}"
+        return tuple((self._manifest(entity) or {}).get(key, {}).get("cents", 0) / 100 for entity in ("income", "expense"))
+
+    # Migration from the single-file layout: splits the incomes and expenses of another
+    # data manager (normally DataManager on the same directory) into partitions. The old
+    # files are left as they are.
+    def import_from(self, data_manager):
+        with self.lock:
+            self.save_incomes(data_manager.load_incomes())
+            self.save_expenses(data_manager.load_expenses())
+            if os.path.abspath(data_manager.data_dir) != os.path.abspath(self.data_dir):
+                self.save_budgets(data_manager.load_budgets())
+
+    def partition_counts(self, entity):
+        return {key: entry["rows"] for key, entry in sorted((self._manifest(entity) or {}).items())}
+
+instrumentation.instrument(PartitionedDataManager, STORAGE_METHODS)
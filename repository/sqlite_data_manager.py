@@ -0,0 +1,354 @@
+import os
+import sqlite3
+import sys
+from datetime import date
+from domain.income import Income
+from domain.expense import Expense
+from domain.budget import Budget
+from repository import instrumentation
+from repository.data_manager import ConflictError, STORAGE_METHODS
+from repository.file_lock import FileLock
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS incomes (
+    id INTEGER PRIMARY KEY, source TEXT, amount REAL, date TEXT, description TEXT
+);
+CREATE TABLE IF NOT EXISTS expenses (
+    id INTEGER PRIMARY KEY, category TEXT, amount REAL, date TEXT, description TEXT
+);
+CREATE TABLE IF NOT EXISTS budgets (
+    id INTEGER PRIMARY KEY, category TEXT, amount REAL
+);
+CREATE TABLE IF NOT EXISTS sequences (
+    entity TEXT PRIMARY KEY, next_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versions (
+    entity TEXT PRIMARY KEY, version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_incomes_date ON incomes (date);
+CREATE INDEX IF NOT EXISTS idx_incomes_source ON incomes (source);
+CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses (date);
+CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses (category);
+CREATE INDEX IF NOT EXISTS idx_budgets_category ON budgets (category);
+"""
+
+INCOME_COLUMNS = ["id", "source", "amount", "date", "description"]
+EXPENSE_COLUMNS = ["id", "category", "amount", "date", "description"]
+BUDGET_COLUMNS = ["id", "category", "amount"]
+
+def _income_from_row(row):
+    return Income(row[0], _intern(row[1]), row[2], date.fromisoformat(row[3]) if row[3] else None, row[4])
+
+def _expense_from_row(row):
+    return Expense(row[0], _intern(row[1]), row[2], date.fromisoformat(row[3]) if row[3] else None, row[4])
+
+def _budget_from_row(row):
+    return Budget(row[0], _intern(row[1]), row[2])
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+def _income_params(income):
+    return (income.id, income.source, income.amount, _date_text(income.date), income.description)
+
+def _expense_params(expense):
+    return (expense.id, expense.category, expense.amount, _date_text(expense.date), expense.description)
+
+def _budget_params(budget):
+    return (budget.id, budget.category, budget.amount)
+
+def _date_text(value):
+    return str(value) if value else None
+
+def _param(value):
+    return _date_text(value) if isinstance(value, date) else value
+
+def _text(value):
+    # Same text form the Python search path compares against: str(value).lower()
+    if value is None:
+        return "none"
+    return str(value).lower()
+
+# SQLite backend with the same surface as DataManager. It additionally answers filter,
+# search, sort and monthly total queries in SQL (see supports_queries), so DataService
+# does not have to materialize every row to answer them.
+class SqliteDataManager:
+    supports_queries = True
+
+    def __init__(self, data_dir="data", db_file=None):
+        self.data_dir = data_dir
+        self.db_file = db_file if db_file is not None else os.path.join(data_dir, "finance.db")
+        self.connection = sqlite3.connect(self.db_file, check_same_thread=False)
+        self.connection.create_function("py_text", 1, _text, deterministic=True)
+        self.connection.executescript(SCHEMA)
+        self._tables = {
+            "income": ("incomes", INCOME_COLUMNS, _income_from_row, _income_params),
+            "expense": ("expenses", EXPENSE_COLUMNS, _expense_from_row, _expense_params),
+            "budget": ("budgets", BUDGET_COLUMNS, _budget_from_row, _budget_params),
+        }
+        # SQLite serializes writes itself; the lock is for callers that need a
+        # read-modify-write across several statements, shared with the CSV modes
+        self.lock = FileLock(os.path.join(data_dir, ".lock"))
+
+    def close(self):
+        self.connection.close()
+
+    # A counter per entity in the versions table, moved by every write to that entity's
+    # table in the same transaction (see _bump), whichever connection makes it. Handing out
+    # ids or writing another table leaves it alone.
+    def data_version(self, entity):
+        row = self.connection.execute("SELECT version FROM versions WHERE entity = ?", (entity,)).fetchone()
+        return row[0] if row is not None else 0
+
+    def _bump(self, entity):
+        # Runs inside the caller's transaction
+        self.connection.execute(
+            "INSERT INTO versions (entity, version) VALUES (?, 1) "
+            "ON CONFLICT (entity) DO UPDATE SET version = version + 1", (entity,))
+
+    # Same contract as DataManager.next_ids, with the counters in the sequences table
+    def next_ids(self, entity, count=1):
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            first = self._next_id(entity)
+            self.connection.execute("INSERT OR REPLACE INTO sequences (entity, next_id) VALUES (?, ?)", (entity, first + count))
+        return first
+
+    def _next_id(self, entity):
+        # Runs inside the caller's transaction. Never below the highest stored id + 1, for
+        # rows inserted without going through the counter; MAX(id) is an index lookup.
+        table = self._tables[entity][0]
+        row = self.connection.execute("SELECT next_id FROM sequences WHERE entity = ?", (entity,)).fetchone()
+        return max(row[0] if row is not None else 1, self._max_table_id(table) + 1)
+
+    def _select(self, entity, where="", params=(), order_by="id"):
+        table, columns, from_row, _ = self._tables[entity]
+        cursor = self.connection.execute(
+            f"SELECT {', '.join(columns)} FROM {table} {where} ORDER BY {order_by}", params)
+        records = [from_row(row) for row in cursor]
+        instrumentation.count("rows_read", len(records))
+        return records
+
+    def _replace_rows(self, entity, records):
+        # Runs inside the caller's transaction
+        table, columns, _, to_params = self._tables[entity]
+        self.connection.execute(f"DELETE FROM {table}")
+        self.connection.executemany(
+            f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            (to_params(record) for record in records))
+        self._bump(entity)
+
+    def _replace_all(self, entity, records):
+        with self.connection:
+            self._replace_rows(entity, records)
+
+    def _insert(self, entity, records):
+        table, columns, _, to_params = self._tables[entity]
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                (to_params(record) for record in records))
+            self._bump(entity)
+
+    def _update(self, entity, record_id, record, expected=None):
+        table, columns, _, to_params = self._tables[entity]
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        with self.connection:
+            self._check_expected(entity, record_id, expected)
+            cursor = self.connection.execute(
+                f"UPDATE {table} SET {assignments} WHERE id = ?", to_params(record) + (record_id,))
+            if cursor.rowcount:
+                self._bump(entity)
+        return cursor.rowcount > 0
+
+    def _delete(self, entity, record_id, expected=None):
+        table = self._tables[entity][0]
+        with self.connection:
+            self._check_expected(entity, record_id, expected)
+            if self.connection.execute(f"DELETE FROM {table} WHERE id = ?", (record_id,)).rowcount:
+                self._bump(entity)
+
+    def _check_expected(self, entity, record_id, expected):
+        # Runs inside the caller's transaction; BEGIN IMMEDIATE takes the write lock before
+        # the read, so nobody can change the row between the check and the write
+        if expected is None:
+            return
+        table, columns, _, to_params = self._tables[entity]
+        self.connection.execute("BEGIN IMMEDIATE")
+        row = self.connection.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE id = ?", (record_id,)).fetchone()
+        if row is None or row != to_params(expected):
+            raise ConflictError(f"Record {record_id} was changed or deleted by someone else. Reload and try again.")
+
+    # Same contract as DataManager.apply_changes, in one transaction
+    def apply_changes(self, entity, changes):
+        table, columns, from_row, to_params = self._tables[entity]
+        previous, changed = [], False
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            for record_id, record, expected, insert in changes:
+                row = self.connection.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE id = ?", (record_id,)).fetchone()
+                if expected is not None and (row is None or row != to_params(expected)):
+                    raise ConflictError(f"Record {record_id} was changed or deleted by someone else. Reload and try again.")
+                previous.append(from_row(row) if row is not None else None)
+                if record is None:
+                    changed |= self.connection.execute(f"DELETE FROM {table} WHERE id = ?", (record_id,)).rowcount > 0
+                elif insert or row is not None:
+                    self.connection.execute(
+                        f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                        to_params(record))
+                    changed = True
+            if changed:
+                self._bump(entity)
+        return previous
+
+    def _iter(self, entity, predicate, start, end):
+        table, columns, from_row, _ = self._tables[entity]
+        conditions, params = ["1"], ()
+        if start is not None or end is not None:
+            conditions.append("date IS NOT NULL")
+        if start is not None:
+            conditions.append("date >= ?")
+            params += (_param(start),)
+        if end is not None:
+            conditions.append("date <= ?")
+            params += (_param(end),)
+        cursor = self.connection.execute(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE {' AND '.join(conditions)} ORDER BY id", params)
+        rows = 0
+        try:
+            for row in cursor:
+                rows += 1
+                record = from_row(row)
+                if predicate is None or predicate(record):
+                    yield record
+        finally:
+            instrumentation.count("rows_read", rows)
+
+    # Load data
+    def load_incomes(self):
+        return self._select("income")
+
+    def load_expenses(self):
+        return self._select("expense")
+
+    def load_budgets(self):
+        return self._select("budget")
+
+    # Stream records, with the date range evaluated in SQL
+    def iter_incomes(self, predicate=None, start=None, end=None):
+        return self._iter("income", predicate, start, end)
+
+    def iter_expenses(self, predicate=None, start=None, end=None):
+        return self._iter("expense", predicate, start, end)
+
+    def iter_budgets(self, predicate=None):
+        return self._iter("budget", predicate, None, None)
+
+    # Save data
+    def save_incomes(self, incomes):
+        self._replace_all("income", incomes)
+
+    def save_expenses(self, expenses):
+        self._replace_all("expense", expenses)
+
+    def save_budgets(self, budgets):
+        self._replace_all("budget", budgets)
+
+    # Bulk append, in one transaction
+    def append_incomes(self, incomes):
+        self._insert("income", incomes)
+
+    def append_expenses(self, expenses):
+        self._insert("expense", expenses)
+
+    # CRUD Operations for Income
+    def create_income(self, income):
+        self._insert("income", [income])
+
+    def update_income(self, income_id, updated_income, expected=None):
+        return self._update("income", income_id, updated_income, expected)
+
+    def delete_income(self, income_id, expected=None):
+        self._delete("income", income_id, expected)
+
+    # CRUD Operations for Expense
+    def create_expense(self, expense):
+        self._insert("expense", [expense])
+
+    def update_expense(self, expense_id, updated_expense, expected=None):
+        return self._update("expense", expense_id, updated_expense, expected)
+
+    def delete_expense(self, expense_id, expected=None):
+        self._delete("expense", expense_id, expected)
+
+    # CRUD Operations for Budget
+    def create_budget(self, budget):
+        self._insert("budget", [budget])
+
+    def update_budget(self, budget_id, updated_budget, expected=None):
+        return self._update("budget", budget_id, updated_budget, expected)
+
+    def delete_budget(self, budget_id, expected=None):
+        self._delete("budget", budget_id, expected)
+
+    # Queries pushed down to SQL
+    def query(self, entity, key=None, value=None, search=None, order_by=None, reverse=False, between=None):
+        columns = self._tables[entity][1]
+        for column in (key, order_by):
+            if column is not None and column not in columns:
+                raise AttributeError(f"'{entity}' has no attribute '{column}'")
+        where, params = "", ()
+        if key is not None and search is not None:
+            where, params = f"WHERE instr(py_text({key}), ?) > 0", (search.lower(),)
+        elif key is not None and between is not None:
+            # Inclusive range, either end may be None; results come back ordered by key
+            conditions, params = ["1"], ()
+            if between[0] is not None:
+                conditions.append(f"{key} >= ?")
+                params += (_param(between[0]),)
+            if between[1] is not None:
+                conditions.append(f"{key} <= ?")
+                params += (_param(between[1]),)
+            where = "WHERE " + " AND ".join(conditions)
+            order_by = key
+        elif key is not None:
+            where, params = f"WHERE {key} = ?", (_param(value),)
+        # Ties keep file (id) order in both directions, like Python's stable sorted()
+        order = f"{order_by} {'DESC' if reverse else 'ASC'}, id" if order_by else "id"
+        return self._select(entity, where, params, order)
+
+    # Summed in whole cents, like the rollups of the other modes, so the totals carry no
+    # float residue
+    def monthly_totals(self, year, month):
+        start = f"{year:04d}-{month:02d}-01"
+        end = f"{year + month // 12:04d}-{month % 12 + 1:02d}-01"
+        totals = []
+        for table in ("incomes", "expenses"):
+            cursor = self.connection.execute(
+                f"SELECT COALESCE(SUM(CAST(ROUND(amount * 100) AS INTEGER)), 0) FROM {table} WHERE date >= ? AND date < ?",
+                (start, end))
+            totals.append(cursor.fetchone()[0] / 100)
+        return tuple(totals)
+
+    # Bulk import of an existing CSV data directory
+    def import_from(self, data_manager):
+        with self.connection:
+            self._replace_rows("income", data_manager.load_incomes())
+            self._replace_rows("expense", data_manager.load_expenses())
+            self._replace_rows("budget", data_manager.load_budgets())
+            # Never go back on ids already handed out, by this database or the CSV counters
+            for entity, (table, _, _, _) in self._tables.items():
+                next_id = max(self._next_id(entity), self._max_table_id(table) + 1, self._csv_next_id(data_manager, entity))
+                self.connection.execute("INSERT OR REPLACE INTO sequences (entity, next_id) VALUES (?, ?)", (entity, next_id))
+
+    def _max_table_id(self, table):
+        return self.connection.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+
+    def _csv_next_id(self, data_manager, entity):
+        try:
+            with open(data_manager.sequence_files[entity]) as file:
+                return int(file.read())
+        except (AttributeError, FileNotFoundError, ValueError):
+            return 1
+
+instrumentation.instrument(SqliteDataManager, STORAGE_METHODS)
@@ -0,0 +1,18 @@
+from repository.data_manager import DataManager
+from repository.cached_data_manager import CachedDataManager
+from repository.journaled_data_manager import JournaledDataManager
+from repository.partitioned_data_manager import PartitionedDataManager
+from repository.sqlite_data_manager import SqliteDataManager
+
+STORAGE_MODES = {
+    "csv": DataManager,
+    "cached": CachedDataManager,
+    "journal": JournaledDataManager,
+    "partitioned": PartitionedDataManager,
+    "sqlite": SqliteDataManager,
+}
+
+def open_data_manager(storage="csv", data_dir="data"):
+    if storage not in STORAGE_MODES:
+        raise ValueError(f"Unknown storage mode '{storage}'. Choose one of: {', '.join(STORAGE_MODES)}.")
+    return STORAGE_MODES[storage](data_dir)
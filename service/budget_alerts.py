@@ -0,0 +1,92 @@
+from service.monthly_rollup import to_cents
+
+EXCEEDED = "exceeded"
+WARNING = "warning"
+
+# Keeps running expense totals per category next to the budget limits and the alert state
+# of each category. A changed expense or budget only re-evaluates the categories it touches.
+# Totals and limits are compared in integer cents, like the rollups, so an engine kept up
+# to date by apply() raises exactly the alerts a rebuilt one would.
+#
+# When several budgets share a category, the one with the highest id (the most recently
+# added) sets the limit, so duplicate rows like the two Food budgets resolve the same way
+# whatever order the file is in.
+class BudgetAlertEngine:
+    entities = ("expense", "budget")
+
+    def __init__(self):
+        self.versions = {}
+        self._spent = {}  # category -> [total in cents, count], in order of first appearance
+        self._budgets = {}  # budget id -> (category, amount)
+        self._limits = {}  # category -> amount in cents of the budget that applies
+        self._status = {}  # category -> EXCEEDED or WARNING
+        self._events = []
+
+    def rebuild(self, data, versions):
+        self.__init__()
+        for expense in data["expense"]:
+            self._add_expense(expense, 1)
+        for budget in data["budget"]:
+            self._budgets[budget.id] = (budget.category, budget.amount)
+        for category in {category for category, _ in self._budgets.values()}:
+            self._resolve_limit(category)
+        for category in self._spent:
+            self._evaluate(category, emit=False)
+        self.versions = versions
+
+    def apply(self, entity, old, new):
+        touched = []
+        for record, sign in ((old, -1), (new, 1)):
+            if record is None:
+                continue
+            if entity == "expense":
+                self._add_expense(record, sign)
+            elif sign < 0:
+                del self._budgets[record.id]
+                self._resolve_limit(record.category)
+            else:
+                self._budgets[record.id] = (record.category, record.amount)
+                self._resolve_limit(record.category)
+            touched.append(record.category)
+        for category in dict.fromkeys(touched):
+            self._evaluate(category)
+
+    def _add_expense(self, expense, sign):
+        bucket = self._spent.setdefault(expense.category, [0, 0])
+        bucket[0] += sign * to_cents(expense.amount)
+        bucket[1] += sign
+        if bucket[1] == 0:
+            del self._spent[expense.category]
+
+    def _resolve_limit(self, category):
+        ids = [budget_id for budget_id, (budget_category, _) in self._budgets.items() if budget_category == category]
+        if ids:
+            self._limits[category] = to_cents(self._budgets[max(ids)][1])
+        else:
+            self._limits.pop(category, None)
+
+    def _evaluate(self, category, emit=True):
+        total = self._spent[category][0] if category in self._spent else 0
+        limit = self._limits.get(category)
+        status = None
+        if limit is not None and category in self._spent:
+            if total > limit:
+                status = EXCEEDED
+            elif limit > 0 and total * 10 >= limit * 9:
+                status = WARNING
+        if status is None:
+            self._status.pop(category, None)
+        elif self._status.get(category) != status:
+            self._status[category] = status
+            if emit:
+                self._events.append({"type": status, "category": category, "total": total / 100, "budget": limit / 100})
+
+    # Categories currently in the given state, in order of their first expense
+    def categories(self, status):
+        return [category for category in self._spent if self._status.get(category) == status]
+
+    # Alerts raised by changes since the last call: a category crossing 90% of its budget
+    # or going over it
+    def pop_events(self):
+        events, self._events = self._events, []
+        return events
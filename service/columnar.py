@@ -0,0 +1,78 @@
+import importlib.util
+from datetime import date
+
+# NumPy is optional, DataService falls back to plain Python sums. Importing it takes longer
+# than the rest of the application's imports together, so it is only imported the first
+# time the columns are built; short-lived command line runs usually never need it.
+np = None
+_available = None
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def available():
+    global _available
+    if _available is None:
+        _available = importlib.util.find_spec("numpy") is not None
+    return _available
+
+def _import_numpy():
+    global np
+    if np is None:
+        import numpy as np
+
+# Column arrays of incomes and expenses (amount as float64, date as datetime64[D] with NaT
+# for a missing date, category/source as integer codes) for vectorized group-by-month,
+# group-by-category and range totals over large histories. Appending to NumPy arrays
+# costs a copy, so unlike the other DataService views this one has no apply(): any
+# write leaves it stale and it is rebuilt on its next use.
+class ColumnarLedger:
+    entities = ("income", "expense")
+
+    def __init__(self):
+        self.versions = {}
+        self._columns = {}  # entity -> (amounts, dates, codes, categories)
+
+    def rebuild(self, data, versions):
+        _import_numpy()
+        self._columns = {}
+        for entity in self.entities:
+            records = list(data[entity])
+            count = len(records)
+            amounts = np.fromiter((record.amount for record in records), dtype=np.float64, count=count)
+            ordinals = np.fromiter((record.date.toordinal() if record.date else 0 for record in records),
+                                   dtype=np.int64, count=count)
+            dates = (ordinals - EPOCH_ORDINAL).astype("datetime64[D]")
+            dates[ordinals == 0] = np.datetime64("NaT")
+            codes_by_category = {}
+            field = "source" if entity == "income" else "category"
+            codes = np.fromiter((codes_by_category.setdefault(getattr(record, field), len(codes_by_category))
+                                 for record in records), dtype=np.int32, count=count)
+            self._columns[entity] = (amounts, dates, codes, list(codes_by_category))
+        self.versions = versions
+
+    def _mask(self, dates, start, end):
+        mask = ~np.isnat(dates)
+        if start is not None:
+            mask &= dates >= np.datetime64(start, "D")
+        if end is not None:
+            mask &= dates <= np.datetime64(end, "D")
+        return mask
+
+    def range_total(self, entity, start=None, end=None):
+        amounts, dates, _, _ = self._columns[entity]
+        return float(amounts[self._mask(dates, start, end)].sum())
+
+    def group_by_month(self, entity, start=None, end=None):
+        amounts, dates, _, _ = self._columns[entity]
+        mask = self._mask(dates, start, end)
+        months, inverse = np.unique(dates[mask].astype("datetime64[M]"), return_inverse=True)
+        totals = np.bincount(inverse, weights=amounts[mask], minlength=len(months))
+        return {(int(month) // 12 + 1970, int(month) % 12 + 1): float(total)
+                for month, total in zip(months.astype(np.int64), totals)}
+
+    def group_by_category(self, entity, start=None, end=None):
+        amounts, dates, codes, categories = self._columns[entity]
+        mask = self._mask(dates, start, end)
+        totals = np.bincount(codes[mask], weights=amounts[mask], minlength=len(categories))
+        present = np.bincount(codes[mask], minlength=len(categories)) > 0
+        return dict(sorted((categories[code], float(totals[code])) for code in np.flatnonzero(present)))
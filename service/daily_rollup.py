@@ -0,0 +1,77 @@
+from service.monthly_rollup import to_cents
+
+PERIODS = ("day", "week", "month", "quarter", "year")
+
+# Key of the period a date falls in: the date itself, (ISO year, ISO week), (year, month),
+# (year, quarter) or the year
+def period_key(day, period):
+    if period == "day":
+        return day
+    if period == "week":
+        iso = day.isocalendar()
+        return (iso[0], iso[1])
+    if period == "month":
+        return (day.year, day.month)
+    if period == "quarter":
+        return (day.year, (day.month - 1) // 3 + 1)
+    if period == "year":
+        return day.year
+    raise ValueError(f"Unknown period '{period}'. Choose one of: {', '.join(PERIODS)}.")
+
+# Running totals of incomes and expenses per day and per (day, category), where the category
+# of an income is its source. A ledger has a few thousand distinct days however many records
+# it holds, so totals for any period size and range are summed from the day buckets in one
+# pass over them, without touching the records. Records without a date are left out.
+# Buckets and period sums are kept in integer cents, like MonthlyRollup, so the result does
+# not depend on the order the buckets were added in.
+class DailyRollup:
+    entities = ("income", "expense")
+
+    def __init__(self):
+        self.versions = {}
+        self._totals = {entity: {} for entity in self.entities}  # entity -> {date: [cents, count]}
+        self._categories = {entity: {} for entity in self.entities}  # entity -> {(date, category): [cents, count]}
+
+    def rebuild(self, data, versions):
+        self.__init__()
+        for entity in self.entities:
+            for record in data[entity]:
+                self._add(entity, record, 1)
+        self.versions = versions
+
+    def apply(self, entity, old, new):
+        if old is not None:
+            self._add(entity, old, -1)
+        if new is not None:
+            self._add(entity, new, 1)
+
+    def _add(self, entity, record, sign):
+        if record.date is None:
+            return
+        category = record.source if entity == "income" else record.category
+        cents = sign * to_cents(record.amount)
+        for buckets, key in ((self._totals[entity], record.date), (self._categories[entity], (record.date, category))):
+            bucket = buckets.setdefault(key, [0, 0])
+            bucket[0] += cents
+            bucket[1] += sign
+            if bucket[1] == 0:
+                del buckets[key]
+
+    # {period key: total} for the days between start and end (inclusive, either may be None)
+    def totals(self, entity, period, start=None, end=None):
+        totals = {}
+        for day, bucket in self._totals[entity].items():
+            if (start is None or day >= start) and (end is None or day <= end):
+                key = period_key(day, period)
+                totals[key] = totals.get(key, 0) + bucket[0]
+        return {key: cents / 100 for key, cents in sorted(totals.items())}
+
+    # {period key: {category: total}}
+    def category_totals(self, entity, period, start=None, end=None):
+        totals = {}
+        for (day, category), bucket in self._categories[entity].items():
+            if (start is None or day >= start) and (end is None or day <= end):
+                categories = totals.setdefault(period_key(day, period), {})
+                categories[category] = categories.get(category, 0) + bucket[0]
+        return {key: {category: cents / 100 for category, cents in sorted(categories.items())}
+                for key, categories in sorted(totals.items())}
@@ -0,0 +1,132 @@
+import heapq
+import math
+from datetime import date, timedelta
+from service.monthly_rollup import to_cents
+
+# An expense is unusual when it is this many standard deviations above the mean of the
+# other expenses in its category...
+Z_THRESHOLD = 3.0
+# ...and the category has at least this many other expenses to compare with
+MIN_HISTORY = 5
+# ...counting only the expenses dated within this many days before today
+WINDOW_DAYS = 365
+
+# Running count, sum and sum of squares of the expense amounts per category, in integer
+# cents, so adding and removing expenses keeps them exact and they always equal the ones a
+# rebuild computes. The mean and standard deviation of "the other expenses in the category"
+# come straight out of them for any expense, in O(1).
+#
+# Only the expenses of the window are kept, and of each only its amount in cents and date
+# under its id, so memory follows the window rather than the whole history; anomalies()
+# returns ids and the caller looks the records up. Expenses leaving the window as the days
+# go by are dropped oldest first.
+#
+# Whether an expense is flagged is decided when anomalies() is asked, with one rule against
+# the current statistics, so a long-lived service and a fresh one flag the same expenses.
+class ExpenseAnomalyDetector:
+    entities = ("expense",)
+
+    def __init__(self, today=date.today):
+        self.versions = {}
+        self._today = today
+        self._stats = {}  # category -> [count, sum of cents, sum of squared cents]
+        self._amounts = {}  # category -> {expense id: (cents, date ordinal)}
+        self._expiry = []  # heap of (date ordinal, expense id, category), stale entries skipped
+        self._events = []
+
+    # First day of the window
+    def start(self):
+        return self._today() - timedelta(days=WINDOW_DAYS)
+
+    def rebuild(self, data, versions):
+        self.__init__(self._today)
+        start = self.start()
+        for expense in data["expense"]:
+            if expense.date is not None and expense.date >= start:
+                self._add(expense)
+        self.versions = versions
+
+    def apply(self, entity, old, new):
+        self._expire()
+        if old is not None:
+            self._remove(old.category, old.id)
+        if new is not None and new.date is not None and new.date >= self.start():
+            self._add(new)
+            anomaly = self._score(new)
+            if anomaly is not None:
+                self._events.append(anomaly)
+
+    def _add(self, expense):
+        cents, ordinal = to_cents(expense.amount), expense.date.toordinal()
+        stats = self._stats.setdefault(expense.category, [0, 0, 0])
+        stats[0] += 1
+        stats[1] += cents
+        stats[2] += cents * cents
+        self._amounts.setdefault(expense.category, {})[expense.id] = (cents, ordinal)
+        heapq.heappush(self._expiry, (ordinal, expense.id, expense.category))
+
+    def _remove(self, category, expense_id):
+        amounts = self._amounts.get(category)
+        entry = amounts.pop(expense_id, None) if amounts is not None else None
+        if entry is None:
+            return  # Outside the window
+        cents = entry[0]
+        stats = self._stats[category]
+        stats[0] -= 1
+        stats[1] -= cents
+        stats[2] -= cents * cents
+        if stats[0] == 0:
+            del self._stats[category]
+            del self._amounts[category]
+
+    def _expire(self):
+        first = self.start().toordinal()
+        while self._expiry and self._expiry[0][0] < first:
+            ordinal, expense_id, category = heapq.heappop(self._expiry)
+            entry = self._amounts.get(category, {}).get(expense_id)
+            if entry is not None and entry[1] == ordinal:
+                self._remove(category, expense_id)
+
+    # (z, mean, std) of an amount against the other expenses of the category, or None when
+    # there are too few of them or they are all the same
+    def _leave_one_out(self, stats, cents):
+        count, total, squares = stats[0] - 1, stats[1] - cents, stats[2] - cents * cents
+        if count < MIN_HISTORY:
+            return None
+        # Exact integer arithmetic up to the final division
+        spread = count * squares - total * total
+        if spread <= 0:
+            return None
+        mean = total / count
+        std = math.sqrt(spread / (count * (count - 1)))
+        return (cents - mean) / std, mean / 100, std / 100
+
+    def _score(self, expense):
+        score = self._leave_one_out(self._stats[expense.category], to_cents(expense.amount))
+        if score is None or score[0] < Z_THRESHOLD:
+            return None
+        z, mean, std = score
+        return {"id": expense.id, "category": expense.category, "amount": expense.amount, "date": expense.date,
+                "mean": mean, "std": std, "z": z}
+
+    # Expenses of the window currently flagged, as dicts with the id, category, category
+    # mean and standard deviation, and z-score, in id order
+    def anomalies(self):
+        self._expire()
+        flagged = []
+        for category, amounts in self._amounts.items():
+            stats = self._stats[category]
+            if stats[0] - 1 < MIN_HISTORY:
+                continue
+            for expense_id, (cents, _) in amounts.items():
+                score = self._leave_one_out(stats, cents)
+                if score is not None and score[0] >= Z_THRESHOLD:
+                    z, mean, std = score
+                    flagged.append({"id": expense_id, "category": category, "mean": mean, "std": std, "z": z})
+        return sorted(flagged, key=lambda anomaly: anomaly["id"])
+
+    # Unusual expenses recorded since the last call, each flagged against the statistics
+    # of the moment it was written
+    def pop_events(self):
+        events, self._events = self._events, []
+        return events
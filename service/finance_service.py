@@ -1,13 +1,55 @@
-from repository.data_manager import DataManager
+from repository import csv_loader, instrumentation
+from repository.data_manager import DataManager, in_date_range
 from domain.income import Income
 from domain.expense import Expense
 from domain.budget import Budget
+from service.query_index import RecordIndex
+from service.monthly_rollup import MonthlyRollup
+from service.daily_rollup import DailyRollup
+from service.budget_alerts import BudgetAlertEngine, EXCEEDED, WARNING
+from service.expense_anomalies import ExpenseAnomalyDetector
+from service import columnar
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
-import tkinter.messagebox as MessageBox
+import math
+
+# Monthly reports kept by generate_monthly_report, least recently used dropped first
+REPORT_CACHE_SIZE = 240
+# Change sets kept for undo, oldest dropped first
+UNDO_LIMIT = 100
+# Filter values typed into the GUI or the command line arrive as text and are converted to
+# the type of the attribute, so every storage mode compares the same values
+FIELD_TYPES = {"id": int, "amount": float, "date": csv_loader.parse_date}
 
 class DataService:
-    def __init__(self):
-        self.data_manager = DataManager()
+    def __init__(self, data_manager=None):
+        self.data_manager = data_manager if data_manager is not None else DataManager()
+        # Views derived from the stored data: indexes answering filter/search/sort/range
+        # queries, the monthly and daily rollups behind the reports, the budget alert state
+        # and the unusual expense statistics. They are kept in step with every write made
+        # through this service and rebuilt when the stored data changes behind our back
+        # (see DataManager.data_version).
+        self._indexes = {entity: RecordIndex(entity) for entity in ("income", "expense", "budget")}
+        self._rollup = MonthlyRollup()
+        self._daily = DailyRollup()
+        self._alerts = BudgetAlertEngine()
+        self._anomalies = ExpenseAnomalyDetector()
+        self._views = list(self._indexes.values()) + [self._rollup, self._daily, self._alerts, self._anomalies]
+        if columnar.available():
+            self._columns = columnar.ColumnarLedger()
+            self._views.append(self._columns)
+        self._reports = OrderedDict()  # (year, month) -> (income and expense data versions, report)
+        # Held around writes, so another process using the same data directory cannot slip
+        # a change in between
+        self._lock = getattr(self.data_manager, "lock", None) or nullcontext()
+        # Writes staged by transaction() as (entity, id, record, expected, insert), None
+        # outside one
+        self._staged = None
+        # Change sets written through this service, each a list of (entity, id, record
+        # before, record after); undo() writes the inverse of the last one
+        self._undo = deque(maxlen=UNDO_LIMIT)
+        self._redo = []
     
     def _validate_positive_float(self, value):
         if not isinstance(value, (float, int)) or value <= 0:
@@ -20,43 +62,47 @@ class DataService:
                 raise ValueError("Date cannot be in the future.")
         except ValueError:
             raise ValueError("Invalid date format. Use YYYY-MM-DD.")
+        # Store the same date object the repository produces when it parses the file
+        return date_obj.date()
 
     def _show_error(self, message):
+        # Imported here so the service stays usable without Tk (command line, no display)
+        import tkinter.messagebox as MessageBox
         MessageBox.showerror("Validation Error", message)
 
     def create_income(self, source, amount, date, description):
         self._validate_positive_float(amount)
-        self._validate_date(date)
-        income = Income(self._generate_id(self.data_manager.load_incomes()), source, amount, date, description)
-        self.data_manager.create_income(income)
+        date = self._validate_date(date)
+        income = Income(self.data_manager.next_ids("income"), source, amount, date, description)
+        self._write("income", income.id, income, lambda: self.data_manager.create_income(income), created=True)
 
-    def update_income(self, income_id, source, amount, date, description):
+    def update_income(self, income_id, source, amount, date, description, expected=None):
         self._validate_positive_float(amount)
-        self._validate_date(date)
+        date = self._validate_date(date)
         updated_income = Income(income_id, source, amount, date, description)
-        self.data_manager.update_income(income_id, updated_income)
+        self._write("income", income_id, updated_income, lambda: self.data_manager.update_income(income_id, updated_income, expected), expected)
 
     def create_expense(self, category, amount, date, description):
         self._validate_positive_float(amount)
-        self._validate_date(date)
-        expense = Expense(self._generate_id(self.data_manager.load_expenses()), category, amount, date, description)
-        self.data_manager.create_expense(expense)
+        date = self._validate_date(date)
+        expense = Expense(self.data_manager.next_ids("expense"), category, amount, date, description)
+        self._write("expense", expense.id, expense, lambda: self.data_manager.create_expense(expense), created=True)
 
-    def update_expense(self, expense_id, category, amount, date, description):
+    def update_expense(self, expense_id, category, amount, date, description, expected=None):
         self._validate_positive_float(amount)
-        self._validate_date(date)
+        date = self._validate_date(date)
         updated_expense = Expense(expense_id, category, amount, date, description)
-        self.data_manager.update_expense(expense_id, updated_expense)
+        self._write("expense", expense_id, updated_expense, lambda: self.data_manager.update_expense(expense_id, updated_expense, expected), expected)
 
     def create_budget(self, category, amount):
         self._validate_positive_float(amount)
-        budget = Budget(self._generate_id(self.data_manager.load_budgets()), category, amount)
-        self.data_manager.create_budget(budget)
+        budget = Budget(self.data_manager.next_ids("budget"), category, amount)
+        self._write("budget", budget.id, budget, lambda: self.data_manager.create_budget(budget), created=True)
 
-    def update_budget(self, budget_id, category, amount):
+    def update_budget(self, budget_id, category, amount, expected=None):
         self._validate_positive_float(amount)
         updated_budget = Budget(budget_id, category, amount)
-        self.data_manager.update_budget(budget_id, updated_budget)
+        self._write("budget", budget_id, updated_budget, lambda: self.data_manager.update_budget(budget_id, updated_budget, expected), expected)
 
     # Income CRUD
     """def create_income(self, source, amount, date, description):
@@ -67,8 +113,8 @@ class DataService:
         updated_income = Income(income_id, source, amount, date, description)
         self.data_manager.update_income(income_id, updated_income)"""
 
-    def delete_income(self, income_id):
-        self.data_manager.delete_income(income_id)
+    def delete_income(self, income_id, expected=None):
+        self._write("income", income_id, None, lambda: self.data_manager.delete_income(income_id, expected), expected)
 
     def get_incomes(self):
         return self.data_manager.load_incomes()
@@ -82,8 +128,8 @@ class DataService:
         updated_expense = Expense(expense_id, category, amount, date, description)
         self.data_manager.update_expense(expense_id, updated_expense)"""
 
-    def delete_expense(self, expense_id):
-        self.data_manager.delete_expense(expense_id)
+    def delete_expense(self, expense_id, expected=None):
+        self._write("expense", expense_id, None, lambda: self.data_manager.delete_expense(expense_id, expected), expected)
 
     def get_expenses(self):
         return self.data_manager.load_expenses()
@@ -97,123 +143,521 @@ class DataService:
         updated_budget = Budget(budget_id, category, amount)
         self.data_manager.update_budget(budget_id, updated_budget)"""
 
-    def delete_budget(self, budget_id):
-        self.data_manager.delete_budget(budget_id)
+    def delete_budget(self, budget_id, expected=None):
+        self._write("budget", budget_id, None, lambda: self.data_manager.delete_budget(budget_id, expected), expected)
 
     def get_budgets(self):
         return self.data_manager.load_budgets()
 
-    # Helper to generate new ID
-    def _generate_id(self, data_list):
-        if not data_list:
-            return 1
-        return max(item.id for item in data_list) + 1
-    
+    # Bulk import, e.g. of a bank statement. rows holds (source or category, amount, date,
+    # description) tuples; amounts may still be text. Every row is validated, the valid
+    # ones get consecutive new ids and are stored in a single append, and the invalid
+    # ones are reported as (line, message) with lines counted from first_line. Empty rows
+    # (blank lines) are skipped but still counted, so the lines match the file.
+    def import_incomes(self, rows, first_line=1):
+        return self._import("income", Income, rows, first_line, self.data_manager.append_incomes)
+
+    def import_expenses(self, rows, first_line=1):
+        return self._import("expense", Expense, rows, first_line, self.data_manager.append_expenses)
+
+    def _import(self, entity, factory, rows, first_line, appender):
+        valid, errors = [], []
+        for line, row in enumerate(rows, first_line):
+            if not row:
+                continue
+            try:
+                if len(row) != 4:
+                    raise ValueError(f"Expected 4 fields, got {len(row)}.")
+                category, amount, date, description = row
+                amount = self._parse_amount(amount)
+                self._validate_positive_float(amount)
+                date = self._validate_date(date)
+            except ValueError as e:
+                errors.append((line, str(e)))
+                continue
+            valid.append((category, amount, date, description))
+        if valid:
+            # One block of ids for the whole batch
+            first_id = self.data_manager.next_ids(entity, len(valid))
+            records = [factory(first_id + i, *values) for i, values in enumerate(valid)]
+            self._write_many(entity, records, lambda: appender(records))
+        return {"imported": len(valid), "errors": errors}
+
+    def _parse_amount(self, amount):
+        if not isinstance(amount, str):
+            return amount
+        try:
+            value = float(amount)
+        except ValueError:
+            value = math.nan
+        if not math.isfinite(value):
+            raise ValueError("Amount must be a positive number.")
+        return value
+
+    # Streaming access: records are produced one at a time instead of as one list, with the
+    # date range (inclusive) pushed down to storage and an optional predicate on each record
+    def iter_incomes(self, predicate=None, start=None, end=None):
+        return self._iter("income", predicate, start, end)
+
+    def iter_expenses(self, predicate=None, start=None, end=None):
+        return self._iter("expense", predicate, start, end)
+
+    def iter_budgets(self, predicate=None):
+        return self._iter("budget", predicate)
+
+    # Unit of work: the creates, updates, deletes and imports made inside
+    #     with service.transaction():
+    # are validated as they are made but stored only when the block ends, with one write
+    # per entity, and undo() reverts them as one step. An exception inside the block drops
+    # them all, and so does a ConflictError when they are stored. Reads inside the block
+    # still see the stored data. A nested transaction is part of the outer one.
+    @contextmanager
+    def transaction(self):
+        if self._staged is not None:
+            yield
+            return
+        self._staged = []
+        try:
+            yield
+            staged = self._staged
+        finally:
+            self._staged = None
+        if staged:
+            self._remember(self._apply(staged))
+
+    # Reverts the last change set written through this service (a single write or a
+    # transaction) with one write per entity, and returns the number of records changed,
+    # 0 when there is nothing to undo. A ConflictError, when a record has been changed
+    # since, leaves the data and the history as they were.
+    def undo(self):
+        if self._staged is not None:
+            raise RuntimeError("Cannot undo inside a transaction.")
+        if not self._undo:
+            return 0
+        applied = self._apply(self._inverse(self._undo[-1]))
+        self._undo.pop()
+        self._redo.append(applied)
+        return len(applied)
+
+    # Writes the last undone change set again, same as undo() otherwise
+    def redo(self):
+        if self._staged is not None:
+            raise RuntimeError("Cannot redo inside a transaction.")
+        if not self._redo:
+            return 0
+        applied = self._apply(self._inverse(self._redo[-1]))
+        self._redo.pop()
+        self._undo.append(applied)
+        return len(applied)
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def _remember(self, applied):
+        if applied:
+            self._undo.append(applied)
+            self._redo.clear()
+
+    # Changes putting back the records before a change set, last change first, each
+    # expecting the record the change set left
+    def _inverse(self, applied):
+        return [(entity, record_id, before, after, True) for entity, record_id, before, after in reversed(applied)]
+
+    # Stores (entity, id, record, expected, insert) changes with one
+    # DataManager.apply_changes call per entity and keeps the current views in step. If an
+    # entity fails, the ones already stored are put back, so the batch is all or nothing.
+    # Returns the applied changes as (entity, id, record before, record after); updates of
+    # records that are not stored are left out, like the no-ops they were.
+    def _apply(self, changes):
+        applied = []
+        with self._lock:
+            try:
+                for entity in dict.fromkeys(change[0] for change in changes):
+                    batch = [change[1:] for change in changes if change[0] == entity]
+                    version = self.data_manager.data_version(entity)
+                    current = [view for view in self._views if hasattr(view, "apply") and self._is_current(view, entity, version)]
+                    previous = self.data_manager.apply_changes(entity, batch)
+                    version = self.data_manager.data_version(entity)
+                    done = [(entity, record_id, old, record) for (record_id, record, _, insert), old in zip(batch, previous)
+                            if old is not None or (record is not None and insert)]
+                    for view in current:
+                        for _, _, old, record in done:
+                            view.apply(entity, old, record)
+                        view.versions[entity] = version
+                    applied.extend(done)
+            except BaseException:
+                if applied:
+                    self._apply(self._inverse(applied))
+                raise
+        return applied
+
+    # Runs a repository write and applies the same change to every view that was up to date
+    # before it. A view that was already stale is left alone and rebuilt on its next use.
+    # Inside a transaction the change is only staged.
+    def _write(self, entity, record_id, record, write, expected=None, created=False):
+        if self._staged is not None:
+            self._staged.append((entity, record_id, record, expected, created))
+            return
+        with self._lock:
+            version = self.data_manager.data_version(entity)
+            old = None
+            if not created:
+                # The record being replaced, for the views and the undo history; the write
+                # fails unless the stored one equals expected
+                old = expected if expected is not None else self._find(entity, record_id, version)
+            # Views without apply() cannot be updated in place; they go stale and get rebuilt
+            current = [view for view in self._views if hasattr(view, "apply") and self._is_current(view, entity, version)]
+            matched = write()
+            version = self.data_manager.data_version(entity)
+        if not created and (old is None or matched is False):
+            # An update or delete of a record that is not stored changes nothing; the views
+            # only need the new data_version if the storage rewrote the file anyway
+            for view in current:
+                view.versions[entity] = version
+            return
+        for view in current:
+            view.apply(entity, old, record)
+            view.versions[entity] = version
+        if created or old is not None:
+            self._remember([(entity, record_id, old, record)])
+
+    # Same as _write for a batch of new records
+    def _write_many(self, entity, records, write):
+        if self._staged is not None:
+            self._staged.extend((entity, record.id, record, None, True) for record in records)
+            return
+        with self._lock:
+            version = self.data_manager.data_version(entity)
+            current = [view for view in self._views if hasattr(view, "apply") and self._is_current(view, entity, version)]
+            write()
+            version = self.data_manager.data_version(entity)
+        for view in current:
+            for record in records:
+                view.apply(entity, None, record)
+            view.versions[entity] = version
+        self._remember([(entity, record.id, None, record) for record in records])
+
+    def _is_current(self, view, entity, version):
+        return entity in view.versions and view.versions[entity] == version
+
+    def _find(self, entity, record_id, version):
+        index = self._indexes[entity]
+        if self._is_current(index, entity, version):
+            return index.get(record_id)
+        return next(self._iter(entity, lambda record: record.id == record_id), None)
+
+    def _view(self, view):
+        versions = {entity: self.data_manager.data_version(entity) for entity in view.entities}
+        if view.versions != versions:
+            with instrumentation.timed(f"{type(view).__name__}.rebuild"):
+                if isinstance(view, RecordIndex):
+                    loaders = {"income": self.get_incomes, "expense": self.get_expenses, "budget": self.get_budgets}
+                    data = {entity: loaders[entity]() for entity in view.entities}
+                else:
+                    # Aggregating views take the records as a stream, so rebuilding reports and
+                    # alerts over a ledger bigger than memory only needs memory for the totals
+                    data = {entity: self._iter(entity) for entity in view.entities}
+                view.rebuild(data, versions)
+        return view
+
+    # Records of an entity as a stream, from the index when it is current, else from storage
+    def _iter(self, entity, predicate=None, start=None, end=None):
+        index = self._indexes[entity]
+        if self._is_current(index, entity, self.data_manager.data_version(entity)):
+            return (record for record in index.records()
+                    if in_date_range(getattr(record, "date", None), start, end) and (predicate is None or predicate(record)))
+        if entity == "budget":
+            return self.data_manager.iter_budgets(predicate)
+        iterators = {"income": self.data_manager.iter_incomes, "expense": self.data_manager.iter_expenses}
+        return iterators[entity](predicate, start, end)
+
+    def _index(self, entity):
+        return self._view(self._indexes[entity])
+
+    # Backends with supports_queries (e.g. SQLite) answer filter, search, sort and report
+    # queries themselves instead of returning every row for a Python scan
+    def _pushdown(self):
+        return getattr(self.data_manager, "supports_queries", False)
+
         # Filtering by attribute
     def filter_incomes(self, key, value):
-        return [income for income in self.get_incomes() if getattr(income, key) == value]
+        return self._filter("income", key, value)
 
     def filter_expenses(self, key, value):
-        return [expense for expense in self.get_expenses() if getattr(expense, key) == value]
+        return self._filter("expense", key, value)
 
     def filter_budgets(self, key, value):
-        return [budget for budget in self.get_budgets() if getattr(budget, key) == value]
+        return self._filter("budget", key, value)
+
+    def _filter(self, entity, key, value):
+        if isinstance(value, str) and key in FIELD_TYPES:
+            try:
+                value = FIELD_TYPES[key](value)
+            except ValueError:
+                return []  # Not a valid id, amount or date, so no record has it
+        if self._pushdown():
+            return self.data_manager.query(entity, key=key, value=value)
+        return self._index(entity).filter(key, value)
 
     # Searching by attribute
     def search_incomes(self, key, query):
-        return [income for income in self.get_incomes() if query.lower() in str(getattr(income, key)).lower()]
+        if self._pushdown():
+            return self.data_manager.query("income", key=key, search=query)
+        return self._index("income").search(key, query)
 
     def search_expenses(self, key, query):
-        return [expense for expense in self.get_expenses() if query.lower() in str(getattr(expense, key)).lower()]
+        if self._pushdown():
+            return self.data_manager.query("expense", key=key, search=query)
+        return self._index("expense").search(key, query)
 
     def search_budgets(self, key, query):
-        return [budget for budget in self.get_budgets() if query.lower() in str(getattr(budget, key)).lower()]
+        if self._pushdown():
+            return self.data_manager.query("budget", key=key, search=query)
+        return self._index("budget").search(key, query)
 
     # Sorting by attribute
     def sort_incomes(self, key, reverse=False):
-        return sorted(self.get_incomes(), key=lambda income: getattr(income, key), reverse=reverse)
+        if self._pushdown():
+            return self.data_manager.query("income", order_by=key, reverse=reverse)
+        return self._index("income").sort(key, reverse)
 
     def sort_expenses(self, key, reverse=False):
-        return sorted(self.get_expenses(), key=lambda expense: getattr(expense, key), reverse=reverse)
+        if self._pushdown():
+            return self.data_manager.query("expense", order_by=key, reverse=reverse)
+        return self._index("expense").sort(key, reverse)
 
     def sort_budgets(self, key, reverse=False):
-        return sorted(self.get_budgets(), key=lambda budget: getattr(budget, key), reverse=reverse)
+        if self._pushdown():
+            return self.data_manager.query("budget", order_by=key, reverse=reverse)
+        return self._index("budget").sort(key, reverse)
+
+    # Range queries (inclusive, either bound may be None), ordered by the attribute
+    def range_incomes(self, key, low=None, high=None):
+        if self._pushdown():
+            return self.data_manager.query("income", key=key, between=(low, high))
+        return self._index("income").range(key, low, high)
+
+    def range_expenses(self, key, low=None, high=None):
+        if self._pushdown():
+            return self.data_manager.query("expense", key=key, between=(low, high))
+        return self._index("expense").range(key, low, high)
+
+    def range_budgets(self, key, low=None, high=None):
+        if self._pushdown():
+            return self.data_manager.query("budget", key=key, between=(low, high))
+        return self._index("budget").range(key, low, high)
     
     def generate_monthly_report(self, year, month):
-        incomes = self.get_incomes()
-        expenses = self.get_expenses()
-
-        # Filtrare venituri și cheltuieli pentru luna specificată
-        monthly_incomes = [income for income in incomes if self._is_in_month(income.date, month, year)]
-        monthly_expenses = [expense for expense in expenses if self._is_in_month(expense.date, month, year)]
-
-        total_income = sum(income.amount for income in monthly_incomes)
-        total_expense = sum(expense.amount for expense in monthly_expenses)
+        # A cached report is reused until the incomes or expenses change
+        versions = (self.data_manager.data_version("income"), self.data_manager.data_version("expense"))
+        cached = self._reports.get((year, month))
+        if cached is not None and cached[0] == versions:
+            self._reports.move_to_end((year, month))
+            return dict(cached[1])
+
+        if hasattr(self.data_manager, "monthly_totals"):
+            total_income, total_expense = self.data_manager.monthly_totals(year, month)
+        else:
+            rollup = self._view(self._rollup)
+            total_income = rollup.total("income", year, month)
+            total_expense = rollup.total("expense", year, month)
         savings = total_income - total_expense
 
-        return {
+        report = {
             "total_income": total_income,
             "total_expense": total_expense,
             "savings": savings,
             "month": month,
             "year": year
         }
+        self._reports[(year, month)] = (versions, report)
+        if len(self._reports) > REPORT_CACHE_SIZE:
+            self._reports.popitem(last=False)
+        return dict(report)
+
+    # Reports over several months, built from the same per-month totals
+    def generate_period_report(self, start_year, start_month, end_year, end_month):
+        months = []
+        year, month = start_year, start_month
+        while (year, month) <= (end_year, end_month):
+            months.append(self.generate_monthly_report(year, month))
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        total_income = sum(report["total_income"] for report in months)
+        total_expense = sum(report["total_expense"] for report in months)
+        return {
+            "total_income": total_income,
+            "total_expense": total_expense,
+            "savings": total_income - total_expense,
+            "months": months
+        }
 
-    def _is_in_month(self, date_obj, month, year):
-        if date_obj is None:
-            print("Date is None")
-            return False
- 
-        print(f"Checking date: {date_obj}, month: {month}, year: {year}")
-        return date_obj.year == year and date_obj.month == month
-
-    def check_budget_exceed(self):
-        budgets = self.get_budgets()
-        expenses = self.get_expenses()
-        notifications = []
+    def generate_yearly_report(self, year):
+        report = self.generate_period_report(year, 1, year, 12)
+        report["year"] = year
+        return report
 
-        budget_dict = {budget.category: budget.amount for budget in budgets}
-        category_totals = {}
+    def get_category_breakdown(self, year, month):
+        rollup = self._view(self._rollup)
+        return {
+            "incomes": rollup.category_totals("income", year, month),
+            "expenses": rollup.category_totals("expense", year, month)
+        }
 
-    # Calculează totalul cheltuielilor pe fiecare categorie
-        for expense in expenses:
-            if expense.category not in category_totals:
-                category_totals[expense.category] = 0
-            category_totals[expense.category] += expense.amount
+    # Totals over a date range (inclusive, either end may be None) and per month or category
+    # over any span of history, with keys in ascending order. Computed on NumPy columns when
+    # NumPy is installed.
+    def get_range_totals(self, start=None, end=None):
+        total_income = self._range_total("income", start, end)
+        total_expense = self._range_total("expense", start, end)
+        return {
+            "total_income": total_income,
+            "total_expense": total_expense,
+            "savings": total_income - total_expense,
+            "start": start,
+            "end": end
+        }
 
-    # Verifică dacă totalul cheltuielilor depășește bugetul alocat
-        for category, total in category_totals.items():
-            if category in budget_dict:
-                budget = budget_dict[category]
-                if total > budget:  # Verifică dacă cheltuielile depășesc complet bugetul
-                    notifications.append(f"Alert: You have exceeded the budget in category '{category}'.")
+    def get_monthly_totals(self, entity, start=None, end=None):
+        if columnar.available():
+            return self._view(self._columns).group_by_month(entity, start, end)
+        return self._group_totals(entity, lambda record: (record.date.year, record.date.month), start, end)
+
+    def get_category_totals(self, entity, start=None, end=None):
+        if columnar.available():
+            return self._view(self._columns).group_by_category(entity, start, end)
+        field = "source" if entity == "income" else "category"
+        return self._group_totals(entity, lambda record: getattr(record, field), start, end)
+
+    def _range_total(self, entity, start, end):
+        if columnar.available():
+            return self._view(self._columns).range_total(entity, start, end)
+        return sum((record.amount for record in self._records_between(entity, start, end)), 0.0)
+
+    def _group_totals(self, entity, group, start, end):
+        totals = {}
+        for record in self._records_between(entity, start, end):
+            key = group(record)
+            totals[key] = totals.get(key, 0.0) + record.amount
+        return dict(sorted(totals.items()))
+
+    def _records_between(self, entity, start, end):
+        # A range with no bounds still leaves out records without a date
+        return self._iter(entity, lambda record: record.date is not None, start, end)
+
+    # Time series over incomes or expenses, all served from the daily rollup. period is one
+    # of "day", "week", "month", "quarter" or "year"; keys are a date, (ISO year, week),
+    # (year, month), (year, quarter) or a year, in ascending order. start/end are inclusive
+    # dates and either may be None.
+    def get_period_totals(self, entity, period="month", start=None, end=None):
+        return self._view(self._daily).totals(entity, period, start, end)
+
+    def get_period_category_totals(self, entity, period="month", start=None, end=None):
+        return self._view(self._daily).category_totals(entity, period, start, end)
+
+    # Average of the `months` months ending at each month from start to end, where a month
+    # without records counts as 0. Months before start still fill the first windows.
+    def get_rolling_averages(self, entity, months=3, start=None, end=None):
+        if months < 1:
+            raise ValueError("The window must be at least one month.")
+        totals = self.get_period_totals(entity, "month", None, end)
+        if not totals:
+            return {}
+        first = (start.year, start.month) if start is not None else next(iter(totals))
+        last = (end.year, end.month) if end is not None else list(totals)[-1]
+        averages = {}
+        year, month = self._add_months(first, 1 - months)
+        window = []
+        while (year, month) <= last:
+            window.append(totals.get((year, month), 0.0))
+            if len(window) > months:
+                window.pop(0)
+            if (year, month) >= first:
+                averages[(year, month)] = sum(window) / months
+            year, month = self._add_months((year, month), 1)
+        return averages
+
+    def _add_months(self, year_month, count):
+        index = year_month[0] * 12 + year_month[1] - 1 + count
+        return (index // 12, index % 12 + 1)
+
+    # Each period's total next to the same period one year earlier: {key: {"total",
+    # "previous", "delta", "change"}}, where change is the relative delta, or None when the
+    # previous total is 0
+    def get_year_over_year(self, entity, period="month", start=None, end=None):
+        if period == "day":
+            raise ValueError("Year-over-year deltas need a period of a week or longer.")
+        daily = self._view(self._daily)
+        current = daily.totals(entity, period, start, end)
+        # The same stretch of days a year earlier, so partial first and last periods compare like for like
+        previous = daily.totals(entity, period, self._year_earlier(start), self._year_earlier(end))
+        deltas = {}
+        for key, total in current.items():
+            previous_key = key - 1 if period == "year" else (key[0] - 1, key[1])
+            previous_total = previous.get(previous_key, 0.0)
+            deltas[key] = {
+                "total": total,
+                "previous": previous_total,
+                "delta": total - previous_total,
+                "change": (total - previous_total) / previous_total if previous_total else None
+            }
+        return deltas
+
+    def _year_earlier(self, day):
+        if day is None:
+            return None
+        if day.month == 2 and day.day == 29:
+            return day.replace(year=day.year - 1, day=28)
+        return day.replace(year=day.year - 1)
+
+    def rebuild_rollups(self):
+        self._rollup.versions = {}
+        self._daily.versions = {}
+        self._view(self._rollup)
+        self._view(self._daily)
 
-        return notifications
+    def check_budget_exceed(self):
+        alerts = self._view(self._alerts)
+        return [f"Alert: You have exceeded the budget in category '{category}'." for category in alerts.categories(EXCEEDED)]
 
     def detect_unusual_expenses(self):
-        expenses = self.get_expenses()
-        category_totals = {}
-
-    # Obține bugetele din funcția ta de obținere a bugetelor
-        budgets = self.get_budgets()
-
-    # Creează un dicționar cu totalul cheltuielilor pe fiecare categorie
-        for expense in expenses:
-            if expense.category not in category_totals:
-                category_totals[expense.category] = 0
-            category_totals[expense.category] += expense.amount
-
-    # Creează un dicționar cu bugetele pe fiecare categorie
-        budget_dict = {budget.category: budget.amount for budget in budgets}
-
-    # Detectează depășirea a 90% din buget și adaugă notificări
-        notifications = []
-
-        for category, total in category_totals.items():
-        # Verifică dacă s-a cheltuit 90% sau mai mult din bugetul alocat pentru categoria respectivă
-            if category in budget_dict:
-                budget = budget_dict[category]
-                if budget > 0 and total >= budget * 0.9 and total < budget:  # 90% din buget
-                    notifications.append(f"Warning: You have spent 90% or more of your budget in the '{category}' category.")
-
-        return notifications
\ No newline at end of file
+        # Categories where 90% or more of the budget is spent, without going over it
+        alerts = self._view(self._alerts)
+        return [f"Warning: You have spent 90% or more of your budget in the '{category}' category." for category in alerts.categories(WARNING)]
+
+    # Expenses far above what is usual for their category (see ExpenseAnomalyDetector). The
+    # detector keeps amounts only, so the flagged records are read in one streaming pass
+    # over its window.
+    def detect_anomalous_expenses(self):
+        detector = self._view(self._anomalies)
+        anomalies = {anomaly["id"]: anomaly for anomaly in detector.anomalies()}
+        if not anomalies:
+            return []
+        expenses = sorted(self._iter("expense", lambda expense: expense.id in anomalies, start=detector.start()),
+                          key=lambda expense: expense.id)
+        return [f"Unusual expense: {expense.amount} for '{expense.category}' on {expense.date}, "
+                f"usually {anomalies[expense.id]['mean']:.2f} ± {anomalies[expense.id]['std']:.2f}." for expense in expenses]
+
+    # Unusual expenses recorded by the writes made since the last call, as dicts with the
+    # id, category, amount, date, category mean and standard deviation, and z-score
+    def pop_expense_anomalies(self):
+        return self._anomalies.pop_events()
+
+    # Budget alerts raised by the writes made since the last call, as dicts with the
+    # type ("exceeded" or "warning"), category, total spent and budget
+    def pop_budget_alerts(self):
+        return self._alerts.pop_events()
+
+# Service operations timed by instrumentation.STATS
+instrumentation.instrument(DataService, (
+    "create_income", "update_income", "delete_income", "get_incomes", "create_expense", "update_expense",
+    "delete_expense", "get_expenses", "create_budget", "update_budget", "delete_budget", "get_budgets",
+    "import_incomes", "import_expenses", "undo", "redo", "filter_incomes", "filter_expenses", "filter_budgets", "search_incomes",
+    "search_expenses", "search_budgets", "sort_incomes", "sort_expenses", "sort_budgets", "range_incomes",
+    "range_expenses", "range_budgets", "generate_monthly_report", "generate_period_report", "generate_yearly_report",
+    "get_category_breakdown", "get_range_totals", "get_monthly_totals", "get_category_totals", "get_period_totals",
+    "get_period_category_totals", "get_rolling_averages", "get_year_over_year", "rebuild_rollups",
+    "check_budget_exceed", "detect_unusual_expenses", "detect_anomalous_expenses",
+))
@@ -0,0 +1,55 @@
+# Amounts are added up in integer cents, so taking records away again leaves no float
+# residue and a bucket kept up to date by apply() equals the same bucket rebuilt
+def to_cents(amount):
+    return round(amount * 100)
+
+# Running totals of incomes and expenses per (year, month) and per (year, month, category),
+# where the category of an income is its source. generate_monthly_report and the multi-month
+# reports read these buckets instead of scanning every record. Records without a date are
+# not part of any month.
+class MonthlyRollup:
+    entities = ("income", "expense")
+
+    def __init__(self):
+        self.versions = {}
+        self._totals = {}  # (entity, year, month) -> [total in cents, count]
+        self._categories = {}  # (entity, year, month) -> {category: [total in cents, count]}
+
+    def rebuild(self, data, versions):
+        self.__init__()
+        for entity in self.entities:
+            for record in data[entity]:
+                self._add(entity, record, 1)
+        self.versions = versions
+
+    def apply(self, entity, old, new):
+        if old is not None:
+            self._add(entity, old, -1)
+        if new is not None:
+            self._add(entity, new, 1)
+
+    def _add(self, entity, record, sign):
+        if record.date is None:
+            return
+        category = record.source if entity == "income" else record.category
+        month_key = (entity, record.date.year, record.date.month)
+        categories = self._categories.setdefault(month_key, {})
+        cents = sign * to_cents(record.amount)
+        for buckets, key in ((self._totals, month_key), (categories, category)):
+            bucket = buckets.setdefault(key, [0, 0])
+            bucket[0] += cents
+            bucket[1] += sign
+            if bucket[1] == 0:
+                del buckets[key]
+        if not categories:
+            del self._categories[month_key]
+
+    def total(self, entity, year, month):
+        bucket = self._totals.get((entity, year, month))
+        return bucket[0] / 100 if bucket else 0
+
+    def category_totals(self, entity, year, month):
+        return {category: bucket[0] / 100 for category, bucket in self._categories.get((entity, year, month), {}).items()}
+
+    def months(self, entity):
+        return sorted(key[1:] for key in self._totals if key[0] == entity)
@@ -0,0 +1,152 @@
+from bisect import bisect_left, bisect_right, insort
+from itertools import groupby
+from operator import itemgetter
+
+NGRAM = 3
+
+def _text(value):
+    # The text form search_* matches against
+    return str(value).lower()
+
+def _ngrams(text):
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+# In-memory indexes over one entity's records, used by DataService.filter_*, search_*,
+# sort_* and range_*. Indexes are built per attribute the first time it is queried and
+# then kept up to date record by record through apply(); rebuild() starts over from a
+# freshly loaded list. Results are returned in file order, like the list scans they replace.
+#
+# Like every view DataService derives from the stored data, it records the data_version of
+# each entity it was built from in `versions` and exposes rebuild()/apply().
+class RecordIndex:
+    def __init__(self, entity):
+        self.entities = (entity,)
+        self.versions = {}
+        self._records = {}  # id -> record
+        self._position = {}  # id -> file order, ties in sorts keep this order
+        self._next_position = 0
+        self._hash = {}  # key -> {value: set of ids}
+        self._sorted = {}  # key -> sorted list of (value, position, id)
+        self._ngrams = {}  # key -> {ngram: set of ids}
+
+    def rebuild(self, data, versions):
+        self.__init__(self.entities[0])
+        for record in data[self.entities[0]]:
+            self._records[record.id] = record
+            self._position[record.id] = self._next_position
+            self._next_position += 1
+        self.versions = versions
+
+    def records(self):
+        return list(self._records.values())
+
+    def get(self, record_id):
+        return self._records.get(record_id)
+
+    def apply(self, entity, old, new):
+        # old is None for a create, new is None for a delete; an update keeps the
+        # record's place in file order
+        if old is not None:
+            self._unindex(self._records.pop(old.id))
+            if new is None:
+                del self._position[old.id]
+                return
+            self._position[new.id] = self._position.pop(old.id)
+        elif new is None:
+            return
+        else:
+            self._position[new.id] = self._next_position
+            self._next_position += 1
+        self._records[new.id] = new
+        self._index(new)
+
+    def _index(self, record):
+        for key, index in self._hash.items():
+            index.setdefault(getattr(record, key), set()).add(record.id)
+        for key, entries in self._sorted.items():
+            insort(entries, (getattr(record, key), self._position[record.id], record.id))
+        for key, index in self._ngrams.items():
+            for gram in _ngrams(_text(getattr(record, key))):
+                index.setdefault(gram, set()).add(record.id)
+
+    def _unindex(self, record):
+        for key, index in self._hash.items():
+            value = getattr(record, key)
+            ids = index.get(value)
+            if ids is not None:
+                ids.discard(record.id)
+                if not ids:
+                    del index[value]
+        for key, entries in self._sorted.items():
+            entry = (getattr(record, key), self._position[record.id], record.id)
+            i = bisect_left(entries, entry)
+            if i < len(entries) and entries[i] == entry:
+                del entries[i]
+        for key, index in self._ngrams.items():
+            for gram in _ngrams(_text(getattr(record, key))):
+                ids = index.get(gram)
+                if ids is not None:
+                    ids.discard(record.id)
+                    if not ids:
+                        del index[gram]
+
+    def _hash_index(self, key):
+        if key not in self._hash:
+            index = {}
+            for record in self._records.values():
+                index.setdefault(getattr(record, key), set()).add(record.id)
+            self._hash[key] = index
+        return self._hash[key]
+
+    def _sorted_index(self, key):
+        if key not in self._sorted:
+            self._sorted[key] = sorted(
+                (getattr(record, key), self._position[record.id], record.id) for record in self._records.values())
+        return self._sorted[key]
+
+    def _ngram_index(self, key):
+        if key not in self._ngrams:
+            index = {}
+            for record in self._records.values():
+                for gram in _ngrams(_text(getattr(record, key))):
+                    index.setdefault(gram, set()).add(record.id)
+            self._ngrams[key] = index
+        return self._ngrams[key]
+
+    def _in_file_order(self, ids):
+        return [self._records[record_id] for record_id in sorted(ids, key=self._position.__getitem__)]
+
+    # Queries
+    def filter(self, key, value):
+        return self._in_file_order(self._hash_index(key).get(value, ()))
+
+    def search(self, key, query):
+        query = query.lower()
+        if len(query) < NGRAM:
+            # Too short for the n-gram index; test each distinct value once instead of each row
+            ids = set()
+            for value, value_ids in self._hash_index(key).items():
+                if query in _text(value):
+                    ids |= value_ids
+            return self._in_file_order(ids)
+        index = self._ngram_index(key)
+        postings = sorted((index.get(gram, set()) for gram in _ngrams(query)), key=len)
+        candidates = set.intersection(*postings) if postings else set()
+        return self._in_file_order(
+            record_id for record_id in candidates if query in _text(getattr(self._records[record_id], key)))
+
+    def sort(self, key, reverse=False):
+        entries = self._sorted_index(key)
+        if not reverse:
+            return [self._records[entry[2]] for entry in entries]
+        # Descending by value, but equal values keep file order, as sorted(reverse=True) does
+        result = []
+        for _, group in groupby(reversed(entries), key=itemgetter(0)):
+            result.extend(self._records[entry[2]] for entry in reversed(list(group)))
+        return result
+
+    def range(self, key, low=None, high=None):
+        entries = self._sorted_index(key)
+        start = 0 if low is None else bisect_left(entries, low, key=itemgetter(0))
+        end = len(entries) if high is None else bisect_right(entries, high, key=itemgetter(0))
+        return [self._records[entry[2]] for entry in entries[start:end]]
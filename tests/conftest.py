@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.ledger_generator import generate_ledger
+from repository.data_manager import DataManager, income_to_row, expense_to_row, budget_to_row
+from repository.storage import STORAGE_MODES, open_data_manager
+
+# Ledger rows generated for every test data directory
+LEDGER_ROWS = 400
+
+# Modes whose data has to be imported from the generated CSV files
+IMPORTED_MODES = ("partitioned", "sqlite")
+
+@pytest.fixture
+def ledger_dir(tmp_path):
+    generate_ledger(str(tmp_path), LEDGER_ROWS, seed=7)
+    return str(tmp_path)
+
+def open_mode(storage, data_dir):
+    data_manager = open_data_manager(storage, data_dir)
+    if storage in IMPORTED_MODES and not data_manager.load_expenses():
+        data_manager.import_from(DataManager(data_dir))
+    return data_manager
+
+@pytest.fixture(params=list(STORAGE_MODES))
+def storage(request):
+    return request.param
+
+@pytest.fixture
+def opened(storage, ledger_dir):
+    # Opens more managers on the same directory, closing them all at the end
+    managers = []
+
+    def open_manager():
+        managers.append(open_mode(storage, ledger_dir))
+        return managers[-1]
+    yield open_manager
+    for data_manager in managers:
+        if hasattr(data_manager, "close"):
+            data_manager.close()
+
+@pytest.fixture
+def data_manager(opened):
+    return opened()
+
+# Everything stored, as comparable rows in id order
+def stored_rows(data_manager):
+    return {
+        "income": sorted(map(income_to_row, data_manager.load_incomes())),
+        "expense": sorted(map(expense_to_row, data_manager.load_expenses())),
+        "budget": sorted(map(budget_to_row, data_manager.load_budgets())),
+    }
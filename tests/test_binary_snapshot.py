@@ -0,0 +1,64 @@
+import os
+from datetime import date
+
+from domain.expense import Expense
+from repository import binary_snapshot
+from repository.binary_snapshot import SnapshotRecords
+from repository.data_manager import DataManager, expense_to_row, file_signature, replace_atomic
+
+
+def write(path, records, signature):
+    replace_atomic(path, lambda file: binary_snapshot.write_snapshot(file, records, "category", signature), binary=True)
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "expenses.snap")
+    records = [Expense(1, "Food", 12.25, date(2024, 2, 1), 'Lunch "special"'),
+               Expense(2, "Café", 3.1, None, "Crème brûlée"),
+               Expense(2 ** 40, "Food", 0.01, date(1999, 12, 31), "")]
+    write(path, records, (1, 2, 3))
+
+    opened = binary_snapshot.open_snapshot(path, Expense, (1, 2, 3))
+    assert [expense_to_row(record) for record in opened] == [expense_to_row(record) for record in records]
+    assert expense_to_row(opened[-1]) == expense_to_row(records[-1])
+    assert [record.id for record in opened.between(date(2000, 1, 1))] == [1]
+    assert list(opened.ids) == [1, 2, 2 ** 40]
+
+
+def test_snapshot_of_another_csv_is_rejected(tmp_path):
+    path = str(tmp_path / "expenses.snap")
+    write(path, [Expense(1, "Food", 1.0, None, "")], (1, 2, 3))
+    assert binary_snapshot.open_snapshot(path, Expense, (1, 2, 4)) is None
+
+    # Cut short
+    with open(path, mode='r+b') as file:
+        file.truncate(os.path.getsize(path) - 1)
+    assert binary_snapshot.open_snapshot(path, Expense, (1, 2, 3)) is None
+
+
+def test_data_manager_loads_from_a_current_snapshot_only(ledger_dir):
+    data_manager = DataManager(ledger_dir)
+    parsed = data_manager.load_expenses()
+    assert isinstance(parsed, list)
+    snapshot = data_manager.load_expenses()
+    assert isinstance(snapshot, SnapshotRecords)
+    assert list(map(expense_to_row, snapshot)) == list(map(expense_to_row, parsed))
+
+    # A hand edit of the CSV makes the snapshot stale, and the next load parses the CSV again
+    with open(data_manager.expense_file, mode='a', newline='') as file:
+        file.write("99999,Food,1.5,2020-01-01,Edited by hand\r\n")
+    reloaded = data_manager.load_expenses()
+    assert isinstance(reloaded, list)
+    assert expense_to_row(reloaded[-1]) == [99999, "Food", 1.5, date(2020, 1, 1), "Edited by hand"]
+
+
+def test_saves_leave_the_snapshot_to_the_next_load(ledger_dir):
+    data_manager = DataManager(ledger_dir)
+    data_manager.load_expenses()
+    snapshot_path = data_manager.snapshot_files[data_manager.expense_file][0]
+    written = file_signature(snapshot_path)
+
+    data_manager.create_expense(Expense(data_manager.next_ids("expense"), "Food", 2.0, None, "Tea"))
+    assert file_signature(snapshot_path) == written
+    assert isinstance(data_manager.load_expenses(), list)
+    assert isinstance(data_manager.load_expenses(), SnapshotRecords)
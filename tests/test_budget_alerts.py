@@ -0,0 +1,60 @@
+from datetime import date
+
+from domain.budget import Budget
+from domain.expense import Expense
+from service.budget_alerts import EXCEEDED, WARNING, BudgetAlertEngine
+
+
+def engine(expenses=(), budgets=()):
+    alerts = BudgetAlertEngine()
+    alerts.rebuild({"expense": list(expenses), "budget": list(budgets)}, {})
+    return alerts
+
+
+def expense(expense_id, category, amount):
+    return Expense(expense_id, category, amount, date(2023, 1, expense_id % 28 + 1), "")
+
+
+def test_events_when_crossing_ninety_percent_and_the_limit():
+    alerts = engine([expense(1, "Food", 80.0)], [Budget(1, "Food", 100.0)])
+    assert alerts.categories(WARNING) == [] and alerts.pop_events() == []
+
+    alerts.apply("expense", None, expense(2, "Food", 10.0))
+    assert alerts.categories(WARNING) == ["Food"]
+    assert alerts.pop_events() == [{"type": WARNING, "category": "Food", "total": 90.0, "budget": 100.0}]
+
+    alerts.apply("expense", None, expense(3, "Food", 5.0))
+    assert alerts.pop_events() == []  # Still in the same state
+
+    alerts.apply("expense", None, expense(4, "Food", 5.01))
+    assert alerts.categories(EXCEEDED) == ["Food"]
+    assert alerts.pop_events() == [{"type": EXCEEDED, "category": "Food", "total": 100.01, "budget": 100.0}]
+
+    alerts.apply("expense", expense(4, "Food", 5.01), None)
+    assert alerts.categories(EXCEEDED) == [] and alerts.categories(WARNING) == ["Food"]
+
+
+def test_the_newest_budget_of_a_category_sets_the_limit():
+    expenses = [expense(1, "Food", 150.0)]
+    budgets = [Budget(2, "Food", 200.0), Budget(1, "Food", 100.0)]
+    alerts = engine(expenses, budgets)
+    assert alerts.categories(EXCEEDED) == [] and alerts.categories(WARNING) == []
+
+    # Deleting the newest budget lets the older one apply again
+    alerts.apply("budget", budgets[0], None)
+    assert alerts.categories(EXCEEDED) == ["Food"]
+    alerts.apply("budget", None, Budget(3, "Food", 160.0))
+    assert alerts.categories(WARNING) == ["Food"]
+    assert [event["type"] for event in alerts.pop_events()] == [EXCEEDED, WARNING]
+
+
+def test_running_totals_match_a_rebuild_to_the_cent():
+    expenses = [expense(1, "Food", 0.1), expense(2, "Food", 0.2), expense(3, "Food", 2.2)]
+    budgets = [Budget(1, "Food", 0.3)]
+    alerts = engine(expenses, budgets)
+    alerts.apply("expense", expenses[2], None)
+
+    rebuilt = engine(expenses[:2], budgets)
+    for status in (EXCEEDED, WARNING):
+        assert alerts.categories(status) == rebuilt.categories(status)
+    assert alerts.categories(WARNING) == ["Food"]
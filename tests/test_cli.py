@@ -0,0 +1,116 @@
+import csv
+import io
+from datetime import date
+
+import pytest
+
+import cli
+from conftest import stored_rows
+from domain.budget import Budget
+from repository.data_manager import EXPENSE_HEADER, DataManager, expense_to_row
+from repository.partitioned_data_manager import PartitionedDataManager
+from repository.sqlite_data_manager import SqliteDataManager
+from service.finance_service import DataService
+
+
+def run(capsys, *argv):
+    status = cli.main(list(argv))
+    out, err = capsys.readouterr()
+    return status, out, err
+
+
+def test_import_reports_errors_with_file_line_numbers(ledger_dir, tmp_path, capsys):
+    statement = tmp_path / "statement.csv"
+    statement.write_text("Date,Amount,Category,Memo\n"
+                         "2023-01-05,12.50,Food,Lunch\n"
+                         "\n"
+                         "2023-01-06,not a number,Food,Dinner\n"
+                         "\n"
+                         "\n"
+                         "2023-13-01,3.00,Travel,Bus\n"
+                         "2023-01-07,4.25,Travel,Train\n", encoding="utf-8")
+    before = len(DataManager(ledger_dir).load_expenses())
+
+    status, out, err = run(capsys, "--data-dir", ledger_dir, "import", "expenses", str(statement),
+                           "--description-column", "memo")
+    assert status == 1
+    assert out == f"Imported 2 expenses from {statement}.\n"
+    assert [line.split(": ", 1)[0] for line in err.splitlines()] == [f"{statement}:4", f"{statement}:7"]
+    assert len(DataManager(ledger_dir).load_expenses()) == before + 2
+
+
+def test_import_requires_the_columns(ledger_dir, tmp_path, capsys):
+    statement = tmp_path / "statement.csv"
+    statement.write_text("when,how much\n2023-01-05,12.50\n", encoding="utf-8")
+    status, _, err = run(capsys, "--data-dir", ledger_dir, "import", "expenses", str(statement))
+    assert status == 2
+    assert "missing column(s) category, amount, date" in err
+
+
+def csv_rows(out):
+    return list(csv.reader(io.StringIO(out)))
+
+
+def as_text(row):
+    return ["" if value is None else str(value) for value in row]
+
+
+def test_list_between_dates(ledger_dir, capsys):
+    _, out, _ = run(capsys, "--data-dir", ledger_dir, "list", "expenses", "--from", "2021-03-01", "--to", "2021-06-30")
+    rows = csv_rows(out)
+    assert rows[0] == EXPENSE_HEADER
+    start, end = date(2021, 3, 1), date(2021, 6, 30)
+    expected = [as_text(expense_to_row(expense)) for expense in DataManager(ledger_dir).load_expenses()
+                if expense.date and start <= expense.date <= end]
+    assert sorted(rows[1:]) == sorted(expected) and expected
+
+
+def test_filter_matches_typed_values(ledger_dir, capsys):
+    expense = DataManager(ledger_dir).load_expenses()[0]
+    _, out, _ = run(capsys, "--data-dir", ledger_dir, "filter", "expenses", "amount", str(expense.amount))
+    rows = csv_rows(out)[1:]
+    assert as_text(expense_to_row(expense)) in rows
+    assert all(float(row[2]) == expense.amount for row in rows)
+    _, out, _ = run(capsys, "--data-dir", ledger_dir, "filter", "expenses", "amount", "lots")
+    assert csv_rows(out) == [EXPENSE_HEADER]
+
+
+@pytest.mark.parametrize("storage", ["csv", "journal"])
+def test_monthly_and_yearly_reports(ledger_dir, capsys, storage):
+    service = DataService(DataManager(ledger_dir))
+    monthly, yearly = service.generate_monthly_report(2022, 5), service.generate_yearly_report(2022)
+
+    _, out, _ = run(capsys, "--data-dir", ledger_dir, "--storage", storage, "report", "2022", "5")
+    lines = out.splitlines()
+    assert lines[:4] == ["Report for 5/2022:", f"Total Income: {monthly['total_income']}",
+                         f"Total Expenses: {monthly['total_expense']}", f"Savings: {monthly['savings']}"]
+    assert len(lines) == 4 + len(service.get_category_breakdown(2022, 5)["expenses"])
+
+    _, out, _ = run(capsys, "--data-dir", ledger_dir, "--storage", storage, "report", "2022")
+    lines = out.splitlines()
+    assert lines[:2] == ["Report for 2022:", f"Total Income: {yearly['total_income']}"]
+    assert len(lines) == 4 + 12
+
+
+def test_alerts_exit_status(ledger_dir, capsys):
+    data_manager = DataManager(ledger_dir)
+    data_manager.save_budgets([Budget(1, "Food", 10 ** 9)])
+    assert run(capsys, "--data-dir", ledger_dir, "alerts", "--exit-status")[:2] == (0, "")
+
+    data_manager.save_budgets([Budget(1, "Food", 1.0)])
+    status, out, _ = run(capsys, "--data-dir", ledger_dir, "alerts", "--exit-status")
+    assert status == 1 and "exceeded the budget in category 'Food'" in out
+    assert run(capsys, "--data-dir", ledger_dir, "alerts")[0] == 0
+
+
+def test_migrations_keep_every_record(ledger_dir, capsys):
+    expected = stored_rows(DataManager(ledger_dir))
+    _, out, _ = run(capsys, "--data-dir", ledger_dir, "migrate-sqlite")
+    assert out.startswith(f"Imported {len(expected['income'])} incomes, {len(expected['expense'])} expenses")
+    sqlite_manager = SqliteDataManager(ledger_dir)
+    assert stored_rows(sqlite_manager) == expected
+    sqlite_manager.close()
+
+    _, out, _ = run(capsys, "--data-dir", ledger_dir, "migrate-partitioned")
+    assert f"Split {len(expected['expense'])} expense records" in out
+    assert stored_rows(PartitionedDataManager(ledger_dir)) == expected
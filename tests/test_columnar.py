@@ -0,0 +1,56 @@
+from datetime import date
+
+import pytest
+
+from domain.expense import Expense
+from repository.data_manager import DataManager
+from service import columnar
+from service.finance_service import DataService
+
+# Reported as skipped, with the reason, where NumPy is not installed
+pytest.importorskip("numpy", reason="the columnar ledger needs NumPy")
+
+RANGES = [(None, None), (date(2019, 1, 1), None), (None, date(2017, 6, 30)), (date(2020, 2, 15), date(2021, 11, 3))]
+
+
+@pytest.fixture
+def services(ledger_dir, monkeypatch):
+    data_manager = DataManager(ledger_dir)
+    vectorized = DataService(data_manager)
+    monkeypatch.setattr(columnar, "available", lambda: False)
+    plain = DataService(data_manager)
+    # Each service keeps the view set it was built with, so only the calls need switching
+    monkeypatch.undo()
+    return vectorized, plain
+
+
+def results(service, switch, monkeypatch):
+    if switch:
+        monkeypatch.setattr(columnar, "available", lambda: False)
+    try:
+        return [(service.get_monthly_totals(entity, start, end), service.get_category_totals(entity, start, end),
+                 service._range_total(entity, start, end))
+                for entity in ("income", "expense") for start, end in RANGES]
+    finally:
+        monkeypatch.undo()
+
+
+def assert_same(services, monkeypatch):
+    vectorized, plain = services
+    for got, expected in zip(results(vectorized, False, monkeypatch), results(plain, True, monkeypatch)):
+        assert list(got[0]) == list(expected[0]) and list(got[1]) == list(expected[1])
+        assert got == pytest.approx(expected)
+
+
+def test_columns_match_the_plain_python_totals(services, monkeypatch):
+    assert_same(services, monkeypatch)
+
+
+def test_writes_and_undated_records_are_picked_up(services, monkeypatch):
+    vectorized, _ = services
+    assert_same(services, monkeypatch)
+    data_manager = vectorized.data_manager
+    data_manager.create_expense(Expense(data_manager.next_ids("expense"), "Vet bills", 42.5, date(2020, 3, 1), "Vet"))
+    data_manager.create_expense(Expense(data_manager.next_ids("expense"), "Vet bills", 9.0, None, "Undated"))
+    assert_same(services, monkeypatch)
+    assert vectorized.get_category_totals("expense", date(2020, 3, 1), date(2020, 3, 1))["Vet bills"] == 42.5
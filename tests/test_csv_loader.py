@@ -0,0 +1,57 @@
+import csv
+
+import pytest
+
+from domain.expense import Expense
+from repository import csv_loader
+from repository.data_manager import expense_from_row, expense_to_row
+
+
+def row_by_row(path):
+    with open(path, mode='r', newline='') as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        return [expense_from_row(row) for row in reader if row]
+
+
+def load(path, workers):
+    return csv_loader.load_records(path, Expense, csv_loader.EXPENSE_COLUMNS, expense_from_row, workers=workers)
+
+
+@pytest.fixture
+def parallel(monkeypatch):
+    # Every file is large enough to be split between worker processes
+    monkeypatch.setattr(csv_loader, "PARALLEL_THRESHOLD", 0)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_column_loader_matches_row_loader(ledger_dir, parallel, monkeypatch, workers):
+    path = f"{ledger_dir}/expenses.csv"
+    chunks = []
+    chunk_bounds = csv_loader._chunk_bounds
+    monkeypatch.setattr(csv_loader, "_chunk_bounds", lambda *args: chunks.extend(chunk_bounds(*args)) or chunks)
+    loaded = load(path, workers)
+    assert len(chunks) == (12 if workers > 1 else 0)
+    assert list(map(expense_to_row, loaded)) == list(map(expense_to_row, row_by_row(path)))
+    # Categories are interned even when they come back from another process
+    assert all(expense.category is csv_loader.sys.intern(expense.category) for expense in loaded)
+
+
+def test_blank_lines_undated_rows_and_quotes(tmp_path, parallel):
+    path = tmp_path / "expenses.csv"
+    path.write_text('id,category,amount,date,description\r\n1,Food,1.5,2024-01-02,Tea\r\n\r\n'
+                    '2,Food,2.0,,"Multi\r\nline, quoted"\r\n3,Rent,700,2024-01-01,\r\n', newline='')
+    assert list(map(expense_to_row, load(str(path), 3))) == list(map(expense_to_row, row_by_row(str(path))))
+
+
+def test_bad_rows_fail_like_the_row_loader(tmp_path, parallel):
+    path = tmp_path / "expenses.csv"
+    path.write_text("id,category,amount,date,description\n1,Food,1.5,2024-01-02,Tea\n2,Food\n", newline='')
+    with pytest.raises(IndexError):
+        row_by_row(str(path))
+    with pytest.raises(IndexError):
+        load(str(path), 3)
+
+    path.write_text("id,category,amount,date,description\n1,Food,cheap,2024-01-02,Tea\n", newline='')
+    with pytest.raises(ValueError):
+        load(str(path), 3)
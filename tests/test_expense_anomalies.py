@@ -0,0 +1,91 @@
+import random
+from datetime import date, timedelta
+
+from domain.expense import Expense
+from service.expense_anomalies import MIN_HISTORY, WINDOW_DAYS, Z_THRESHOLD, ExpenseAnomalyDetector
+
+TODAY = date(2024, 6, 30)
+
+
+class Clock:
+    def __init__(self, day):
+        self.day = day
+
+    def __call__(self):
+        return self.day
+
+
+def detector(expenses, clock=None):
+    anomalies = ExpenseAnomalyDetector(clock or Clock(TODAY))
+    anomalies.rebuild({"expense": list(expenses)}, {})
+    return anomalies
+
+
+def expense(expense_id, amount, category="Food", days_ago=1):
+    return Expense(expense_id, category, amount, TODAY - timedelta(days=days_ago), "")
+
+
+def flagged(anomalies):
+    return [anomaly["id"] for anomaly in anomalies.anomalies()]
+
+
+def test_expense_far_above_the_others_is_flagged():
+    history = [expense(i, amount) for i, amount in enumerate([9.0, 11.0, 10.0, 9.5, 10.5, 10.0], 1)]
+    anomalies = detector(history + [expense(100, 50.0)])
+    assert flagged(anomalies) == [100]
+    anomaly = anomalies.anomalies()[0]
+    assert anomaly["z"] >= Z_THRESHOLD and round(anomaly["mean"], 2) == 10.0
+
+
+def test_threshold_is_three_standard_deviations():
+    history = [expense(i, amount) for i, amount in enumerate([8.0, 12.0] * 5, 1)]
+    # The others have mean 10.00 and a sample standard deviation of sqrt(40/9) = 2.108,
+    # so the threshold sits at 16.325
+    assert flagged(detector(history + [expense(100, 16.33)])) == [100]
+    assert flagged(detector(history + [expense(100, 16.32)])) == []
+
+
+def test_short_or_flat_histories_flag_nothing():
+    history = [expense(i, 9.0 + i % 2 * 2) for i in range(1, MIN_HISTORY)]
+    assert flagged(detector(history + [expense(100, 500.0)])) == []
+    flat = [expense(i, 10.0) for i in range(1, 10)]
+    assert flagged(detector(flat + [expense(100, 500.0)])) == []
+    # Other categories do not count towards the history
+    others = [expense(i, 9.0 + i % 2 * 2, "Rent") for i in range(10, 20)]
+    assert flagged(detector(history + others + [expense(100, 500.0)])) == []
+
+
+def test_only_the_window_counts():
+    history = [expense(i, amount) for i, amount in enumerate([9.0, 11.0, 10.0, 9.5, 10.5, 10.0], 1)]
+    old = [expense(100, 50.0, days_ago=WINDOW_DAYS + 1)]
+    assert flagged(detector(history + old)) == []
+
+    clock = Clock(TODAY)
+    anomalies = detector(history + [expense(100, 50.0, days_ago=10)], clock)
+    assert flagged(anomalies) == [100]
+    clock.day += timedelta(days=WINDOW_DAYS - 5)
+    assert flagged(anomalies) == []  # The flagged expense left the window
+
+
+def test_writes_raise_events_and_match_a_rebuild():
+    rng = random.Random(3)
+    clock = Clock(TODAY)
+    stored = {i: expense(i, round(rng.uniform(5, 15), 2), rng.choice(["Food", "Rent"]), rng.randrange(WINDOW_DAYS + 30))
+              for i in range(1, 200)}
+    anomalies = detector(stored.values(), clock)
+    events = []
+    for step in range(600):
+        expense_id = rng.randrange(1, 260)
+        old = stored.get(expense_id)
+        if old is not None and rng.random() < 0.3:
+            new = None
+            del stored[expense_id]
+        else:
+            amount = round(rng.uniform(5, 15) if rng.random() < 0.95 else rng.uniform(40, 90), 2)
+            new = stored[expense_id] = expense(expense_id, amount, rng.choice(["Food", "Rent"]), rng.randrange(WINDOW_DAYS + 30))
+        anomalies.apply("expense", old, new)
+        events.extend(anomalies.pop_events())
+        if step % 100 == 0:
+            clock.day += timedelta(days=7)
+        assert anomalies.anomalies() == detector(stored.values(), clock).anomalies()
+    assert events and all(event["z"] >= Z_THRESHOLD for event in events)
@@ -0,0 +1,101 @@
+from datetime import date
+
+import pytest
+
+from conftest import stored_rows
+from domain.expense import Expense
+from repository.data_manager import EXPENSE_HEADER, expense_to_row, write_csv_atomic
+from repository.journaled_data_manager import JournaledDataManager
+
+
+def journal_some_changes(data_manager):
+    expenses = data_manager.load_expenses()
+    new_id = data_manager.next_ids("expense")
+    data_manager.create_expense(Expense(new_id, "Food", 7.5, date(2023, 6, 1), "Pizza"))
+    data_manager.update_expense(expenses[0].id, Expense(expenses[0].id, "Travel", 31.0, date(2022, 2, 2), "Train"))
+    data_manager.delete_expense(expenses[1].id)
+
+
+def test_changes_survive_reopening(ledger_dir):
+    data_manager = JournaledDataManager(ledger_dir)
+    journal_some_changes(data_manager)
+    assert stored_rows(JournaledDataManager(ledger_dir)) == stored_rows(data_manager)
+
+
+def test_replay_after_crash_between_snapshot_and_journal_reset(ledger_dir):
+    data_manager = JournaledDataManager(ledger_dir)
+    journal_some_changes(data_manager)
+    expected = stored_rows(data_manager)
+
+    # The new snapshot is in place but the process died before emptying the journal, so
+    # the journal is replayed over a snapshot that already contains its entries
+    records = data_manager._records(data_manager.expense_file, data_manager._replay_expenses)
+    write_csv_atomic(data_manager.expense_file, EXPENSE_HEADER, map(expense_to_row, records.values()))
+    data_manager._write_snapshot(data_manager.expense_file, records.values())
+
+    assert stored_rows(JournaledDataManager(ledger_dir)) == expected
+
+
+def test_replay_after_crash_while_writing_snapshot(ledger_dir, monkeypatch):
+    data_manager = JournaledDataManager(ledger_dir, compact_threshold=0)
+    expected = stored_rows(data_manager)
+
+    def crash(path, records):
+        raise OSError("disk full")
+    monkeypatch.setattr(data_manager, "_write_snapshot", crash)
+    with pytest.raises(OSError):
+        journal_some_changes(data_manager)
+    monkeypatch.undo()
+
+    # Only the first change was journaled before its compaction failed
+    reopened = JournaledDataManager(ledger_dir)
+    assert len(reopened.load_expenses()) == len(expected["expense"]) + 1
+    journal_some_changes(reopened)
+    assert stored_rows(JournaledDataManager(ledger_dir)) == stored_rows(reopened)
+
+
+def test_partial_last_entry_is_dropped(ledger_dir):
+    data_manager = JournaledDataManager(ledger_dir)
+    journal_some_changes(data_manager)
+    expected = stored_rows(data_manager)
+    with open(data_manager.expense_journal, mode='a', newline='') as file:
+        file.write("C,99999,Food,12.0,2021-01-")
+
+    reopened = JournaledDataManager(ledger_dir)
+    assert stored_rows(reopened) == expected
+    with open(data_manager.expense_journal, mode='rb') as file:
+        assert file.read().endswith(b'\n')
+
+    # The next append starts on a fresh line and is replayed normally
+    new_id = reopened.next_ids("expense")
+    reopened.create_expense(Expense(new_id, "Gifts", 15.0, date(2020, 12, 24), "Present"))
+    assert stored_rows(JournaledDataManager(ledger_dir)) == stored_rows(reopened)
+
+
+def test_compaction_empties_the_journal(ledger_dir):
+    data_manager = JournaledDataManager(ledger_dir)
+    journal_some_changes(data_manager)
+    expected = stored_rows(data_manager)
+    data_manager.compact()
+    with open(data_manager.expense_journal, mode='rb') as file:
+        assert file.read() == b''
+    assert stored_rows(JournaledDataManager(ledger_dir)) == expected
+
+
+def test_journal_is_utf8_whatever_the_locale(ledger_dir):
+    data_manager = JournaledDataManager(ledger_dir)
+    new_id = data_manager.next_ids("expense")
+    data_manager.create_expense(Expense(new_id, "Café", 4.2, date(2022, 2, 2), "Crème brûlée ☕"))
+    with open(data_manager.expense_journal, mode='rb') as file:
+        assert "Crème brûlée ☕".encode("utf-8") in file.read()
+    reopened = JournaledDataManager(ledger_dir).load_expenses()
+    assert expense_to_row(next(expense for expense in reopened if expense.id == new_id))[4] == "Crème brûlée ☕"
+
+
+def test_delete_of_missing_record_journals_nothing(ledger_dir):
+    data_manager = JournaledDataManager(ledger_dir)
+    journal_some_changes(data_manager)
+    version = data_manager.data_version("expense")
+    data_manager.delete_expense(10 ** 6)
+    data_manager.apply_changes("expense", [(10 ** 6, None, None, False)])
+    assert data_manager.data_version("expense") == version
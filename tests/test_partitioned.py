@@ -0,0 +1,122 @@
+import os
+from collections import Counter
+from datetime import date
+
+import pytest
+
+from conftest import open_mode, stored_rows
+from domain.expense import Expense
+from repository.data_manager import expense_to_row
+from repository.partitioned_data_manager import PartitionedDataManager, partition_key
+
+
+@pytest.fixture
+def partitioned(ledger_dir):
+    return open_mode("partitioned", ledger_dir)
+
+
+def expected_counts(data_manager):
+    return dict(sorted(Counter(partition_key(expense.date) for expense in data_manager.load_expenses()).items()))
+
+
+def test_update_moves_record_across_months(partitioned):
+    new_id = partitioned.next_ids("expense")
+    expense = Expense(new_id, "Food", 20.0, date(1990, 1, 15), "Alone in its month")
+    partitioned.create_expense(expense)
+    assert partitioned.partition_counts("expense")["1990-01"] == 1
+    before = partitioned.partition_counts("expense")
+
+    moved = Expense(new_id, "Food", 20.0, date(2023, 3, 10), "Moved")
+    assert partitioned.update_expense(new_id, moved, expected=expense) is True
+
+    counts = partitioned.partition_counts("expense")
+    assert "1990-01" not in counts
+    assert not os.path.exists(partitioned._partition_path("expense", "1990-01"))
+    assert counts["2023-03"] == before.get("2023-03", 0) + 1
+    assert counts == expected_counts(partitioned)
+
+    reopened = PartitionedDataManager(partitioned.data_dir)
+    assert stored_rows(reopened) == stored_rows(partitioned)
+    assert expense_to_row(moved) in map(expense_to_row, reopened.iter_expenses(start=date(2023, 3, 1), end=date(2023, 3, 31)))
+
+
+def test_move_to_and_from_undated(partitioned):
+    expense = partitioned.load_expenses()[0]
+    undated = Expense(expense.id, expense.category, expense.amount, None, expense.description)
+    partitioned.update_expense(expense.id, undated)
+    assert partitioned.partition_counts("expense") == expected_counts(partitioned)
+
+    partitioned.update_expense(expense.id, expense)
+    assert partitioned.partition_counts("expense") == expected_counts(partitioned)
+    assert stored_rows(PartitionedDataManager(partitioned.data_dir)) == stored_rows(partitioned)
+
+
+def test_batch_moves_keep_manifest_consistent(partitioned):
+    expenses = partitioned.load_expenses()[:10]
+    changes = [(expense.id, Expense(expense.id, expense.category, expense.amount, date(2018, 8, 1 + i), "moved"), expense, False)
+               for i, expense in enumerate(expenses)]
+    partitioned.apply_changes("expense", changes)
+    assert partitioned.partition_counts("expense") == expected_counts(partitioned)
+    for expense in partitioned.load_expenses():
+        if expense.description == "moved":
+            assert expense.date.month == 8
+
+
+def test_monthly_totals_match_the_records(partitioned):
+    expense = partitioned.load_expenses()[0]
+    partitioned.update_expense(expense.id, Expense(expense.id, expense.category, 1234.56, date(2016, 2, 29), "leap"))
+    for year, month in [(2016, 2), (expense.date.year, expense.date.month), (2024, 12), (1980, 1)]:
+        incomes = sum(income.amount for income in partitioned.load_incomes()
+                      if income.date and (income.date.year, income.date.month) == (year, month))
+        expenses = sum(expense.amount for expense in partitioned.load_expenses()
+                       if expense.date and (expense.date.year, expense.date.month) == (year, month))
+        assert partitioned.monthly_totals(year, month) == pytest.approx((incomes, expenses))
+
+
+def test_date_range_reads_only_overlapping_months(partitioned, monkeypatch):
+    read = []
+    original = partitioned._read_partition
+
+    def tracking(entity, key):
+        read.append(key)
+        return original(entity, key)
+    monkeypatch.setattr(partitioned, "_read_partition", tracking)
+
+    start, end = date(2020, 2, 10), date(2020, 4, 5)
+    found = list(partitioned.iter_expenses(start=start, end=end))
+    assert set(read) <= {"2020-02", "2020-03", "2020-04"}
+    assert sorted(map(expense_to_row, found)) == sorted(
+        expense_to_row(expense) for expense in partitioned.load_expenses() if expense.date and start <= expense.date <= end)
+
+
+def test_monthly_totals_are_exact_in_cents(partitioned):
+    for amount in (0.1, 0.2, 0.3):
+        partitioned.create_expense(Expense(partitioned.next_ids("expense"), "Food", amount, date(1990, 3, 1), "Cent"))
+    assert partitioned.monthly_totals(1990, 3) == (0, 0.6)
+    partitioned.save_expenses(partitioned.load_expenses())
+    assert partitioned.monthly_totals(1990, 3) == (0, 0.6)
+
+
+def test_crash_while_moving_a_record_keeps_it(partitioned, monkeypatch):
+    expense = partitioned.load_expenses()[0]
+    moved = Expense(expense.id, expense.category, expense.amount, date(1990, 6, 1), expense.description)
+    write_partition, append_partitions = partitioned._write_partition, partitioned._append_partitions
+
+    # The disk fills up when the record reaches its new month
+    def failing_write(entity, manifest, key, records):
+        if key == "1990-06":
+            raise OSError("disk full")
+        write_partition(entity, manifest, key, records)
+
+    def failing_append(entity, manifest, records):
+        raise OSError("disk full")
+    monkeypatch.setattr(partitioned, "_write_partition", failing_write)
+    monkeypatch.setattr(partitioned, "_append_partitions", failing_append)
+    with pytest.raises(OSError):
+        partitioned.update_expense(expense.id, moved)
+    with pytest.raises(OSError):
+        partitioned.apply_changes("expense", [(expense.id, moved, expense, False)])
+    monkeypatch.undo()
+
+    reopened = PartitionedDataManager(partitioned.data_dir)
+    assert expense.id in [record.id for record in reopened.load_expenses()]
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+from ui.task_runner import TaskRunner
+
+
+class FakeRoot:
+    # Stands in for Tk: the test calls the scheduled poll itself
+    def __init__(self):
+        self.errors = []
+
+    def after(self, ms, callback):
+        pass
+
+    def report_callback_exception(self, kind, error, traceback):
+        self.errors.append(error)
+
+
+@pytest.fixture
+def runner():
+    busy = []
+    runner = TaskRunner(FakeRoot(), on_busy_change=busy.append)
+    runner.busy = busy
+    yield runner
+    runner.shutdown()
+
+
+def drain(runner, timeout=5):
+    deadline = time.monotonic() + timeout
+    while runner._active:
+        assert time.monotonic() < deadline, "tasks did not finish"
+        runner._poll()
+        time.sleep(0.005)
+
+
+def blocker(runner):
+    # Occupies the single worker until the returned event is set
+    started, release = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        release.wait(5)
+    runner.run(work)
+    started.wait(5)
+    return release
+
+
+def test_newer_task_on_a_channel_makes_older_ones_stale(runner):
+    delivered, ran = [], []
+    release = threading.Event()
+    started = threading.Event()
+
+    def first():
+        started.set()
+        release.wait(5)
+        return "first"
+    runner.run(first, on_success=delivered.append, channel="table")
+    started.wait(5)
+    runner.run(lambda: ran.append("second") or "second", on_success=delivered.append, channel="table")
+    runner.run(lambda: "third", on_success=delivered.append, channel="table")
+    release.set()
+    drain(runner)
+
+    assert delivered == ["third"]  # The running task's result is dropped
+    assert ran == []  # The queued one never ran
+    assert runner.busy == [True, False]
+
+
+def test_saves_for_the_same_file_coalesce_and_run_in_order(runner):
+    calls, results = [], []
+    release = blocker(runner)
+    for name in ("a", "b", "c"):
+        runner.save("expenses", lambda name=name: calls.append(name) or name, on_success=results.append)
+    runner.save("budgets", lambda: calls.append("budget") or "budget", on_success=results.append)
+    assert len(runner._pending_saves["expenses"]) == 3
+    release.set()
+    drain(runner)
+
+    assert calls == ["a", "b", "c", "budget"]
+    assert results == ["a", "b", "c", "budget"]
+    assert runner.busy == [True, False]
+
+
+def test_errors_go_to_on_error_or_to_tk(runner):
+    errors = []
+    runner.run(lambda: 1 / 0, on_error=errors.append)
+    runner.run(lambda: [][0])
+    drain(runner)
+    assert [type(error) for error in errors] == [ZeroDivisionError]
+    assert [type(error) for error in runner.root.errors] == [IndexError]
@@ -0,0 +1,71 @@
+from datetime import date
+
+import pytest
+
+from repository.data_manager import DataManager
+from service.finance_service import DataService
+
+
+@pytest.fixture
+def service(ledger_dir):
+    return DataService(DataManager(ledger_dir))
+
+
+# Totals per key computed straight from the records, for days from start to end
+def naive_totals(service, key, start=None, end=None):
+    totals = {}
+    for expense in service.data_manager.load_expenses():
+        if expense.date and (start is None or expense.date >= start) and (end is None or expense.date <= end):
+            totals[key(expense.date)] = totals.get(key(expense.date), 0.0) + expense.amount
+    return totals
+
+
+def month_of(day):
+    return (day.year, day.month)
+
+
+def months_between(first, last):
+    index = first[0] * 12 + first[1] - 1
+    while (index // 12, index % 12 + 1) <= last:
+        yield (index // 12, index % 12 + 1)
+        index += 1
+
+
+def test_rolling_averages_match_a_naive_window(service):
+    start, end = date(2018, 2, 14), date(2020, 7, 3)
+    # Records after end do not count, even within its month
+    monthly = naive_totals(service, month_of, None, end)
+    averages = service.get_rolling_averages("expense", 3, start, end)
+    months = list(months_between((2018, 2), (2020, 7)))
+    assert list(averages) == months
+    for year, month in months:
+        window = [((year * 12 + month - 1 - back) // 12, (year * 12 + month - 1 - back) % 12 + 1) for back in range(3)]
+        assert averages[(year, month)] == pytest.approx(sum(monthly.get(key, 0.0) for key in window) / 3)
+
+    # A one-month window is the monthly total itself, empty months included
+    monthly = naive_totals(service, month_of)
+    single = service.get_rolling_averages("expense", 1)
+    assert single == pytest.approx({key: monthly.get(key, 0.0) for key in months_between(min(monthly), max(monthly))})
+    with pytest.raises(ValueError):
+        service.get_rolling_averages("expense", 0)
+
+
+def test_year_over_year_compares_the_same_days(service):
+    start, end = date(2020, 3, 10), date(2021, 2, 20)
+    deltas = service.get_year_over_year("expense", "month", start, end)
+    current = naive_totals(service, month_of, start, end)
+    previous = naive_totals(service, month_of, date(2019, 3, 10), date(2020, 2, 20))
+    assert list(deltas) == sorted(current)
+    for (year, month), row in deltas.items():
+        before = previous.get((year - 1, month), 0.0)
+        assert row["total"] == pytest.approx(current[(year, month)])
+        assert row["previous"] == pytest.approx(before)
+        assert row["delta"] == pytest.approx(current[(year, month)] - before)
+        assert row["change"] == (pytest.approx((current[(year, month)] - before) / before) if before else None)
+
+    yearly = service.get_year_over_year("expense", "year")
+    totals = naive_totals(service, lambda day: day.year)
+    assert {year: row["previous"] for year, row in yearly.items()} == pytest.approx(
+        {year: totals.get(year - 1, 0.0) for year in totals})
+    with pytest.raises(ValueError):
+        service.get_year_over_year("expense", "day")
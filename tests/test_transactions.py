@@ -0,0 +1,82 @@
+import pytest
+
+from conftest import stored_rows
+from repository.data_manager import ConflictError
+from service.finance_service import DataService
+
+
+@pytest.fixture
+def service(data_manager):
+    return DataService(data_manager)
+
+
+def make_changes(service):
+    first, second = service.get_expenses()[:2]
+    service.create_expense("Food", 12.5, "2023-05-06", "Groceries")
+    service.update_expense(first.id, "Travel", 44.0, "2021-09-30", "Taxi")
+    service.delete_expense(second.id)
+    service.create_income("Job", 1500.0, "2023-05-31", "Salary")
+    service.create_budget("Travel", 200.0)
+
+
+def test_exception_rolls_back_the_transaction(service, opened):
+    before = stored_rows(service.data_manager)
+    with pytest.raises(ValueError):
+        with service.transaction():
+            make_changes(service)
+            service.create_expense("Food", -1, "2023-05-06", "Invalid")
+    assert stored_rows(opened()) == before
+    assert not service.can_undo()
+
+
+def test_conflict_leaves_data_unchanged(service, opened):
+    expense = service.get_expenses()[0]
+    before = stored_rows(service.data_manager)
+    with pytest.raises(ConflictError):
+        with service.transaction():
+            service.create_expense("Food", 3.0, "2022-01-01", "Coffee")
+            service.update_expense(expense.id, "Food", expense.amount + 1, "2022-01-02", "stale", expected=expense)
+            # Changed by someone else before the transaction is stored
+            opened().delete_expense(expense.id)
+    after = stored_rows(opened())
+    assert after["expense"] == [row for row in before["expense"] if row[0] != expense.id]
+    assert after["income"] == before["income"] and after["budget"] == before["budget"]
+    assert not service.can_undo()
+
+
+def test_undo_and_redo_restore_exact_state(service, opened):
+    states = [stored_rows(service.data_manager)]
+    with service.transaction():
+        make_changes(service)
+    states.append(stored_rows(service.data_manager))
+    service.update_expense(service.get_expenses()[0].id, "Gifts", 60.0, "2020-12-20", "Present")
+    states.append(stored_rows(service.data_manager))
+
+    assert service.undo() == 1
+    assert stored_rows(opened()) == states[1]
+    assert service.undo() == 5
+    assert stored_rows(opened()) == states[0]
+    assert service.undo() == 0
+
+    assert service.redo() == 5
+    assert stored_rows(opened()) == states[1]
+    assert service.redo() == 1
+    assert stored_rows(opened()) == states[2]
+    assert not service.can_redo()
+
+
+def test_undo_conflict_keeps_history(service, opened):
+    service.create_expense("Food", 8.0, "2023-02-02", "Bagel")
+    created = max(service.get_expenses(), key=lambda expense: expense.id)
+    opened().delete_expense(created.id)
+    with pytest.raises(ConflictError):
+        service.undo()
+    assert service.can_undo() and not service.can_redo()
+
+
+def test_staged_update_of_missing_record_is_skipped(service, opened):
+    before = stored_rows(service.data_manager)
+    with service.transaction():
+        service.update_expense(10 ** 6, "Food", 5.0, "2022-03-03", "ghost")
+    assert stored_rows(opened()) == before
+    assert not service.can_undo()
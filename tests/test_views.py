@@ -0,0 +1,128 @@
+from datetime import date, timedelta
+
+import pytest
+
+from repository import instrumentation
+from repository.data_manager import expense_to_row
+from service.finance_service import DataService
+
+MONTHS = [(2023, 5), (2021, 9), (2020, 12), (2019, 1)]
+
+
+@pytest.fixture
+def service(data_manager):
+    service = DataService(data_manager)
+    warm_up(service)
+    return service
+
+
+# Builds every view, so the writes that follow are applied to them in place
+def warm_up(service):
+    service.check_budget_exceed()
+    service.filter_expenses("category", "Food")
+    service.generate_monthly_report(2023, 5)
+    service.get_period_totals("expense")
+    service.get_period_totals("expense", "day")
+    service.detect_anomalous_expenses()
+
+
+def snapshot(service):
+    return {
+        "filter": sorted(map(expense_to_row, service.filter_expenses("category", "Food"))),
+        "sort": [expense_to_row(expense) for expense in service.sort_expenses("amount")][-20:],
+        "reports": [repr(service.generate_monthly_report(year, month)) for year, month in MONTHS],
+        "breakdowns": [service.get_category_breakdown(year, month) for year, month in MONTHS],
+        "months": service.get_period_totals("expense"),
+        "days": service.get_period_totals("expense", "day", date(2023, 1, 1), date(2023, 12, 31)),
+        "income months": service.get_period_totals("income"),
+        "categories": service.get_period_category_totals("expense"),
+        "exceeded": sorted(service.check_budget_exceed()),
+        "warnings": sorted(service.detect_unusual_expenses()),
+        "anomalies": service.detect_anomalous_expenses(),
+    }
+
+
+def write_a_lot(service):
+    expenses = service.get_expenses()
+    for i in range(30):
+        service.create_expense("Food", 3.1 + i * 0.07, f"2023-05-{1 + i % 28:02d}", "Snack")
+    service.create_expense("Food", 9000.01, "2023-05-15", "Banquet")
+    service.create_expense("Rent", 0.1, "2021-09-30", "Fee")
+    for expense in expenses[:15]:
+        service.update_expense(expense.id, "Food", round(expense.amount * 1.1, 2), "2023-05-20", "Moved")
+    for expense in expenses[15:25]:
+        service.delete_expense(expense.id)
+    service.create_budget("Food", 50.0)
+    service.create_income("Job", 1999.99, "2023-05-31", "Salary")
+    with service.transaction():
+        service.create_expense("Travel", 333.33, "2020-12-24", "Flight")
+        service.delete_expense(expenses[30].id)
+    service.import_expenses([("Food", "0.3", "2023-05-02", "Gum"), ("Travel", "12.2", "2019-01-05", "Bus")])
+    service.undo()
+    service.undo()
+    service.redo()
+
+
+def test_incremental_views_equal_a_rebuild(service):
+    write_a_lot(service)
+    assert snapshot(service) == snapshot(DataService(service.data_manager))
+
+
+def test_update_of_missing_record_is_not_shown(service):
+    before = snapshot(service)
+    service.update_expense(10 ** 6, "Food", 9999.0, "2023-05-05", "ghost")
+    assert snapshot(service) == before
+    assert 10 ** 6 not in [expense.id for expense in service.filter_expenses("category", "Food")]
+    assert not service.can_undo()
+
+
+def test_rollups_have_no_float_residue(service):
+    for _ in range(10):
+        service.create_expense("Food", 0.1, "2019-01-10", "Cent")
+    fresh = DataService(service.data_manager)
+    assert service.get_period_totals("expense") == fresh.get_period_totals("expense")
+    assert service.get_period_totals("expense", "day") == fresh.get_period_totals("expense", "day")
+    for total in service.get_period_totals("expense").values():
+        assert total == round(total, 2)
+
+
+def test_creates_need_no_rebuild(service):
+    instrumentation.STATS.reset()
+    service.create_expense("Food", 4.0, "2023-05-05", "Tea")
+    service.create_income("Job", 10.0, "2023-05-05", "Tip")
+    service.create_budget("Tea", 5.0)
+    warm_up(service)
+    rebuilds = [name for name in instrumentation.STATS.snapshot()["operations"] if name.endswith(".rebuild")]
+    assert rebuilds == []
+
+
+def test_monthly_report_is_exact_in_every_mode(service):
+    for amount in (0.1, 0.2, 0.3):
+        service.create_expense("Food", amount, "1990-03-01", "Cent")
+    report = service.generate_monthly_report(1990, 3)
+    assert (report["total_income"], report["total_expense"]) == (0, 0.6)
+
+
+def test_filter_values_typed_as_text_match_in_every_mode(service):
+    service.create_expense("Food", 100.0, "2024-12-10", "Typed")
+    created = max(expense.id for expense in service.get_expenses())
+    on_day = sorted(expense.id for expense in service.get_expenses() if expense.date == date(2024, 12, 10))
+    by_amount = sorted(expense.id for expense in service.get_expenses() if expense.amount == 100.0)
+
+    assert sorted(expense.id for expense in service.filter_expenses("amount", "100.0")) == by_amount
+    assert sorted(expense.id for expense in service.filter_expenses("amount", "100")) == by_amount
+    assert sorted(expense.id for expense in service.filter_expenses("date", "2024-12-10")) == on_day
+    assert [expense.id for expense in service.filter_expenses("id", str(created))] == [created]
+    assert service.filter_expenses("amount", "a lot") == []
+    assert service.filter_expenses("date", "10/12/2024") == []
+
+
+def test_recent_unusual_expenses_are_listed_in_every_mode(service):
+    today = date.today()
+    for days_ago, amount in enumerate([9.0, 11.0, 10.0, 9.5, 10.5, 10.0, 250.0], 1):
+        service.create_expense("Hobby", amount, (today - timedelta(days=days_ago)).isoformat(), "Paint")
+    listed = service.detect_anomalous_expenses()
+    assert [message for message in listed if "'Hobby'" in message] == [
+        f"Unusual expense: 250.0 for 'Hobby' on {today - timedelta(days=7)}, usually 10.00 ± 0.71."]
+    assert service.pop_expense_anomalies()[-1]["amount"] == 250.0
+    assert listed == DataService(service.data_manager).detect_anomalous_expenses()
@@ -1,18 +1,31 @@
 import tkinter as tk
-from tkinter import messagebox, simpledialog
+from collections.abc import Sequence
+from tkinter import messagebox, simpledialog, ttk
 from service.finance_service import DataService
+from service.budget_alerts import EXCEEDED
 from domain.income import Income
 from domain.expense import Expense
 from domain.budget import Budget
-import matplotlib.pyplot as plt
+from repository import instrumentation
+from repository.data_manager import ConflictError
+from ui.task_runner import TaskRunner
+from ui.report_view import ReportView
+
+# Rows inserted into the table at a time; more are paged in while scrolling
+TABLE_PAGE_SIZE = 200
 
 class FinanceApp:
-    def __init__(self, root):
+    def __init__(self, root, data_service=None):
         self.root = root
         self.root.title("Personal Finance Tracker")
 
         # Initialize the DataService
-        self.data_service = DataService()
+        self.data_service = data_service if data_service is not None else DataService()
+
+        # Loads, queries and saves run on a background worker so the window stays responsive
+        self.tasks = TaskRunner(self.root, on_busy_change=self.set_busy)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        self.status_label = tk.Label(self.root, text="")
 
         # Create tabs for Incomes, Expenses, and Budgets
         self.tabs = tk.Frame(self.root)
@@ -35,23 +48,73 @@ class FinanceApp:
         # Create button frames for sorting, filtering, and searching
         self.add_sort_filter_search_buttons()
 
-        # Create table for displaying data
+        # Create table for displaying data. Only the rows scrolled into view so far exist
+        # in the Treeview, and one pair of buttons acts on the selected rows (Delete takes
+        # several at once, Update the first).
         self.table = tk.Frame(self.root)
-        self.table.pack()
+        self.table.pack(fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(self.table, show="headings", selectmode="extended", height=20)
+        self.tree_scrollbar = ttk.Scrollbar(self.table, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.on_table_scroll)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.tree_scrollbar.grid(row=0, column=1, sticky="ns")
+        self.table.grid_rowconfigure(0, weight=1)
+        self.table.grid_columnconfigure(0, weight=1)
+        self.tree.bind("<Double-1>", lambda event: self.update_selected())
+        self.tree.bind("<Delete>", lambda event: self.delete_selected())
+
+        self.row_actions = tk.Frame(self.table)
+        self.row_actions.grid(row=1, column=0, columnspan=2)
+        tk.Button(self.row_actions, text="Update", command=self.update_selected).pack(side=tk.LEFT, padx=10)
+        tk.Button(self.row_actions, text="Delete", command=self.delete_selected).pack(side=tk.LEFT, padx=10)
+
+        self.table_entity = None
+        self.table_rows = []
+        self.table_loaded = 0
+        self.table_delete_action = None
 
         # Add button for adding records
         self.add_button = tk.Button(self.root, text="Add", command=self.show_add_form)
         self.add_button.pack(side=tk.LEFT, padx=10)
 
-        # Show Incomes by default
-        self.show_incomes()
+        # Undo/Redo step through the changes made in this window, one save or one
+        # multi-row delete at a time
+        self.undo_button = tk.Button(self.root, text="Undo", command=self.undo)
+        self.undo_button.pack(side=tk.LEFT, padx=10)
+        self.redo_button = tk.Button(self.root, text="Redo", command=self.redo)
+        self.redo_button.pack(side=tk.LEFT, padx=10)
+        self.root.bind("<Control-z>", lambda event: self.undo())
+        self.root.bind("<Control-y>", lambda event: self.redo())
+
+        # Show Incomes by default. The rows are loaded once the window has been drawn,
+        # so it appears straight away however large the income file is.
+        self.root.after_idle(self.show_incomes)
 
         self.report_button = tk.Button(self.root, text="Generate Report", command=self.show_report_form)
         self.report_button.pack(side=tk.LEFT, padx=10)
 
+        self.trend_button = tk.Button(self.root, text="Trend Chart", command=self.show_trend_form)
+        self.trend_button.pack(side=tk.LEFT, padx=10)
+
         self.notifications_button = tk.Button(self.root, text="Check Notifications", command=self.show_notifications)
         self.notifications_button.pack(side=tk.LEFT, padx=10)
 
+        self.stats_button = tk.Button(self.root, text="Stats", command=self.show_stats)
+        self.stats_button.pack(side=tk.LEFT, padx=10)
+
+        self.status_label.pack(side=tk.RIGHT, padx=10)
+
+        # Chart area below the table, packed when the first chart is shown
+        self.report_view = ReportView(self.root)
+
+    def set_busy(self, busy):
+        self.status_label.config(text="Working..." if busy else "")
+        self.root.config(cursor="watch" if busy else "")
+
+    def close(self):
+        self.tasks.shutdown()
+        self.root.destroy()
+
     def add_sort_filter_search_buttons(self):
         # Buttons for Incomes
         self.income_sort_button = tk.Button(self.income_buttons_frame, text="Sort Incomes", command=lambda: self.show_sort_form("income"))
@@ -84,49 +147,86 @@ class FinanceApp:
         self.budget_search_button.pack(side=tk.LEFT, padx=10)
 
     def show_incomes(self):
-        self.clear_table()
         self.hide_all_buttons()
         self.show_incomes_buttons()
-        self.show_table("Income", ["ID", "Source", "Amount", "Date", "Description"], self.data_service.get_incomes(), self.delete_income)
+        self.load_table("Income", ["ID", "Source", "Amount", "Date", "Description"], self.data_service.get_incomes)
 
     def show_expenses(self):
-        self.clear_table()
         self.hide_all_buttons()
         self.show_expenses_buttons()
-        self.show_table("Expense", ["ID", "Category", "Amount", "Date", "Description"], self.data_service.get_expenses(), self.delete_expense)
+        self.load_table("Expense", ["ID", "Category", "Amount", "Date", "Description"], self.data_service.get_expenses)
 
     def show_budgets(self):
-        self.clear_table()
         self.hide_all_buttons()
         self.show_budgets_buttons()
-        self.show_table("Budget", ["ID", "Category", "Amount"], self.data_service.get_budgets(), self.delete_budget)
+        self.load_table("Budget", ["ID", "Category", "Amount"], self.data_service.get_budgets)
+
+    # Fetch the rows in the background and show them once they arrive. Every table load
+    # shares one channel, so switching tabs drops the result of the load it replaces.
+    def load_table(self, entity, headers, fetch):
+        self.clear_table()
+        self.table_rows = []
+        self.tasks.run(fetch, on_success=lambda data: self.display_filtered_data(entity, headers, data), channel="table")
 
     def show_table(self, entity, headers, data, delete_action):
-        # Display table headers
-        for col, header in enumerate(headers):
-            tk.Label(self.table, text=header).grid(row=0, column=col)
+        self.table_entity = entity
+        # Sequences (lists, binary snapshots) are kept as they are, so only the rows on
+        # screen are ever decoded
+        self.table_rows = data if isinstance(data, Sequence) else list(data)
+        self.table_loaded = 0
+        self.table_delete_action = delete_action
 
-        # Display data in the table
-        for row_num, item in enumerate(data, 1):
-            if entity == "Income":
+        # Display table headers
+        self.tree.configure(columns=headers)
+        for header in headers:
+            self.tree.heading(header, text=header)
+            self.tree.column(header, width=120, anchor=tk.W)
+
+        self.load_table_page()
+
+    def load_table_page(self):
+        end = min(self.table_loaded + TABLE_PAGE_SIZE, len(self.table_rows))
+        for row_num in range(self.table_loaded, end):
+            item = self.table_rows[row_num]
+            if self.table_entity == "Income":
                 values = [item.id, item.source, item.amount, item.date, item.description]
-            elif entity == "Expense":
+            elif self.table_entity == "Expense":
                 values = [item.id, item.category, item.amount, item.date, item.description]
             else:  # Budget
                 values = [item.id, item.category, item.amount]
-
-            for col, value in enumerate(values):
-                tk.Label(self.table, text=value).grid(row=row_num, column=col)
-
-            # Add delete button for each row
-            tk.Button(self.table, text="Delete", command=lambda item=item: delete_action(item.id)).grid(row=row_num, column=len(values))
-
-            # Add update button for each row
-            tk.Button(self.table, text="Update", command=lambda item=item, entity=entity: self.show_update_form(item, entity)).grid(row=row_num, column=len(values) + 1)
+            self.tree.insert("", tk.END, iid=str(row_num), values=["" if value is None else value for value in values])
+        self.table_loaded = end
+
+    def on_table_scroll(self, first, last):
+        self.tree_scrollbar.set(first, last)
+        # Page in the next rows once the view gets close to the last loaded one
+        if float(last) > 0.9 and self.table_loaded < len(self.table_rows):
+            self.load_table_page()
+
+    def selected_items(self):
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("No Selection", "Select a row first.")
+        return [self.table_rows[int(iid)] for iid in selection]
+
+    def selected_item(self):
+        items = self.selected_items()
+        return items[0] if items else None
+
+    def delete_selected(self):
+        items = self.selected_items()
+        if len(items) == 1:
+            self.table_delete_action(items[0].id, expected=items[0])
+        elif items:
+            self.delete_many(items)
+
+    def update_selected(self):
+        item = self.selected_item()
+        if item is not None:
+            self.show_update_form(item, self.table_entity)
 
     def clear_table(self):
-        for widget in self.table.winfo_children():
-            widget.destroy()
+        self.tree.delete(*self.tree.get_children())
 
     def hide_all_buttons(self):
         # Hide all button frames
@@ -143,96 +243,102 @@ class FinanceApp:
     def show_budgets_buttons(self):
         self.budget_buttons_frame.pack()
 
-    def delete_income(self, income_id):
-        self.data_service.delete_income(income_id)
-        messagebox.showinfo("Success", "Income deleted successfully.")
-        self.show_incomes()
+    def delete_income(self, income_id, expected=None):
+        self.tasks.save("incomes", lambda: self.data_service.delete_income(income_id, expected),
+                        on_success=lambda _: self.saved("Income deleted successfully.", self.show_incomes),
+                        on_error=self.show_save_error)
 
-    def delete_expense(self, expense_id):
-        self.data_service.delete_expense(expense_id)
-        messagebox.showinfo("Success", "Expense deleted successfully.")
-        self.show_expenses()
+    def delete_expense(self, expense_id, expected=None):
+        self.tasks.save("expenses", lambda: self.data_service.delete_expense(expense_id, expected),
+                        on_success=lambda _: self.saved("Expense deleted successfully.", self.show_expenses),
+                        on_error=self.show_save_error)
 
-    def delete_budget(self, budget_id):
-        self.data_service.delete_budget(budget_id)
-        messagebox.showinfo("Success", "Budget deleted successfully.")
-        self.show_budgets()
+    def delete_budget(self, budget_id, expected=None):
+        self.tasks.save("budgets", lambda: self.data_service.delete_budget(budget_id, expected),
+                        on_success=lambda _: self.saved("Budget deleted successfully.", self.show_budgets),
+                        on_error=self.show_save_error)
 
     def add_income(self, source, amount, date, description):
-        try:
-            # Apelăm funcția de creare income, care poate arunca o eroare
-            self.data_service.create_income(source, amount, date, description)
-            # Dacă nu apare nicio eroare, afișăm mesajul de succes
-            messagebox.showinfo("Success", "Income added successfully.")
-            self.show_incomes()  # Actualizează lista de venituri
-            self.show_notifications()
-        except ValueError as e:
-            # Dacă apare o eroare de validare, afișăm mesajul de eroare și oprim procesul
-            messagebox.showerror("Validation Error", str(e))
-            return  # Opresc procesul dacă există eroare
+        self.tasks.save("incomes", lambda: self.data_service.create_income(source, amount, date, description),
+                        on_success=lambda _: self.saved("Income added successfully.", self.show_incomes),
+                        on_error=self.show_save_error)
 
     def add_expense(self, category, amount, date, description):
-        try:
-            # Apelăm funcția de creare expense, care poate arunca o eroare
-            self.data_service.create_expense(category, amount, date, description)
-            # Dacă nu apare nicio eroare, afișăm mesajul de succes
-            messagebox.showinfo("Success", "Expense added successfully.")
-            self.show_expenses()  # Actualizează lista de cheltuieli
-            self.show_notifications()  # Actualizează notificările
-        except ValueError as e:
-            # Dacă apare o eroare de validare, afișăm mesajul de eroare și oprim procesul
-            messagebox.showerror("Validation Error", str(e))
-            return  # Opresc procesul dacă există eroare
+        self.tasks.save("expenses", lambda: self.data_service.create_expense(category, amount, date, description),
+                        on_success=lambda _: self.saved("Expense added successfully.", self.show_expenses),
+                        on_error=self.show_save_error)
 
     def add_budget(self, category, amount):
-        try:
-            # Apelăm funcția de creare budget, care poate arunca o eroare
-            self.data_service.create_budget(category, amount)
-            # Dacă nu apare nicio eroare, afișăm mesajul de succes
-            messagebox.showinfo("Success", "Budget added successfully.")
-            self.show_budgets()  # Actualizează lista de bugete
-        except ValueError as e:
-            # Dacă apare o eroare de validare, afișăm mesajul de eroare și oprim procesul
-            messagebox.showerror("Validation Error", str(e))
-            return  # Opresc procesul dacă există eroare
-
-    def update_income(self, income_id, source, amount, date, description):
-        try:
-            # Apelăm funcția de actualizare income, care poate arunca o eroare
-            self.data_service.update_income(income_id, source, amount, date, description)
-            # Dacă nu apare nicio eroare, afișăm mesajul de succes
-            messagebox.showinfo("Success", "Income updated successfully.")
-            self.show_incomes()  # Actualizează lista de venituri
-            self.show_notifications()
-        except ValueError as e:
-            # Dacă apare o eroare de validare, afișăm mesajul de eroare și oprim procesul
-            messagebox.showerror("Validation Error", str(e))
-            return  # Opresc procesul dacă există eroare
-
-    def update_expense(self, expense_id, category, amount, date, description):
-        try:
-            # Apelăm funcția de actualizare expense, care poate arunca o eroare
-            self.data_service.update_expense(expense_id, category, amount, date, description)
-            # Dacă nu apare nicio eroare, afișăm mesajul de succes
-            messagebox.showinfo("Success", "Expense updated successfully.")
-            self.show_expenses()  # Actualizează lista de cheltuieli
-            self.show_notifications()  # Actualizează notificările
-        except ValueError as e:
-            # Dacă apare o eroare de validare, afișăm mesajul de eroare și oprim procesul
-            messagebox.showerror("Validation Error", str(e))
-            return  # Opresc procesul dacă există eroare
-
-    def update_budget(self, budget_id, category, amount):
-        try:
-            # Apelăm funcția de actualizare budget, care poate arunca o eroare
-            self.data_service.update_budget(budget_id, category, amount)
-            # Dacă nu apare nicio eroare, afișăm mesajul de succes
-            messagebox.showinfo("Success", "Budget updated successfully.")
-            self.show_budgets()  # Actualizează lista de bugete
-        except ValueError as e:
-            # Dacă apare o eroare de validare, afișăm mesajul de eroare și oprim procesul
-            messagebox.showerror("Validation Error", str(e))
-            return  # Opresc procesul dacă există eroare
+        self.tasks.save("budgets", lambda: self.data_service.create_budget(category, amount),
+                        on_success=lambda _: self.saved("Budget added successfully.", self.show_budgets),
+                        on_error=self.show_save_error)
+
+    def update_income(self, income_id, source, amount, date, description, expected=None):
+        self.tasks.save("incomes", lambda: self.data_service.update_income(income_id, source, amount, date, description, expected),
+                        on_success=lambda _: self.saved("Income updated successfully.", self.show_incomes),
+                        on_error=self.show_save_error)
+
+    def update_expense(self, expense_id, category, amount, date, description, expected=None):
+        self.tasks.save("expenses", lambda: self.data_service.update_expense(expense_id, category, amount, date, description, expected),
+                        on_success=lambda _: self.saved("Expense updated successfully.", self.show_expenses),
+                        on_error=self.show_save_error)
+
+    def update_budget(self, budget_id, category, amount, expected=None):
+        self.tasks.save("budgets", lambda: self.data_service.update_budget(budget_id, category, amount, expected),
+                        on_success=lambda _: self.saved("Budget updated successfully.", self.show_budgets),
+                        on_error=self.show_save_error)
+
+    # Several rows deleted in one transaction: a single write, and a single undo step
+    def delete_many(self, items):
+        delete, key = {
+            "Income": (self.data_service.delete_income, "incomes"),
+            "Expense": (self.data_service.delete_expense, "expenses"),
+            "Budget": (self.data_service.delete_budget, "budgets"),
+        }[self.table_entity]
+
+        def delete_all():
+            with self.data_service.transaction():
+                for item in items:
+                    delete(item.id, item)
+        self.tasks.save(key, delete_all,
+                        on_success=lambda _: self.saved(f"{len(items)} records deleted successfully.", self.refresh_table),
+                        on_error=self.show_save_error)
+
+    def undo(self):
+        self.tasks.run(self.data_service.undo, on_success=lambda count: self.history_changed("undo", count),
+                       on_error=self.show_save_error)
+
+    def redo(self):
+        self.tasks.run(self.data_service.redo, on_success=lambda count: self.history_changed("redo", count),
+                       on_error=self.show_save_error)
+
+    def history_changed(self, action, count):
+        if not count:
+            messagebox.showinfo(action.capitalize(), f"Nothing to {action}.")
+            return
+        self.refresh_table()
+        self.show_new_alerts()
+
+    # Reload the table currently shown
+    def refresh_table(self):
+        {"Income": self.show_incomes, "Expense": self.show_expenses, "Budget": self.show_budgets}.get(self.table_entity, self.show_incomes)()
+
+    # Runs on the Tk thread once a save has finished
+    def saved(self, message, refresh):
+        messagebox.showinfo("Success", message)
+        refresh()
+        self.show_new_alerts()
+
+    def show_save_error(self, error):
+        if isinstance(error, ConflictError):
+            # Changed by another program since the table was loaded; show the current rows
+            messagebox.showwarning("Conflict", str(error))
+            self.refresh_table()
+            return
+        if not isinstance(error, ValueError):
+            raise error
+        # A validation error stops the save and is shown to the user
+        messagebox.showerror("Validation Error", str(error))
 
     def show_add_form(self):
         entity = simpledialog.askstring("Input", "Which entity would you like to add (Income, Expense, Budget)?")
@@ -262,17 +368,17 @@ class FinanceApp:
             amount = simpledialog.askfloat("Input", f"Enter new amount (current: {item.amount}):")
             date = simpledialog.askstring("Input", f"Enter new date (current: {item.date}):")
             description = simpledialog.askstring("Input", f"Enter new description (current: {item.description}):")
-            self.update_income(item.id, source, amount, date, description)
+            self.update_income(item.id, source, amount, date, description, expected=item)
         elif entity.lower() == "expense":
             category = simpledialog.askstring("Input", f"Enter new category (current: {item.category}):")
             amount = simpledialog.askfloat("Input", f"Enter new amount (current: {item.amount}):")
             date = simpledialog.askstring("Input", f"Enter new date (current: {item.date}):")
             description = simpledialog.askstring("Input", f"Enter new description (current: {item.description}):")
-            self.update_expense(item.id, category, amount, date, description)
+            self.update_expense(item.id, category, amount, date, description, expected=item)
         elif entity.lower() == "budget":
             category = simpledialog.askstring("Input", f"Enter new category (current: {item.category}):")
             amount = simpledialog.askfloat("Input", f"Enter new amount (current: {item.amount}):")
-            self.update_budget(item.id, category, amount)
+            self.update_budget(item.id, category, amount, expected=item)
 
     # Add a new filter form
     def show_filter_form(self, entity):
@@ -280,14 +386,11 @@ class FinanceApp:
         value = simpledialog.askstring("Input", f"Enter value for {key}:")
         if key and value:
             if entity.lower() == "income":
-                filtered_data = self.data_service.filter_incomes(key, value)
-                self.display_filtered_data("Income", ["ID", "Source", "Amount", "Date", "Description"], filtered_data)
+                self.load_table("Income", ["ID", "Source", "Amount", "Date", "Description"], lambda: self.data_service.filter_incomes(key, value))
             elif entity.lower() == "expense":
-                filtered_data = self.data_service.filter_expenses(key, value)
-                self.display_filtered_data("Expense", ["ID", "Category", "Amount", "Date", "Description"], filtered_data)
+                self.load_table("Expense", ["ID", "Category", "Amount", "Date", "Description"], lambda: self.data_service.filter_expenses(key, value))
             elif entity.lower() == "budget":
-                filtered_data = self.data_service.filter_budgets(key, value)
-                self.display_filtered_data("Budget", ["ID", "Category", "Amount"], filtered_data)
+                self.load_table("Budget", ["ID", "Category", "Amount"], lambda: self.data_service.filter_budgets(key, value))
 
     # Add a new search form
     def show_search_form(self, entity):
@@ -295,14 +398,11 @@ class FinanceApp:
         query = simpledialog.askstring("Input", f"Enter query for {key}:")
         if key and query:
             if entity.lower() == "income":
-                search_results = self.data_service.search_incomes(key, query)
-                self.display_filtered_data("Income", ["ID", "Source", "Amount", "Date", "Description"], search_results)
+                self.load_table("Income", ["ID", "Source", "Amount", "Date", "Description"], lambda: self.data_service.search_incomes(key, query))
             elif entity.lower() == "expense":
-                search_results = self.data_service.search_expenses(key, query)
-                self.display_filtered_data("Expense", ["ID", "Category", "Amount", "Date", "Description"], search_results)
+                self.load_table("Expense", ["ID", "Category", "Amount", "Date", "Description"], lambda: self.data_service.search_expenses(key, query))
             elif entity.lower() == "budget":
-                search_results = self.data_service.search_budgets(key, query)
-                self.display_filtered_data("Budget", ["ID", "Category", "Amount"], search_results)
+                self.load_table("Budget", ["ID", "Category", "Amount"], lambda: self.data_service.search_budgets(key, query))
 
     # Add a new sort form
     def show_sort_form(self, entity):
@@ -319,14 +419,11 @@ class FinanceApp:
 
         if key:
             if entity.lower() == "income":
-                sorted_data = self.data_service.sort_incomes(key, reverse)
-                self.display_filtered_data("Income", ["ID", "Source", "Amount", "Date", "Description"], sorted_data)
+                self.load_table("Income", ["ID", "Source", "Amount", "Date", "Description"], lambda: self.data_service.sort_incomes(key, reverse))
             elif entity.lower() == "expense":
-                sorted_data = self.data_service.sort_expenses(key, reverse)
-                self.display_filtered_data("Expense", ["ID", "Category", "Amount", "Date", "Description"], sorted_data)
+                self.load_table("Expense", ["ID", "Category", "Amount", "Date", "Description"], lambda: self.data_service.sort_expenses(key, reverse))
             elif entity.lower() == "budget":
-                sorted_data = self.data_service.sort_budgets(key, reverse)
-                self.display_filtered_data("Budget", ["ID", "Category", "Amount"], sorted_data)
+                self.load_table("Budget", ["ID", "Category", "Amount"], lambda: self.data_service.sort_budgets(key, reverse))
 
     # Helper method to display filtered data
     def display_filtered_data(self, entity, headers, data):
@@ -342,8 +439,8 @@ class FinanceApp:
         year = simpledialog.askinteger("Input", "Enter year:")
         month = simpledialog.askinteger("Input", "Enter month (1-12):")
         if year and month:
-            report = self.data_service.generate_monthly_report(year, month)
-            self.show_report(report)
+            self.tasks.run(lambda: self.data_service.generate_monthly_report(year, month),
+                           on_success=self.show_report, channel="report")
 
     def show_report(self, report):
         # Afișare în terminal
@@ -359,21 +456,77 @@ class FinanceApp:
         self.plot_report(report)
 
     def plot_report(self, report):
-        labels = ["Total Income", "Total Expenses", "Savings"]
-        values = [report["total_income"], report["total_expense"], report["savings"]]
+        self.show_report_view()
+        self.report_view.show_month(report)
+
+    def show_trend_form(self):
+        start_year = simpledialog.askinteger("Input", "Enter first year:")
+        start_month = simpledialog.askinteger("Input", "Enter first month (1-12):")
+        end_year = simpledialog.askinteger("Input", "Enter last year:")
+        end_month = simpledialog.askinteger("Input", "Enter last month (1-12):")
+        if not (start_year and start_month and end_year and end_month):
+            return
+        if (start_year, start_month) > (end_year, end_month):
+            messagebox.showwarning("Invalid Input", "The first month must not be after the last one.")
+            return
+        # Monthly totals come from the rollup and the service's report cache, not a reload
+        self.tasks.run(lambda: self.data_service.generate_period_report(start_year, start_month, end_year, end_month),
+                       on_success=lambda report: self.plot_trend(report["months"]), channel="report")
 
-        plt.figure(figsize=(8, 6))
-        plt.bar(labels, values, color=["green", "red", "blue"])
-        plt.title(f"Financial Report for {report['month']}/{report['year']}")
-        plt.ylabel("Amount")
-        plt.show()
+    def plot_trend(self, months):
+        self.show_report_view()
+        self.report_view.show_trend(months)
+
+    def show_report_view(self):
+        if not self.report_view.frame.winfo_ismapped():
+            self.report_view.frame.pack(after=self.table, fill=tk.BOTH, expand=True)
 
     def show_notifications(self):
+        self.tasks.run(self.collect_notifications, on_success=self.display_notifications, channel="notifications")
+
+    def collect_notifications(self):
         notifications = []
         notifications.extend(self.data_service.check_budget_exceed())
         notifications.extend(self.data_service.detect_unusual_expenses())
-
+        notifications.extend(self.data_service.detect_anomalous_expenses())
+        return notifications
+
+    # Budget alerts and unusual expenses raised by the writes since the last check, shown
+    # only when there are any. Every save ends with this, so the service's event queues are
+    # drained as they fill.
+    def show_new_alerts(self):
+        self.tasks.run(self.collect_new_alerts, on_success=self.display_new_alerts)
+
+    def collect_new_alerts(self):
+        alerts = []
+        for event in self.data_service.pop_budget_alerts():
+            if event["type"] == EXCEEDED:
+                alerts.append(f"Budget exceeded in '{event['category']}': {event['total']:.2f} spent of {event['budget']:.2f}.")
+            else:
+                alerts.append(f"90% of the budget in '{event['category']}' spent: {event['total']:.2f} of {event['budget']:.2f}.")
+        for anomaly in self.data_service.pop_expense_anomalies():
+            alerts.append(f"Unusual expense: {anomaly['amount']} for '{anomaly['category']}' on {anomaly['date']}, "
+                          f"usually {anomaly['mean']:.2f} ± {anomaly['std']:.2f}.")
+        return alerts
+
+    def display_new_alerts(self, alerts):
+        if alerts:
+            messagebox.showwarning("New Alerts", "\n".join(alerts))
+
+    def display_notifications(self, notifications):
         if notifications:
             messagebox.showinfo("Notifications", "\n".join(notifications))
         else:
-            messagebox.showinfo("Notifications", "No alerts or unusual expenses.")
\ No newline at end of file
+            messagebox.showinfo("Notifications", "No alerts or unusual expenses.")
+
+    # Timings and counters of everything done since startup (see repository/instrumentation.py)
+    def show_stats(self):
+        window = tk.Toplevel(self.root)
+        window.title("Stats")
+        text = tk.Text(window, wrap=tk.NONE, font=("Courier", 10), width=110, height=30)
+        text.insert(tk.END, instrumentation.format_stats())
+        text.config(state=tk.DISABLED)
+        text.pack(fill=tk.BOTH, expand=True)
+
+# Time spent creating table rows and drawing charts, next to the service timings
+instrumentation.instrument(FinanceApp, ("show_table", "load_table_page", "plot_report", "plot_trend"))
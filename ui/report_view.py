@@ -0,0 +1,74 @@
+import tkinter as tk
+
+MONTH_LABELS = ["Total Income", "Total Expenses", "Savings"]
+MONTH_FIELDS = ["total_income", "total_expense", "savings"]
+COLORS = ["green", "red", "blue"]
+
+# Report chart embedded in the main window. The figure, its canvas and the artists are made
+# once, on the first plot; later reports only change bar heights, line data and titles and
+# ask for a redraw, instead of opening a new window each time. Showing the report that is
+# already on screen does nothing.
+class ReportView:
+    def __init__(self, parent):
+        self.frame = tk.Frame(parent)
+        self.canvas = None
+        self._shown = None
+
+    def _ensure_canvas(self):
+        if self.canvas is not None:
+            return
+        # matplotlib is slow to import, so the GUI only loads it for the first chart
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        self.figure = Figure(figsize=(8, 3.5), layout="constrained")
+        self.month_axes = self.figure.add_subplot(111)
+        self.bars = self.month_axes.bar(MONTH_LABELS, [0] * len(MONTH_LABELS), color=COLORS)
+        self.month_axes.set_ylabel("Amount")
+        self.month_axes.axhline(0, color="black", linewidth=0.8)
+
+        # Months along the x axis, one line per total
+        self.trend_axes = self.figure.add_subplot(111, label="trend")
+        self.lines = [self.trend_axes.plot([], [], marker="o", color=color, label=label)[0]
+                      for label, color in zip(MONTH_LABELS, COLORS)]
+        self.trend_axes.set_ylabel("Amount")
+        self.trend_axes.legend(loc="best")
+
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.frame)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+    def show_month(self, report):
+        key = ("month",) + tuple(report[field] for field in ["year", "month"] + MONTH_FIELDS)
+        if key == self._shown:
+            return
+        self._ensure_canvas()
+        for bar, field in zip(self.bars, MONTH_FIELDS):
+            bar.set_height(report[field])
+        self.month_axes.set_title(f"Financial Report for {report['month']}/{report['year']}")
+        self._redraw(self.month_axes, key)
+
+    # months: monthly reports in date order, e.g. DataService.generate_period_report()["months"]
+    def show_trend(self, months):
+        key = ("trend",) + tuple(tuple(month[field] for field in ["year", "month"] + MONTH_FIELDS) for month in months)
+        if key == self._shown:
+            return
+        self._ensure_canvas()
+        positions = list(range(len(months)))
+        for line, field in zip(self.lines, MONTH_FIELDS):
+            line.set_data(positions, [month[field] for month in months])
+        # Label at most about a dozen months so the axis stays readable
+        step = max(1, len(months) // 12)
+        self.trend_axes.set_xticks(positions[::step])
+        self.trend_axes.set_xticklabels([f"{month['month']}/{month['year']}" for month in months[::step]])
+        if months:
+            first, last = months[0], months[-1]
+            self.trend_axes.set_title(f"Trend from {first['month']}/{first['year']} to {last['month']}/{last['year']}")
+        self._redraw(self.trend_axes, key)
+
+    def _redraw(self, axes, key):
+        self.month_axes.set_visible(axes is self.month_axes)
+        self.trend_axes.set_visible(axes is self.trend_axes)
+        axes.relim()
+        axes.autoscale_view()
+        self.canvas.draw_idle()
+        self._shown = key
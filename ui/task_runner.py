@@ -0,0 +1,115 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Runs DataService calls off the Tk thread and hands their results back to it.
+#
+# Tk may only be touched from the thread running mainloop, so workers put finished results
+# on a queue that the Tk thread drains every poll_ms through root.after. DataService keeps
+# caches and indexes that are not thread-safe, so the pool has a single worker and calls
+# run one at a time, in the order they were submitted.
+class TaskRunner:
+    def __init__(self, root, on_busy_change=None, poll_ms=50):
+        self.root = root
+        self.on_busy_change = on_busy_change
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="finance-worker")
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._generations = {}  # channel -> number of the latest task on it
+        self._futures = {}  # channel -> future of the latest task on it
+        self._pending_saves = {}  # key -> calls queued for a save that has not started yet
+        self._active = 0
+        self._closed = False
+        self.root.after(self.poll_ms, self._poll)
+
+    # Run fn in the background. Submitting on a channel makes older tasks on that channel
+    # stale: they are cancelled if they have not started and their results are dropped.
+    def run(self, fn, on_success=None, on_error=None, channel=None):
+        generation = None
+        if channel is not None:
+            generation = self.cancel(channel)
+        self._started()
+        future = self._executor.submit(self._call, fn, on_success, on_error, channel, generation)
+        # A cancelled task never reports back, so report it here to keep the busy count right
+        future.add_done_callback(lambda done: done.cancelled() and self._results.put((None, None, None, True)))
+        if channel is not None:
+            self._futures[channel] = future
+
+    # Queue a write for one data file. While a save for the same file is waiting to start,
+    # later ones join it instead of queueing behind it, so at most one save per file is
+    # pending; the joined calls still run in order, each with its own callbacks.
+    def save(self, key, fn, on_success=None, on_error=None):
+        with self._lock:
+            batch = self._pending_saves.get(key)
+            if batch is not None:
+                batch.append((fn, on_success, on_error))
+                return
+            batch = [(fn, on_success, on_error)]
+            self._pending_saves[key] = batch
+        self._started()
+        self._executor.submit(self._run_saves, key, batch)
+
+    def _run_saves(self, key, batch):
+        with self._lock:
+            self._pending_saves.pop(key, None)
+        for index, (fn, on_success, on_error) in enumerate(batch):
+            self._call(fn, on_success, on_error, None, None, last=index == len(batch) - 1)
+
+    def _call(self, fn, on_success, on_error, channel, generation, last=True):
+        try:
+            result, error = fn(), None
+        except Exception as exc:
+            result, error = None, exc
+        self._results.put(((channel, generation), (on_success, on_error), (result, error), last))
+
+    def _started(self):
+        self._active += 1
+        if self._active == 1 and self.on_busy_change is not None:
+            self.on_busy_change(True)
+
+    def _poll(self):
+        if self._closed:
+            return
+        while True:
+            try:
+                task, callbacks, outcome, last = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if callbacks is not None and not self._is_stale(*task):
+                self._dispatch(callbacks, outcome)
+            if last:
+                self._active -= 1
+                if self._active == 0 and self.on_busy_change is not None:
+                    self.on_busy_change(False)
+        self.root.after(self.poll_ms, self._poll)
+
+    def _dispatch(self, callbacks, outcome):
+        on_success, on_error = callbacks
+        result, error = outcome
+        try:
+            if error is not None and on_error is None:
+                raise error
+            if error is not None:
+                on_error(error)
+            elif on_success is not None:
+                on_success(result)
+        except Exception as exc:
+            # Report like any other Tk callback error, and keep polling
+            self.root.report_callback_exception(type(exc), exc, exc.__traceback__)
+
+    def _is_stale(self, channel, generation):
+        return channel is not None and self._generations.get(channel) != generation
+
+    # Make every task submitted on the channel so far stale
+    def cancel(self, channel):
+        generation = self._generations.get(channel, 0) + 1
+        self._generations[channel] = generation
+        future = self._futures.pop(channel, None)
+        if future is not None:
+            future.cancel()
+        return generation
+
+    def shutdown(self):
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)